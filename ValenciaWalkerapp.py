@@ -1,22 +1,41 @@
 #ValenciaWalker for Digital Twins still working on app.py and other phases within the project.
 # ValenciaWalker – Finalized app.py for OpenQQuantify Digital Twins
 
-from flask import Flask, request, jsonify, send_from_directory, render_template
+from flask import Flask, request, jsonify, send_from_directory, render_template, send_file
 from flask_cors import CORS
 from dotenv import load_dotenv
 from flask_socketio import SocketIO
 from backend.agents import run_ai_agent
-from backend.iot_simulator import simulate_temperature
+from backend.iot_simulator import simulate_temperature, SensorFleet, FLEET_UNITS, FLEET_KINDS
 from backend.bom_marketplace import generate_bom, create_checkout_session
-from backend.cesium_manager import upload_model_to_cesium
-from backend.physics_sim import spin_motor_simulation, move_robot_arm
+from backend.cesium_manager import upload_model_to_cesium, uploads as cesium_uploads
+from backend.physics_sim import (spin_motor_simulation, move_robot_arm, step_motors, step_arms, motors, arms,
+                                 ARM_MAX_TEMP)
 from backend.code_executor import execute_user_code
-from backend.templates_api import save_template, load_template
+from backend.templates_api import (save_template, load_template_bytes, list_templates, load_components,
+                                   template_versions, checkout_template, compact_template_history,
+                                   cache as template_cache, TEMPLATES_PATH)
+from backend.template_bulk import export_names, iter_export, import_lines
 from backend.utils import get_cesium_token
-import threading
-import time
+from backend.scheduler import Scheduler
+from backend.twin_runtime import TwinRuntime
+from backend.sim_run import SimulationRun
+from backend.batch_sim import SweepQueue, RUNNERS, MOTOR_SWEEP_PARAMS, ARM_SWEEP_PARAMS
+from backend.wire_format import (wants_binary, binary_response, encode_records, encode_columns, encode_table,
+                                  decode_table, TYPE_I64, TYPE_F64, BINARY_MIMETYPE)
+from backend.sensor_history import SensorHistory
+from backend.sensor_ingest import IngestQueue
+from backend.telemetry_store import TelemetryStore, RESOLUTIONS, MOTOR_FIELDS, ARM_FIELDS
+from backend.anomaly_detector import AnomalyDetector
+import struct
 import os
+import re
+import time
+from datetime import datetime
+import gzip
+import zlib
 import eventlet
+import numpy as np
 
 
 # Monkey patch for socket IO
@@ -32,6 +51,11 @@ app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "openq_secret")
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Seeded run shared by the simulators; set SIM_SEED to reproduce one
+# (inputs are not recorded here, so runs cannot be replayed; see sim_run.py)
+run = SimulationRun(seed=os.getenv("SIM_SEED"))
+temperature_rng = run.random("temperature")
+
 # ------------------------ Web Interface ------------------------ #
 
 @app.route("/", methods=["GET"])
@@ -50,30 +74,325 @@ def agent_prompt():
 
 # ------------------------ Sensor Simulator ------------------------ #
 
+# Bounded per-sensor history of every reading (simulated or ingested)
+sensor_history = SensorHistory(capacity=int(os.getenv("IOT_HISTORY_CAPACITY", 86400)),
+                               max_sensors=int(os.getenv("IOT_HISTORY_SENSORS", 64)))
+
+# Durable columnar telemetry (hourly segments + 1m / 1h rollups)
+telemetry = TelemetryStore(os.getenv("TELEMETRY_PATH", "telemetry"))
+
+def persist_sensor_readings(sensors, timestamps, values, units=None):
+    telemetry.append("sensors", timestamps, sensors, value=np.asarray(values, dtype=np.float32))
+
+# Incremental anomaly detection (rolling z-score, EWMA, rate of change, hard limits)
+# over motor / arm / sensor channels; alerts go out on the socket as 'alert' events
+def emit_alerts(events):
+    socketio.emit('alert', events)
+
+detector = AnomalyDetector(capacity=int(os.getenv("ANOMALY_CHANNELS", 4096)),
+                           window=int(os.getenv("ANOMALY_WINDOW", 60)),
+                           z_threshold=float(os.getenv("ANOMALY_Z", 4.0)),
+                           ewma_threshold=float(os.getenv("ANOMALY_EWMA_Z", 4.0)),
+                           on_alert=emit_alerts)
+
+def detect_sensor_readings(sensors, timestamps, values, units=None):
+    # Only sensors admitted to the history become channels, so junk names cannot fill the detector
+    known = np.fromiter((sensor in sensor_history.rows for sensor in sensors), dtype=bool, count=len(sensors))
+    if not known.all():
+        sensors = [sensor for sensor, keep in zip(sensors, known) if keep]
+        timestamps, values = np.asarray(timestamps)[known], np.asarray(values)[known]
+    detector.update_readings(sensors, timestamps, values)
+
+def record_reading(reading):
+    now = time.time_ns()
+    sensor_history.append(reading["sensor"], reading["value"], timestamp_ns=now, unit=reading.get("unit"))
+    persist_sensor_readings(reading["sensor"], now, [reading["value"]])
+    detect_sensor_readings([reading["sensor"]], [now], [reading["value"]])
+
+# Optional high-rate simulated fleet (3 sensors per machine) with its own, shorter history
+FLEET_MACHINES = int(os.getenv("IOT_FLEET_MACHINES", 0))
+fleet = fleet_history = fleet_detector = None
+if FLEET_MACHINES:
+    fleet = SensorFleet(FLEET_MACHINES, rate_hz=float(os.getenv("IOT_FLEET_RATE_HZ", 50)), rng=run.rng("iot_fleet"))
+    fleet_history = SensorHistory(capacity=int(fleet.rate_hz * float(os.getenv("IOT_FLEET_HISTORY_S", 60))),
+                                  max_sensors=len(fleet))
+    fleet_units = [FLEET_UNITS[FLEET_KINDS[kind]] for kind in fleet.kinds]
+    # Separate detector so the rolling window spans seconds at the fleet's sample rate
+    fleet_detector = AnomalyDetector(capacity=len(fleet),
+                                     window=int(fleet.rate_hz * float(os.getenv("ANOMALY_FLEET_WINDOW_S", 10))),
+                                     z_threshold=float(os.getenv("ANOMALY_FLEET_Z", 6.0)),
+                                     ewma_threshold=float(os.getenv("ANOMALY_FLEET_Z", 6.0)),
+                                     on_alert=emit_alerts)
+    fleet_rows = fleet_detector.channels(fleet.ids)
+
+def history_for(sensor):
+    if fleet_history is not None and sensor in fleet_history.rows:
+        return fleet_history
+    return sensor_history
+
 @app.route("/api/iot", methods=["GET"])
 def simulate():
-    data = simulate_temperature()
+    data = simulate_temperature(temperature_rng)
+    record_reading(data)
+    if wants_binary(request):
+        return binary_response(encode_records([data]))
     return jsonify(data)
 
+def _epoch_ns(value):
+    """Query time (epoch seconds or ISO 8601) -> epoch nanoseconds, or None."""
+    if value is None:
+        return None
+    try:
+        return int(float(value) * 1e9)
+    except ValueError:
+        return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1e9)
+
+@app.route("/api/iot/history", methods=["GET"])
+def iot_history():
+    """
+    GET /api/iot/history?sensor=arduino_temp&start=<epoch s|ISO>&end=...&step=60
+    Returns: without sensor, the known sensors; without step, raw {timestamps (epoch ns), values};
+             with step (seconds), {bucket_start, count, min, max, mean} per non-empty bucket
+    """
+    sensor = request.args.get("sensor")
+    if sensor is None:
+        sensors = sensor_history.sensors() + (fleet_history.sensors() if fleet_history is not None else [])
+        memory = sensor_history.memory_bytes() + (fleet_history.memory_bytes() if fleet_history is not None else 0)
+        return jsonify({"sensors": sensors, "memory_bytes": memory})
+    history = history_for(sensor)
+    try:
+        start, end = _epoch_ns(request.args.get("start")), _epoch_ns(request.args.get("end"))
+        step = request.args.get("step")
+        step = int(float(step) * 1e9) if step else None
+    except ValueError:
+        return jsonify({"error": "start/end must be epoch seconds or ISO 8601, step a number of seconds"}), 400
+    if step is not None and step <= 0:
+        return jsonify({"error": "step must be positive"}), 400
+
+    if step is None:
+        selected = history.range(sensor, start, end)
+        if selected is None:
+            return jsonify({"error": f"Unknown sensor '{sensor}'"}), 404
+        columns = {"timestamp": selected[0], "value": selected[1].astype(np.float64)}
+    else:
+        columns = history.aggregate(sensor, step, start, end)
+        if columns is None:
+            return jsonify({"error": f"Unknown sensor '{sensor}'"}), 404
+
+    if wants_binary(request):
+        count = len(next(iter(columns.values())))
+        return binary_response(encode_table(count, [
+            (name, TYPE_I64 if values.dtype.kind == "i" else TYPE_F64, values) for name, values in columns.items()]))
+    result = {name: values.tolist() for name, values in columns.items()}
+    result["sensor"] = sensor
+    result["unit"] = history.units.get(sensor)
+    return jsonify(result)
+
+# Device pushes go through a bounded queue; a background writer batches them into storage
+ingest_queue = IngestQueue([sensor_history.ingest, persist_sensor_readings, detect_sensor_readings], max_readings=int(os.getenv("IOT_INGEST_QUEUE", 1_000_000))).start()
+INGEST_MAX_BATCH = int(os.getenv("IOT_INGEST_MAX_BATCH", 100_000))
+
+def _parse_ingest(req):
+    """(sensors, timestamps_ns, values, units) from a JSON or OQTB ingest body."""
+    if req.mimetype == BINARY_MIMETYPE:
+        columns = decode_table(req.get_data())
+        sensors = columns.get("sensor", columns.get("id"))
+        count = len(columns["value"])
+        if sensors is None:
+            raise KeyError("sensor")
+        for name in ("value", "timestamp_ns"):
+            if name in columns and not isinstance(columns[name], np.ndarray):  # string columns decode to lists
+                raise TypeError(f"column '{name}' must be numeric")
+        timestamps = columns.get("timestamp_ns")
+        timestamps = np.full(count, time.time_ns(), dtype=np.int64) if timestamps is None else timestamps.astype(np.int64)
+        units = dict(zip(sensors, columns["unit"])) if "unit" in columns else {}
+        return list(sensors), timestamps, np.asarray(columns["value"], dtype=np.float64), units
+
+    readings = (req.get_json() or {}).get("readings", [])
+    now = time.time_ns()
+    sensors = [str(r["sensor"]) for r in readings]
+    values = np.array([float(r["value"]) for r in readings], dtype=np.float64)
+    timestamps = np.array([now if r.get("timestamp") is None else _epoch_ns(r["timestamp"]) for r in readings],
+                          dtype=np.int64)
+    units = {str(r["sensor"]): r["unit"] for r in readings if r.get("unit")}
+    return sensors, timestamps, values, units
+
+@app.route("/api/iot/ingest", methods=["POST"])
+def iot_ingest():
+    """
+    POST /api/iot/ingest
+    Payload: {"readings": [{"sensor": "line3-temp", "value": 24.1, "timestamp": <epoch s|ISO>, "unit": "C"}, ...]}
+             or an OQTB table (Content-Type application/x-openq-table) with sensor, value[, timestamp_ns, unit]
+    Returns: 202 {"accepted": n}; 409 when it names new sensors past IOT_HISTORY_SENSORS;
+             429 with Retry-After when the ingest queue is full
+    """
+    try:
+        sensors, timestamps, values, units = _parse_ingest(request)
+    except (KeyError, TypeError, ValueError, IndexError, OverflowError, struct.error) as e:
+        return jsonify({"error": f"Malformed ingest batch: {e}"}), 400
+    if len(values) > INGEST_MAX_BATCH:
+        return jsonify({"error": f"At most {INGEST_MAX_BATCH} readings per request"}), 413
+    try:
+        # New sensors get history rows only if the batch is queued, and a batch is queued only if they fit
+        queued = ingest_queue.offer(sensors, timestamps, values, units, admit=sensor_history.reserve)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    if not queued:
+        retry = ingest_queue.retry_after()
+        response = jsonify({"error": "Ingest queue full", "retry_after_s": retry})
+        response.headers["Retry-After"] = str(retry)
+        return response, 429
+    return jsonify({"accepted": len(values)}), 202
+
+@app.route("/api/iot/ingest/stats", methods=["GET"])
+def iot_ingest_stats():
+    return jsonify(ingest_queue.stats())
+
+@app.route("/api/iot/fleet", methods=["GET"])
+def iot_fleet():
+    """
+    GET /api/iot/fleet
+    Returns: latest reading of every fleet sensor (requires IOT_FLEET_MACHINES > 0)
+    """
+    if fleet is None:
+        return jsonify({"error": "Sensor fleet disabled; set IOT_FLEET_MACHINES"}), 404
+    if wants_binary(request):
+        return binary_response(encode_columns(fleet.ids, {"value": fleet.latest, "kind": fleet.kinds}))
+    return jsonify(fleet.latest_records())
+
 # ------------------------ Cesium Upload ------------------------ #
 
 @app.route("/api/upload_model", methods=["POST"])
 def upload_model():
-    body = request.get_json()
-    success = upload_model_to_cesium(body.get("model_path"))
-    return jsonify({"success": success})
+    """
+    POST /api/upload_model
+    Payload: { "model_path": "arm.glb" }  (relative to CESIUM_MODELS_DIR)
+    Returns: 202 with the background upload job; poll /api/upload_model/jobs/<id>;
+             403 for paths outside the models directory
+    """
+    body = request.get_json() or {}
+    try:
+        job = upload_model_to_cesium(body.get("model_path"))
+    except PermissionError as e:
+        return jsonify({"success": False, "error": str(e)}), 403
+    except OverflowError as e:
+        return jsonify({"success": False, "error": str(e)}), 429, {"Retry-After": "5"}
+    if job is None:
+        return jsonify({"success": False, "error": "Model file not found"}), 404
+    return jsonify({"success": True, "job": job}), 202
+
+@app.route("/api/upload_model/jobs/<job_id>", methods=["GET"])
+def upload_model_job(job_id):
+    job = cesium_uploads.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown upload job"}), 404
+    return jsonify(job)
 
 # ------------------------ Motor & Robotics Sim ------------------------ #
 
 @app.route("/api/simulate_motor", methods=["GET"])
 def simulate_motor():
-    return jsonify(spin_motor_simulation())
+    # ?motor_id=<id> steps one motor (default M1); ?all=1 steps every registered motor
+    if request.args.get("all"):
+        step_motors()
+        if wants_binary(request):
+            return binary_response(encode_columns(motors.ids, motors.snapshot()))
+        return jsonify({"motors": [motors.state(row) for row in range(len(motors))]})
+
+    motor_id = request.args.get("motor_id", "M1")
+    if motor_id not in motors:
+        return jsonify({"error": f"Unknown motor '{motor_id}'"}), 404
+    state = spin_motor_simulation(motor_id)
+    if wants_binary(request):
+        return binary_response(encode_records([state]))
+    return jsonify(state)
 
 @app.route("/api/move_arm", methods=["POST"])
 def simulate_arm():
+    # Body: {"position": deg, "arm_id": "A1"} or {"position": deg, "all": true}
     body = request.get_json()
     pos = body.get("position", 90)
-    return jsonify(move_robot_arm(pos))
+    if body.get("all"):
+        arms.set_targets(None, pos)
+        step_arms()
+        if wants_binary(request):
+            return binary_response(encode_columns(arms.ids, arms.snapshot()))
+        return jsonify({"arms": [arms.state(row) for row in range(len(arms))]})
+
+    arm_id = body.get("arm_id", "A1")
+    if arm_id not in arms:
+        return jsonify({"error": f"Unknown arm '{arm_id}'"}), 404
+    state = move_robot_arm(pos, arm_id)
+    if wants_binary(request):
+        return binary_response(encode_records([state]))
+    return jsonify(state)
+
+# ------------------------ Headless Batch Sweeps ------------------------ #
+
+# Sweeps run as background jobs in worker processes; requests only queue them and poll
+SWEEP_MAX_HOURS = float(os.getenv("SWEEP_MAX_HOURS", 24))
+SWEEP_MAX_COMBINATIONS = int(os.getenv("SWEEP_MAX_COMBINATIONS", 4096))
+sweeps = SweepQueue(os.getenv("SWEEP_RESULTS_DIR", "sweeps"),
+                    workers=int(os.getenv("SWEEP_JOBS", 1)),
+                    sweep_workers=int(os.getenv("SWEEP_WORKERS", 0)) or None,
+                    max_queued=int(os.getenv("SWEEP_MAX_QUEUED", 8)))
+
+@app.route("/api/batch/sweep", methods=["POST"])
+def batch_sweep():
+    """
+    POST /api/batch/sweep
+    Payload: { "kind": "motor" | "arm", "grid": { "heat_rate": [0.25, 0.5], ... },
+               "hours": 1, "record_every_s": 60 }
+    Returns: 202 with the sweep job; poll /api/batch/sweep/<id>, then fetch /api/batch/sweep/<id>/result
+             400 past SWEEP_MAX_HOURS or SWEEP_MAX_COMBINATIONS; 429 when the sweep queue is full
+    """
+    body = request.get_json() or {}
+    kind = body.get("kind", "motor")
+    grid = body.get("grid", {})
+    allowed = MOTOR_SWEEP_PARAMS if kind == "motor" else ARM_SWEEP_PARAMS
+    if kind not in RUNNERS or not isinstance(grid, dict) or not grid or any(name not in allowed for name in grid):
+        return jsonify({"error": f"Invalid sweep. kind is motor or arm; grid keys from {list(allowed)}"}), 400
+    try:
+        hours = float(body.get("hours", 1))
+        record_every_s = float(body.get("record_every_s", 60))
+        combinations = int(np.prod([len(values) for values in grid.values()]))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid sweep: {e}"}), 400
+    if not 0 < hours <= SWEEP_MAX_HOURS or not record_every_s > 0:
+        return jsonify({"error": f"hours must be in (0, {SWEEP_MAX_HOURS}] and record_every_s > 0"}), 400
+    if combinations > SWEEP_MAX_COMBINATIONS:
+        return jsonify({"error": f"Grid has {combinations} combinations; at most {SWEEP_MAX_COMBINATIONS}"}), 400
+
+    try:
+        job = sweeps.submit(kind, grid, hours * 3600, record_every_s)
+    except OverflowError as e:
+        return jsonify({"error": str(e)}), 429, {"Retry-After": "30"}
+    return jsonify({"message": "Sweep queued", "job": job}), 202
+
+@app.route("/api/batch/sweep/<job_id>", methods=["GET"])
+def batch_sweep_job(job_id):
+    """
+    GET /api/batch/sweep/<job_id>
+    Returns: {state: queued|running|done|failed, combinations, error, ...}
+    """
+    job = sweeps.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown sweep job"}), 404
+    return jsonify(job)
+
+@app.route("/api/batch/sweep/<job_id>/result", methods=["GET"])
+def batch_sweep_result(job_id):
+    """
+    GET /api/batch/sweep/<job_id>/result
+    Returns: .npz of columnar results (parameter columns, time series, failure_time_s); 409 until the job is done
+    """
+    job = sweeps.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown sweep job"}), 404
+    if job["state"] != "done":
+        return jsonify({"error": f"Sweep is {job['state']}", "job": job}), 409
+    return send_file(os.path.abspath(sweeps.result_path(job_id)), mimetype="application/octet-stream",
+                     as_attachment=True, download_name=f"{job['kind']}_sweep.npz")
 
 # ------------------------ Code IDE Execution ------------------------ #
 
@@ -102,14 +421,126 @@ def checkout():
 @app.route("/api/save_template", methods=["POST"])
 def save_template_api():
     body = request.get_json()
-    save_template(body["name"], body["data"])
-    return jsonify({"status": "saved"})
+    try:
+        entry = save_template(body["name"], body["data"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "saved", "version": entry["version"]})
 
 @app.route("/api/load_template/<name>", methods=["GET"])
 def load_template_api(name):
-    data = load_template(name)
+    body = load_template_bytes(name)
+    if body is None:
+        return jsonify(None)
+    return app.response_class(body, mimetype="application/json")
+
+@app.route("/api/templates/<name>/versions", methods=["GET"])
+def template_versions_api(name):
+    """
+    GET /api/templates/<name>/versions
+    Returns: [{version, saved_at, kind, added, removed, modified}, ...] oldest first
+    """
+    versions = template_versions(name)
+    if versions is None:
+        return jsonify({"error": f"No history for template '{name}'"}), 404
+    return jsonify(versions)
+
+@app.route("/api/templates/<name>/versions/<int:version>", methods=["GET"])
+def checkout_template_api(name, version):
+    data = checkout_template(name, version)
+    if data is None:
+        return jsonify({"error": f"Template '{name}' has no version {version}"}), 404
     return jsonify(data)
 
+@app.route("/api/templates/<name>/compact", methods=["POST"])
+def compact_template_api(name):
+    """
+    POST /api/templates/<name>/compact
+    Payload: {"keep": 20}
+    Returns: {"first": ..., "latest": ..., "dropped": ...}
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        keep = int(body.get("keep", 20))
+    except (TypeError, ValueError):
+        return jsonify({"error": "keep must be an integer"}), 400
+    if keep < 1:
+        return jsonify({"error": "keep must be at least 1"}), 400
+    result = compact_template_history(name, keep)
+    if result is None:
+        return jsonify({"error": f"No history for template '{name}'"}), 404
+    return jsonify(result)
+
+@app.route("/api/templates/export", methods=["GET"])
+def export_templates_api():
+    """
+    GET /api/templates/export?tag=factory&q=line&gzip=1
+    Returns: NDJSON stream, one {"name": ..., "data": {...}} per line
+    """
+    lines = iter_export(export_names(request.args.get("tag"), request.args.get("q")))
+    if request.args.get("gzip") == "1":
+        def compressed():
+            encoder = zlib.compressobj(wbits=31)  # gzip container
+            for line in lines:
+                chunk = encoder.compress(line)
+                if chunk:
+                    yield chunk
+            yield encoder.flush()
+        return app.response_class(compressed(), mimetype="application/gzip",
+                                  headers={"Content-Disposition": "attachment; filename=templates.ndjson.gz"})
+    return app.response_class(lines, mimetype="application/x-ndjson")
+
+@app.route("/api/templates/import", methods=["POST"])
+def import_templates_api():
+    """
+    POST /api/templates/import?job=migration-1
+    Payload: NDJSON body ({"name": ..., "data": {...}} per line), optionally Content-Encoding: gzip
+    Returns: {"line", "imported", "failed", "errors"}; re-POST the same stream with the same job to resume
+    """
+    job = request.args.get("job")
+    if job is not None and not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", job):
+        return jsonify({"error": "job must be 1-64 letters, digits, _ or -"}), 400
+    checkpoint = None
+    if job:
+        os.makedirs(os.path.join(TEMPLATES_PATH, "imports"), exist_ok=True)
+        checkpoint = os.path.join(TEMPLATES_PATH, "imports", f"{job}.json")
+    stream = request.stream
+    if request.headers.get("Content-Encoding") == "gzip":
+        stream = gzip.GzipFile(fileobj=stream)
+    state = import_lines(stream, checkpoint, workers=int(os.getenv("TEMPLATE_IMPORT_WORKERS", 1)))
+    return jsonify({k: v for k, v in state.items() if k != "offset"})
+
+@app.route("/api/templates/cache/stats", methods=["GET"])
+def template_cache_stats():
+    return jsonify(template_cache.stats())
+
+@app.route("/api/templates", methods=["GET"])
+def list_templates_api():
+    """
+    GET /api/templates?tag=factory&q=line
+    Returns: [{name, description, tags, component_count, counts_by_type, updated_at}, ...]
+    """
+    return jsonify(list_templates(tag=request.args.get("tag"), query=request.args.get("q")))
+
+@app.route("/api/templates/<name>/components", methods=["GET"])
+def template_components_api(name):
+    """
+    GET /api/templates/<name>/components?ids=m1,m2&bbox=x0,y0,z0,x1,y1,z1
+    Returns: {"name": ..., "components": [...]} with only the matching components.
+    """
+    ids = request.args.get("ids")
+    bbox = request.args.get("bbox")
+    try:
+        bbox = tuple(float(v) for v in bbox.split(",")) if bbox else None
+        if bbox is not None and len(bbox) != 6:
+            raise ValueError
+    except ValueError:
+        return jsonify({"error": "bbox must be x0,y0,z0,x1,y1,z1"}), 400
+    components = load_components(name, ids=ids.split(",") if ids else None, bbox=bbox)
+    if components is None:
+        return jsonify({"error": f"Template '{name}' not found"}), 404
+    return jsonify({"name": name, "components": components})
+
 # ------------------------ Cesium Token ------------------------ #
 
 @app.route("/api/cesium_token", methods=["GET"])
@@ -124,15 +555,158 @@ def static_files(path):
 
 # ------------------------ Real-Time Socket Stream ------------------------ #
 
-def emit_simulation_data():
-    while True:
-        motor = spin_motor_simulation()
-        arm = move_robot_arm(135)
-        socketio.emit('sim_update', {"motor": motor, "arm": arm})
-        time.sleep(1)
-
-# Start real-time thread
-threading.Thread(target=emit_simulation_data, daemon=True).start()
+# Bank columns watched per actuator, as "<kind>:<id>:<field>" detector channels
+ACTUATOR_CHANNELS = (("motor", motors, ("rpm", "torque_nm", "temperature_c")),
+                     ("arm", arms, ("current_position_deg", "servo_load", "temperature_c")))
+TEMP_WARN_MARGIN = float(os.getenv("ANOMALY_TEMP_MARGIN", 5.0))  # warn this far below the failure temperature
+TEMP_MAX_RATE = float(os.getenv("ANOMALY_TEMP_RATE", 10.0))  # deg C per second
+actuator_rows = {}  # (kind, field) -> detector rows for the bank's current actuators
+
+def _actuator_rows(kind, bank, field):
+    rows = actuator_rows.get((kind, field))
+    if rows is None or len(rows) != len(bank):  # (re)register when actuators were added
+        high = max_rate = None
+        if field == "temperature_c":
+            high = (bank.max_temp if kind == "motor" else ARM_MAX_TEMP) - TEMP_WARN_MARGIN
+            max_rate = TEMP_MAX_RATE
+        rows = actuator_rows[(kind, field)] = detector.channels(
+            [f"{kind}:{actuator_id}:{field}" for actuator_id in bank.ids], high=high, max_rate=max_rate)
+    return rows
+
+def detect_actuators(now):
+    """Feed every motor / arm column into the detector; one vectorized update per column."""
+    for kind, bank, fields in ACTUATOR_CHANNELS:
+        for field in fields:
+            detector.update(_actuator_rows(kind, bank, field), getattr(bank, field), now)
+
+def emit_simulation_data(dt):
+    motor = spin_motor_simulation()
+    arm = move_robot_arm(135)
+    now = time.time_ns()
+    telemetry.append_state("motors", motor, "motor_id", MOTOR_FIELDS, now)
+    telemetry.append_state("arms", arm, "arm_id", ARM_FIELDS, now)
+    detect_actuators(now)
+    socketio.emit('sim_update', {"motor": motor, "arm": arm})
+
+def sample_temperature(dt):
+    record_reading(simulate_temperature(temperature_rng))
+
+# Start real-time scheduler
+scheduler = Scheduler()
+scheduler.register("sim_update", emit_simulation_data, rate_hz=float(os.getenv("SIM_UPDATE_HZ", 1)))
+scheduler.register("iot_history", sample_temperature, rate_hz=float(os.getenv("TEMP_SIM_HZ", 1)), policy="drop")
+
+def tick_fleet(dt):
+    timestamps, values = fleet.step(dt)
+    fleet_history.ingest_block(fleet.ids, timestamps, values, fleet_units)
+    fleet_detector.update_block(fleet_rows, timestamps, values)
+
+if fleet is not None:
+    # Each tick generates a block of rate_hz * dt samples for every sensor
+    scheduler.register("iot_fleet", tick_fleet, rate_hz=float(os.getenv("IOT_FLEET_TICK_HZ", 10)))
+
+def roll_up_telemetry(dt):
+    telemetry.roll_up()
+
+scheduler.register("telemetry_rollup", roll_up_telemetry, rate_hz=1 / 60, policy="drop")
+scheduler.start()
+
+@app.route("/api/alerts", methods=["GET"])
+def alerts():
+    """
+    GET /api/alerts
+    Returns: {channels, active [{channel, rule}], recent [alert events]} for actuators / sensors,
+             plus the same under "fleet" when the sensor fleet is enabled
+    """
+    status = detector.status()
+    if fleet_detector is not None:
+        status["fleet"] = fleet_detector.status()
+    return jsonify(status)
+
+@app.route("/api/run", methods=["GET"])
+def run_info():
+    return jsonify(run.info())
+
+@app.route("/api/scheduler/stats", methods=["GET"])
+def scheduler_stats():
+    return jsonify(scheduler.stats())
+
+# ------------------------ Telemetry ------------------------ #
+
+@app.route("/api/telemetry", methods=["GET"])
+def telemetry_streams():
+    return jsonify(telemetry.stats())
+
+@app.route("/api/telemetry/<stream>", methods=["GET"])
+def telemetry_query(stream):
+    """
+    GET /api/telemetry/motors?start=<epoch s|ISO>&end=...&columns=rpm,temperature_c&source=M1&resolution=raw|1m|1h
+    Returns: {column: [...]} with timestamp_ns and source names; ?format=binary for an OQTB table
+    """
+    resolution = request.args.get("resolution", "raw")
+    if resolution != "raw" and resolution not in RESOLUTIONS:
+        return jsonify({"error": f"resolution must be raw or one of {sorted(RESOLUTIONS)}"}), 400
+    try:
+        start, end = _epoch_ns(request.args.get("start")), _epoch_ns(request.args.get("end"))
+    except ValueError:
+        return jsonify({"error": "start/end must be epoch seconds or ISO 8601"}), 400
+    columns = request.args.get("columns")
+    sources = request.args.get("source")
+    result = telemetry.query(stream, start, end, columns.split(",") if columns else None,
+                             sources.split(",") if sources else None, resolution)
+    if result is None:
+        return jsonify({"error": f"Unknown telemetry stream '{stream}'"}), 404
+
+    names = telemetry.decode_sources(stream, result.pop("source"))
+    if wants_binary(request):
+        return binary_response(encode_columns(names, result))
+    payload = {name: values.tolist() for name, values in result.items()}
+    payload["source"] = names
+    return jsonify(payload)
+
+# ------------------------ Twin Runtime ------------------------ #
+
+twins = TwinRuntime(scheduler, rate_hz=float(os.getenv("TWIN_SIM_HZ", 1)), run=run)
+
+@app.route("/api/twins/<name>/start", methods=["POST"])
+def start_twin(name):
+    try:
+        twin = twins.start(name)
+    except ValueError as e:  # components the simulators cannot take, e.g. a motor without an id
+        return jsonify({"error": f"Template '{name}' cannot run: {e}"}), 400
+    if twin is None:
+        return jsonify({"error": f"Template '{name}' not found"}), 404
+    return jsonify(twin.summary()), 201
+
+@app.route("/api/twins/<name>/stop", methods=["POST"])
+def stop_twin(name):
+    twin = twins.stop(name)
+    if twin is None:
+        return jsonify({"error": f"Twin '{name}' is not running"}), 404
+    return jsonify(twin.summary())
+
+@app.route("/api/twins/<name>", methods=["GET"])
+def twin_summary(name):
+    twin = twins.get(name)
+    if twin is None:
+        return jsonify({"error": f"Twin '{name}' is not running"}), 404
+    return jsonify(twin.summary())
+
+@app.route("/api/twins/<name>/<kind>", methods=["GET"])
+def twin_components(name, kind):
+    twin = twins.get(name)
+    if twin is None:
+        return jsonify({"error": f"Twin '{name}' is not running"}), 404
+    if kind == "sensors":
+        if wants_binary(request):
+            return binary_response(encode_columns(twin.sensor_ids, {"value": twin.sensor_values}))
+        return jsonify({"sensors": [{"id": i, "value": v} for i, v in zip(twin.sensor_ids, twin.sensor_values.tolist())]})
+    bank = {"motors": twin.motors, "arms": twin.arms}.get(kind)
+    if bank is None:
+        return jsonify({"error": f"Unknown component kind '{kind}'"}), 400
+    if wants_binary(request):
+        return binary_response(encode_columns(bank.ids, bank.snapshot()))
+    return jsonify({kind: [bank.state(row) for row in range(len(bank))]})
 
 # ------------------------ Run App with SocketIO ------------------------ #
 
@@ -0,0 +1,230 @@
+# anomaly_detector.py - Valencia Walker's
+# Incremental anomaly / threshold detection over simulator and sensor streams.
+#
+# Every channel (one motor's temperature, one sensor, ...) is a row of
+# preallocated state arrays, and each update advances any set of rows with a
+# fixed number of vectorized operations. That is O(1) per sample per channel
+# with no Python objects per channel. Rules, each checked against the state
+# *before* the new sample is folded in:
+#   high / low   value above / below a per-channel hard limit (NaN = off)
+#   zscore       |x - rolling mean| > z_threshold * rolling std over the last
+#                ``window`` samples (ring buffer + running sum / sum of squares)
+#   ewma         |x - EWMA| > ewma_threshold * EW standard deviation
+#   rate         |dx / dt| > per-channel max_rate (NaN = off)
+# Alerts are edge-triggered. A rule raises one alert when it starts firing
+# and one "cleared" event when it stops, so a stuck sensor cannot flood the
+# socket. Non-finite samples (NaN, inf) are skipped: folding one in would
+# poison the running sums and silence the channel for good.
+
+import threading
+from collections import deque
+import numpy as np
+
+RULES = ("high", "low", "zscore", "ewma", "rate")
+RESYNC_SAMPLES = 100_000  # recompute running sums from the ring to shed float drift
+
+
+class AnomalyDetector:
+    def __init__(self, capacity=1024, window=60, z_threshold=4.0, ewma_alpha=0.1, ewma_threshold=4.0,
+                 min_samples=10, on_alert=None, history=1000):
+        self.capacity = capacity
+        self.window = window
+        self.z_threshold = z_threshold
+        self.alpha = ewma_alpha
+        self.ewma_threshold = ewma_threshold
+        self.min_samples = min_samples
+        self.on_alert = on_alert  # fn(list of alert dicts)
+        self.recent = deque(maxlen=history)
+        self.lock = threading.Lock()
+        self.skipped = 0   # non-finite samples ignored
+        self.dropped = 0   # readings for channels that no longer fit
+
+        self.names = []
+        self.index = {}
+        self.ring = np.zeros((capacity, window))
+        self.seen = np.zeros(capacity, dtype=np.int64)
+        self.sum = np.zeros(capacity)
+        self.sumsq = np.zeros(capacity)
+        self.ewma = np.zeros(capacity)
+        self.ewvar = np.zeros(capacity)
+        self.last = np.zeros(capacity)
+        self.last_ns = np.zeros(capacity, dtype=np.int64)
+        self.high = np.full(capacity, np.nan)
+        self.low = np.full(capacity, np.nan)
+        self.max_rate = np.full(capacity, np.nan)
+        self.active = np.zeros((capacity, len(RULES)), dtype=bool)
+
+    def __len__(self):
+        return len(self.names)
+
+    # -------------------------------
+    # Channels
+    # -------------------------------
+
+    def channels(self, names, high=None, low=None, max_rate=None, strict=True):
+        """Rows for ``names``, registering new channels; limits (scalar or per name) are set when given.
+
+        When the detector is full a new name raises ValueError, or gets row -1
+        with ``strict=False`` (limits are then not applied).
+        """
+        with self.lock:
+            rows = np.empty(len(names), dtype=np.int64)
+            for i, name in enumerate(names):
+                row = self.index.get(name)
+                if row is None:
+                    if len(self.names) >= self.capacity:
+                        if strict:
+                            raise ValueError(f"Anomaly detector is full ({self.capacity} channels)")
+                        rows[i] = -1
+                        continue
+                    row = self.index[name] = len(self.names)
+                    self.names.append(name)
+                rows[i] = row
+            valid = rows >= 0
+            for column, limit in ((self.high, high), (self.low, low), (self.max_rate, max_rate)):
+                if limit is not None:
+                    column[rows[valid]] = limit if np.ndim(limit) == 0 else np.asarray(limit)[valid]
+        return rows
+
+    # -------------------------------
+    # Detection
+    # -------------------------------
+
+    def update(self, rows, values, timestamp_ns):
+        """Fold one sample per row into the state; returns the alert events raised by it.
+
+        ``rows`` must not repeat. ``timestamp_ns`` is a scalar or one per row.
+        """
+        rows = np.asarray(rows)
+        values = np.asarray(values, dtype=np.float64)
+        timestamps = np.broadcast_to(np.asarray(timestamp_ns, dtype=np.int64), values.shape)
+        finite = np.isfinite(values)
+        if not finite.all():
+            self.skipped += int(len(values) - finite.sum())
+            rows, values, timestamps = rows[finite], values[finite], timestamps[finite]
+            if len(rows) == 0:
+                return []
+        return self._update(self._selector(rows), rows, values, timestamps)
+
+    @staticmethod
+    def _selector(rows):
+        """A slice for a contiguous run of rows (basic indexing, no gathers), else the row array."""
+        rows = np.asarray(rows)
+        if len(rows) and rows[-1] - rows[0] == len(rows) - 1 and (np.diff(rows) == 1).all():
+            return slice(int(rows[0]), int(rows[-1]) + 1)
+        return rows
+
+    def _update(self, rows, row_ids, values, timestamps):
+        with self.lock:
+            seen = self.seen[rows].copy()  # slices give views; keep the pre-update state
+            count = np.minimum(seen, self.window)
+            safe = np.maximum(count, 1)
+            mean = self.sum[rows] / safe
+            std = np.sqrt(np.maximum(self.sumsq[rows] / safe - mean * mean, 0.0))
+            ewma, ewvar = self.ewma[rows].copy(), self.ewvar[rows].copy()
+            warm = seen >= self.min_samples
+            floor = 1e-9 + 1e-6 * np.abs(mean)
+
+            dt = (timestamps - self.last_ns[rows]) / 1e9
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rate = np.abs(values - self.last[rows]) / dt
+            fired = np.empty((len(values), len(RULES)), dtype=bool)
+            with np.errstate(invalid="ignore"):
+                fired[:, 0] = values > self.high[rows]
+                fired[:, 1] = values < self.low[rows]
+                fired[:, 2] = warm & (np.abs(values - mean) > self.z_threshold * np.maximum(std, floor))
+                fired[:, 3] = warm & (np.abs(values - ewma) > self.ewma_threshold * np.maximum(np.sqrt(ewvar), floor))
+                fired[:, 4] = (seen > 0) & (dt > 0) & (rate > self.max_rate[rows])
+
+            # Rolling window: replace the oldest sample in each row's ring
+            slot = seen % self.window
+            ring_rows = row_ids if isinstance(rows, slice) else rows
+            old = self.ring[ring_rows, slot]
+            self.ring[ring_rows, slot] = values
+            self.sum[rows] += values - old
+            self.sumsq[rows] += values * values - old * old
+            diff = values - ewma
+            self.ewma[rows] = np.where(seen > 0, ewma + self.alpha * diff, values)
+            self.ewvar[rows] = np.where(seen > 0, (1 - self.alpha) * (ewvar + self.alpha * diff * diff), 0.0)
+            self.last[rows] = values
+            self.last_ns[rows] = timestamps
+            self.seen[rows] = seen + 1
+            resync = row_ids[(seen + 1) % RESYNC_SAMPLES == 0]
+            if len(resync):
+                self.sum[resync] = self.ring[resync].sum(axis=1)
+                self.sumsq[resync] = (self.ring[resync] ** 2).sum(axis=1)
+
+            before = self.active[rows].copy()
+            self.active[rows] = fired
+            changed = np.argwhere(fired != before)
+        if len(changed) == 0:
+            return []
+
+        events = []
+        for i, rule in changed:
+            row = int(row_ids[i])
+            events.append({
+                "channel": self.names[row],
+                "rule": RULES[rule],
+                "state": "alert" if fired[i, rule] else "cleared",
+                "value": float(values[i]),
+                "mean": float(mean[i]),
+                "std": float(std[i]),
+                "ewma": float(ewma[i]),
+                "timestamp_ns": int(timestamps[i]),
+            })
+        self.recent.extend(events)
+        if self.on_alert is not None:
+            self.on_alert(events)
+        return events
+
+    def update_block(self, rows, timestamps_ns, values):
+        """Feed an (S, N) block sampled on a shared clock (e.g. SensorFleet.step output)."""
+        rows = np.asarray(rows)
+        selector = self._selector(rows)
+        values = np.asarray(values, dtype=np.float64)
+        events = []
+        for timestamp, row_values in zip(np.asarray(timestamps_ns, dtype=np.int64), values):
+            if np.isfinite(row_values).all():
+                events.extend(self._update(selector, rows, row_values, np.full(len(rows), timestamp)))
+            else:
+                events.extend(self.update(rows, row_values, timestamp))
+        return events
+
+    def update_readings(self, names, timestamps_ns, values):
+        """Feed a batch of readings in arrival order, where a channel may appear more than once.
+
+        New names are registered while capacity lasts; readings for names that
+        do not fit are dropped (counted in ``dropped``) rather than failing the batch.
+        """
+        rows = self.channels(names, strict=False)
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        known = rows >= 0
+        if not known.all():
+            self.dropped += int(len(rows) - known.sum())
+            rows, timestamps_ns, values = rows[known], timestamps_ns[known], values[known]
+        if len(rows) == 0:
+            return []
+        order = np.argsort(rows, kind="stable")
+        sorted_rows = rows[order]
+        starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+        rank = np.empty(len(rows), dtype=np.int64)
+        rank[order] = np.arange(len(rows)) - np.repeat(starts, np.diff(np.r_[starts, len(rows)]))
+        events = []
+        for r in range(int(rank.max()) + 1):  # one vectorized pass per repeat, not per reading
+            pick = rank == r
+            events.extend(self.update(rows[pick], values[pick], timestamps_ns[pick]))
+        return events
+
+    def status(self):
+        with self.lock:
+            active = np.argwhere(self.active[:len(self.names)])
+            return {
+                "channels": len(self.names),
+                "capacity": self.capacity,
+                "skipped": self.skipped,
+                "dropped": self.dropped,
+                "active": [{"channel": self.names[row], "rule": RULES[rule]} for row, rule in active],
+                "recent": list(self.recent)[-50:],
+            }
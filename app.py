@@ -5,9 +5,9 @@ from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
-import threading
 import time
 import eventlet
+import numpy as np
 
 eventlet.monkey_patch()
 load_dotenv()
@@ -16,10 +16,13 @@ from backend.cesium_manager import cesium_bp
 from backend.agents import run_ai_agent
 from backend.iot_simulator import simulate_temperature
 from backend.bom_marketplace import generate_bom, create_checkout_session, bom_api
-from backend.physics_sim import spin_motor_simulation, move_robot_arm
+from backend.physics_sim import move_robot_arm, step_motors, motors
 from backend.code_executor import execute_user_code
 from backend.templates_api import save_template, load_template
 from backend.utils import get_cesium_token
+from backend.scheduler import Scheduler
+from backend.sim_run import SimulationRun
+from backend.telemetry_store import TelemetryStore, MOTOR_FIELDS, ARM_FIELDS
 from backend.__init__ import register_routes
 from database.database import create_db_and_tables
 
@@ -59,20 +62,49 @@ def checkout():
     session = create_checkout_session(data)
     return jsonify(session)
 
-def emit_simulation_data():
-    while True:
-        motor_data = spin_motor_simulation()
-        arm_data = move_robot_arm(135)
-        temp_data = simulate_temperature()
-
-        # Example output: replace with socketio emit if real-time frontend integration
-        print("Motor Simulation Data:", motor_data)
-        print("Robot Arm Simulation Data:", arm_data)
-        print("Temperature Sensor Data:", temp_data)
-
-        time.sleep(1)
-
-threading.Thread(target=emit_simulation_data, daemon=True).start()
+# ------------------------ Simulation Scheduler ------------------------ #
+
+# SIM_SEED makes the run reproducible; every simulator draws from its own stream
+# (inputs are not recorded here, so runs cannot be replayed; see sim_run.py)
+run = SimulationRun(seed=os.getenv("SIM_SEED"))
+temperature_rng = run.random("temperature")
+
+telemetry = TelemetryStore(os.getenv("TELEMETRY_PATH", "telemetry"))
+
+# Example output: replace prints with socketio emit if real-time frontend integration
+def tick_motor(dt):
+    step_motors()
+    state = motors.state(0)
+    telemetry.append_state("motors", state, "motor_id", MOTOR_FIELDS)
+    print("Motor Simulation Data:", state)
+
+def tick_arm(dt):
+    state = move_robot_arm(135)
+    telemetry.append_state("arms", state, "arm_id", ARM_FIELDS)
+    print("Robot Arm Simulation Data:", state)
+
+def tick_temperature(dt):
+    reading = simulate_temperature(temperature_rng)
+    telemetry.append("sensors", time.time_ns(), reading["sensor"], value=np.float32(reading["value"]))
+    print("Temperature Sensor Data:", reading)
+
+def tick_rollup(dt):
+    telemetry.roll_up()
+
+scheduler = Scheduler()
+scheduler.register("motor", tick_motor, rate_hz=float(os.getenv("MOTOR_SIM_HZ", 1)))
+scheduler.register("arm", tick_arm, rate_hz=float(os.getenv("ARM_SIM_HZ", 1)))
+scheduler.register("temperature", tick_temperature, rate_hz=float(os.getenv("TEMP_SIM_HZ", 1)), policy="drop")
+scheduler.register("telemetry_rollup", tick_rollup, rate_hz=1 / 60, policy="drop")
+scheduler.start()
+
+@app.route("/api/run", methods=["GET"])
+def run_info():
+    return jsonify(run.info())
+
+@app.route("/api/scheduler/stats", methods=["GET"])
+def scheduler_stats():
+    return jsonify(scheduler.stats())
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
@@ -0,0 +1,274 @@
+# batch_sim.py - Valencia Walker's
+# Headless, faster-than-real-time parameter sweeps for the motor thermal and
+# arm servo models. Every parameter combination is one row of a MotorBank /
+# ArmBank, so a whole chunk of the sweep advances in one vectorized step with
+# no sleeping. Chunks of combinations run across a process pool, and results
+# come back as columnar arrays (saved with numpy.savez_compressed):
+#   parameter columns        shape (combos,)
+#   time series              shape (samples, combos), one sample every record_every frames
+#   failure_time_s           shape (combos,), -1 where the model never failed
+#
+# SweepQueue runs whole sweeps in worker processes for the HTTP API, so a
+# request only queues a job and clients poll for it and fetch the .npz.
+#
+#   python -m backend.batch_sim motor --target-rpm 1500,3200 --heat-rate 0.25,0.5,0.75 --hours 2
+#   python -m backend.batch_sim arm --speed-dps 30,45,90 --target-deg 90,180 --hours 1 --out arm.npz
+
+import argparse
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from backend.physics_sim import (MotorBank, ArmBank, MOTOR_FRAME_S, ARM_FRAME_S,
+                                 REACHED, MIN_DEG)
+
+MOTOR_SWEEP_PARAMS = ("target_rpm", "heat_rate", "cooling_rate", "step_rpm", "max_temp")
+ARM_SWEEP_PARAMS = ("speed_dps", "target_deg")
+CHUNK_FRAMES = 3600  # frames advanced between progress checks / early exit
+
+
+def parameter_grid(values):
+    """Cartesian product of {name: [values]} as {name: ndarray(combos)}."""
+    names = list(values)
+    combos = list(itertools.product(*(values[name] for name in names)))
+    return {name: np.array([combo[i] for combo in combos]) for i, name in enumerate(names)}
+
+
+def _recorder(frames, record_every, count, channels):
+    samples = frames // record_every
+    return {name: np.zeros((samples, count), dtype=dtype) for name, dtype in channels.items()}
+
+
+def run_motor_chunk(params, frames, record_every):
+    """Step one MotorBank row per combination for ``frames`` frames."""
+    count = len(next(iter(params.values())))
+    bank = MotorBank(capacity=count)
+    bank.add_many([str(i) for i in range(count)], **params)
+    out = _recorder(frames, record_every, count,
+                    {"rpm": np.int64, "temperature_c": np.float32, "torque_nm": np.float32})
+    failure_frame = np.full(count, -1, dtype=np.int64)
+
+    for frame in range(frames):
+        bank.step()
+        failed_now = bank.overheat & (failure_frame < 0)
+        failure_frame[failed_now] = frame
+        if (frame + 1) % record_every == 0:
+            sample = (frame + 1) // record_every - 1
+            out["rpm"][sample] = bank.rpm
+            out["temperature_c"][sample] = bank.temperature_c
+            out["torque_nm"][sample] = bank.torque_nm
+        # A fully failed chunk is frozen; fill the rest of the series and stop early.
+        if frame % CHUNK_FRAMES == 0 and bank.overheat.all():
+            sample = (frame + 1) // record_every
+            for name in out:
+                out[name][sample:] = getattr(bank, name)
+            break
+
+    out["failure_time_s"] = np.where(failure_frame >= 0, (failure_frame + 1) * MOTOR_FRAME_S, -1.0)
+    return out
+
+
+def run_arm_chunk(params, frames, record_every):
+    """Sweep arms back and forth between MIN_DEG and target_deg for ``frames`` frames."""
+    count = len(next(iter(params.values())))
+    targets = np.asarray(params.get("target_deg", np.full(count, 180.0)), dtype=np.float64)
+    bank = ArmBank(capacity=count)
+    bank.add_many([str(i) for i in range(count)],
+                  **{k: v for k, v in params.items() if k != "target_deg"})
+    bank.set_targets(None, targets)
+    out = _recorder(frames, record_every, count,
+                    {"current_position_deg": np.float32, "temperature_c": np.float32,
+                     "servo_load": np.float32})
+    failure_frame = np.full(count, -1, dtype=np.int64)
+
+    for frame in range(frames):
+        bank.step()
+        failed_now = bank.servo_fail & (failure_frame < 0)
+        failure_frame[failed_now] = frame
+        reached = np.flatnonzero(bank.movement == REACHED)
+        if reached.size:
+            at_home = bank.target_position_deg[reached] == MIN_DEG
+            bank.set_targets(reached, np.where(at_home, targets[reached], MIN_DEG))
+        if (frame + 1) % record_every == 0:
+            sample = (frame + 1) // record_every - 1
+            for name in out:
+                out[name][sample] = getattr(bank, name)
+
+    out["failure_time_s"] = np.where(failure_frame >= 0, (failure_frame + 1) * ARM_FRAME_S, -1.0)
+    return out
+
+
+RUNNERS = {
+    "motor": (run_motor_chunk, MOTOR_FRAME_S),
+    "arm": (run_arm_chunk, ARM_FRAME_S),
+}
+
+
+def _run_chunk(job):
+    kind, params, frames, record_every = job
+    return RUNNERS[kind][0](params, frames, record_every)
+
+
+def sweep(kind, grid, seconds, record_every_s=60.0, workers=None, chunk_size=256):
+    """Run every combination of ``grid`` for ``seconds`` of simulated time.
+
+    Returns a dict of columnar arrays: the parameter columns plus each chunk's
+    outputs concatenated along the combination axis.
+    """
+    run, frame_s = RUNNERS[kind]
+    params = parameter_grid(grid)
+    count = len(next(iter(params.values()))) if params else 0
+    frames = int(round(seconds / frame_s))
+    record_every = max(1, int(round(record_every_s / frame_s)))
+
+    jobs = [(kind, {name: column[start:start + chunk_size] for name, column in params.items()},
+             frames, record_every)
+            for start in range(0, count, chunk_size)]
+    if workers == 1 or len(jobs) <= 1:
+        chunks = [_run_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_run_chunk, jobs))
+
+    results = dict(params)
+    for name in chunks[0] if chunks else []:
+        axis = 0 if chunks[0][name].ndim == 1 else 1
+        results[name] = np.concatenate([chunk[name] for chunk in chunks], axis=axis)
+    results["sample_time_s"] = np.arange(1, frames // record_every + 1) * record_every * frame_s
+    return results
+
+
+# -------------------------------
+# Background sweep jobs
+# -------------------------------
+
+def _sweep_to_file(kind, grid, seconds, record_every_s, workers, path):
+    """Worker-process entry: run one sweep and save it to ``path``; returns the combination count."""
+    results = sweep(kind, grid, seconds, record_every_s, workers)
+    temp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp, "wb") as f:
+        np.savez_compressed(f, **results)
+    os.replace(temp, path)
+    return len(results["failure_time_s"])
+
+
+class SweepQueue:
+    """Runs sweeps in ``workers`` background processes; results are saved as <job id>.npz in ``directory``.
+
+    Each sweep spreads its chunks over ``sweep_workers`` more processes (None
+    = one per CPU). Only the newest ``max_jobs`` finished jobs and their files are kept.
+    """
+
+    def __init__(self, directory, workers=1, sweep_workers=None, max_queued=8, max_jobs=100):
+        self.directory = directory
+        self.workers = workers
+        self.sweep_workers = sweep_workers
+        self.max_queued = max_queued
+        self.max_jobs = max_jobs
+        self.pool = None  # started on the first submit
+        self.jobs = OrderedDict()  # job id -> state dict
+        self.futures = {}  # job id -> Future of a job not finished yet
+        self.lock = threading.Lock()
+
+    def submit(self, kind, grid, seconds, record_every_s=60.0):
+        """Queue a sweep and return its job; raises OverflowError when the queue is full."""
+        with self.lock:
+            if len(self.futures) >= self.max_queued:
+                raise OverflowError(f"Sweep queue is full ({self.max_queued} jobs)")
+            if self.pool is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            job = {
+                "id": uuid.uuid4().hex,
+                "kind": kind,
+                "grid": grid,
+                "seconds": seconds,
+                "record_every_s": record_every_s,
+                "state": "queued",
+                "combinations": None,
+                "error": None,
+                "created": time.time(),
+                "finished": None,
+            }
+            path = os.path.join(self.directory, f"{job['id']}.npz")
+            future = self.pool.submit(_sweep_to_file, kind, grid, seconds, record_every_s, self.sweep_workers, path)
+            self.jobs[job["id"]] = job
+            self.futures[job["id"]] = future
+            self._trim()
+            snapshot = dict(job)
+        # Outside the lock: the callback runs right here if the future is already done
+        future.add_done_callback(lambda done, job=job: self._finish(job, done))
+        return snapshot
+
+    def _finish(self, job, future):
+        error = future.exception()
+        with self.lock:
+            self.futures.pop(job["id"], None)
+            if error is None:
+                job.update(state="done", combinations=future.result())
+            else:
+                job.update(state="failed", error=str(error) or type(error).__name__)
+            job["finished"] = time.time()
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["state"] in ("done", "failed")]
+        for job_id in finished[:max(len(self.jobs) - self.max_jobs, 0)]:
+            del self.jobs[job_id]
+            try:
+                os.remove(self.result_path(job_id))
+            except FileNotFoundError:
+                pass
+
+    def status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            future = self.futures.get(job_id)
+        if job["state"] == "queued" and future is not None and future.running():
+            job["state"] = "running"
+        return job
+
+    def result_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.npz")
+
+    def stats(self):
+        with self.lock:
+            states = [job["state"] for job in self.jobs.values()]
+        return {state: states.count(state) for state in ("queued", "done", "failed")}
+
+
+def _floats(raw):
+    return [float(v) for v in raw.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless motor / arm parameter sweep.")
+    parser.add_argument("kind", choices=sorted(RUNNERS))
+    parser.add_argument("--target-rpm", type=_floats, help="motor: comma-separated target RPMs")
+    parser.add_argument("--heat-rate", type=_floats, help="motor: comma-separated heat rates (C per frame)")
+    parser.add_argument("--speed-dps", type=_floats, help="arm: comma-separated servo speeds (deg/s)")
+    parser.add_argument("--target-deg", type=_floats, help="arm: comma-separated sweep amplitudes (deg)")
+    parser.add_argument("--hours", type=float, default=1.0, help="simulated hours per combination")
+    parser.add_argument("--record-every", type=float, default=60.0, help="simulated seconds between samples")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=256, help="combinations per worker job")
+    parser.add_argument("--out", default="sweep.npz")
+    args = parser.parse_args()
+
+    names = MOTOR_SWEEP_PARAMS if args.kind == "motor" else ARM_SWEEP_PARAMS
+    grid = {name: getattr(args, name) for name in names if getattr(args, name, None)}
+    if not grid:
+        parser.error("give at least one sweep parameter for " + args.kind)
+
+    results = sweep(args.kind, grid, args.hours * 3600, args.record_every, args.workers, args.chunk_size)
+    np.savez_compressed(args.out, **results)
+    failed = int((results["failure_time_s"] >= 0).sum())
+    print(f"{len(results['failure_time_s'])} combinations x {args.hours}h simulated -> {args.out} "
+          f"({failed} failed)")
@@ -1,10 +1,18 @@
 # Valencia Walker's cesium_manager.py
 # backend/cesium_manager.py – Valencia Walker's Updated
+#
+# Uploads run in the background through an UploadQueue (see cesium_upload.py):
+# routes save the model to UPLOAD_DIR, queue a job and answer 202 with the job,
+# and clients poll /api/upload_model/jobs/<job_id> for progress and the asset id.
+# Uploads are hashed while they are written to disk; content already uploaded
+# (or still uploading) is answered from the local AssetIndex without a new job.
 
+import hashlib
 import os
-import requests
+import uuid
 from flask import Blueprint, request, jsonify
 from dotenv import load_dotenv
+from backend.cesium_upload import UploadQueue, AssetIndex, file_digest, CHUNK_BYTES
 
 load_dotenv()
 
@@ -14,35 +22,125 @@ HEADERS = {
     "Authorization": f"Bearer {CESIUM_ACCESS_TOKEN}"
 }
 
-UPLOAD_URL = "https://api.cesium.com/v1/assets"
+UPLOAD_URL = os.getenv("CESIUM_UPLOAD_URL", "https://api.cesium.com/v1/assets")
+UPLOAD_DIR = os.getenv("CESIUM_UPLOAD_DIR", "uploads")
+MODELS_DIR = os.getenv("CESIUM_MODELS_DIR", "models")  # only files under here can be uploaded by path
+
+uploads = UploadQueue(UPLOAD_URL, HEADERS,
+                      workers=int(os.getenv("CESIUM_UPLOAD_WORKERS", 2)),
+                      retries=int(os.getenv("CESIUM_UPLOAD_RETRIES", 4)),
+                      backoff_s=float(os.getenv("CESIUM_UPLOAD_BACKOFF_S", 1.0)),
+                      max_queued=int(os.getenv("CESIUM_UPLOAD_MAX_QUEUED", 64)))
+
+# Content hash -> Cesium asset id of everything uploaded so far
+asset_index = AssetIndex(os.getenv("CESIUM_ASSET_INDEX", os.path.join(UPLOAD_DIR, "asset_index.json")))
+
+
+def upload_asset_to_cesium(path, name=None, asset_type="3D Tiles", remove_after=False, digest=None):
+    """Queue a file on disk for upload; returns the job (raises OverflowError when the queue is full).
+
+    With a content ``digest``, a file already uploaded returns {"state": "done",
+    "asset_id", "duplicate": true} at once, and one still uploading returns
+    that upload's job, instead of sending it again.
+    """
+    if digest is None:
+        return uploads.submit(path, name=name, asset_type=asset_type, remove_after=remove_after)
+
+    def record(job):
+        asset_index.put(digest, job["asset_id"], job["name"], asset_type)
+
+    with asset_index.lock:
+        known = asset_index.assets.get(digest)
+        job = None
+        if known is None:
+            job_id = asset_index.pending.get(digest)
+            job = uploads.status(job_id) if job_id else None
+            if job is None or job["state"] == "failed":
+                job = uploads.submit(path, name=name, asset_type=asset_type, on_done=record,
+                                     remove_after=remove_after)
+                asset_index.pending[digest] = job["id"]
+                return job
+    if remove_after:
+        os.remove(path)
+    if known is not None:
+        job = {"state": "done", "asset_id": known["asset_id"], "name": known["name"], "type": known["type"]}
+    job["duplicate"] = True
+    return job
+
+
+def resolve_model_path(model_path):
+    """Real path of ``model_path`` if it lies inside MODELS_DIR, else None."""
+    if not model_path:
+        return None
+    root = os.path.realpath(MODELS_DIR)
+    path = os.path.realpath(os.path.join(root, model_path))
+    if os.path.commonpath([root, path]) != root:
+        return None
+    return path
+
+
+def upload_model_to_cesium(model_path):
+    """Queue a model under MODELS_DIR; returns the job, or None if there is no such model.
+
+    Raises PermissionError for paths outside MODELS_DIR (e.g. "../.env").
+    """
+    path = resolve_model_path(model_path)
+    if path is None:
+        raise PermissionError(f"Models must be inside '{MODELS_DIR}'")
+    if not os.path.isfile(path):
+        return None
+    return upload_asset_to_cesium(path, digest=file_digest(path))
+
+
+def save_upload(file, directory=UPLOAD_DIR, salt=b""):
+    """Stream an uploaded werkzeug file to a unique path in ``directory``, hashing it on the way.
+
+    Returns (path, SHA-256 hex digest of ``salt`` + content).
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4().hex[:12]}_{os.path.basename(file.filename)}")
+    hasher = hashlib.sha256(salt)
+    with open(path, "wb") as out:
+        for chunk in iter(lambda: file.stream.read(CHUNK_BYTES), b""):
+            hasher.update(chunk)
+            out.write(chunk)
+    return path, hasher.hexdigest()
+
 
 cesium_bp = Blueprint('cesium', __name__)
 
 @cesium_bp.route("/api/upload_model", methods=["POST"])
 def upload_model():
+    """
+    POST /api/upload_model  (multipart, field "model")
+    Returns: 202 with the upload job; poll /api/upload_model/jobs/<id>
+             200 with the asset_id when the same content was uploaded before
+    """
     file = request.files.get("model")
-    if not file:
+    if not file or not file.filename:
         return jsonify({"error": "No file uploaded"}), 400
 
-    # Upload to Cesium Ion
-    files = {
-        "file": (file.filename, file.stream, file.mimetype)
-    }
-    data = {
-        "name": file.filename,
-        "type": "3D Tiles"
-    }
-
-    response = requests.post(UPLOAD_URL, headers=HEADERS, data=data, files=files)
-
-    if response.status_code == 201:
-        asset_info = response.json()
-        return jsonify({
-            "message": "Upload successful",
-            "asset_id": asset_info["id"]
-        })
-    else:
-        return jsonify({
-            "error": "Cesium upload failed",
-            "details": response.text
-        }), 500
+    path, digest = save_upload(file)
+    try:
+        job = upload_asset_to_cesium(path, file.filename, remove_after=True, digest=digest)
+    except OverflowError as e:
+        os.remove(path)
+        return jsonify({"error": str(e)}), 429, {"Retry-After": "5"}
+    if job.get("duplicate") and job["state"] == "done":
+        return jsonify({"message": "Already uploaded", "asset_id": job["asset_id"], "job": job})
+    return jsonify({"message": "Upload queued", "job": job}), 202
+
+@cesium_bp.route("/api/upload_model/jobs", methods=["GET"])
+def upload_jobs():
+    return jsonify({"jobs": uploads.list(), "stats": uploads.stats()})
+
+@cesium_bp.route("/api/upload_model/jobs/<job_id>", methods=["GET"])
+def upload_job(job_id):
+    """
+    GET /api/upload_model/jobs/<job_id>
+    Returns: {state: queued|uploading|retrying|done|failed, bytes_sent, bytes_total, attempts, asset_id, error}
+    """
+    job = uploads.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown upload job"}), 404
+    return jsonify(job)
@@ -1,13 +1,21 @@
 # Valencia Walker's Cesium_routes.py
 
 from flask import Blueprint, request, jsonify
-from backend.cesium_manager import upload_asset_to_cesium
+from backend.cesium_manager import upload_asset_to_cesium, save_upload, uploads, asset_index
+from backend.tiler import build_tileset
+import json
 import os
+import shutil
 
 cesium_bp = Blueprint("cesium", __name__, url_prefix="/api/cesium")
 
 @cesium_bp.route("/upload", methods=["POST"])
 def upload_model():
+    """
+    POST /api/cesium/upload  (multipart, field "file"; optional form field "origin" for .json)
+    Returns: 202 with the upload job; poll /api/cesium/jobs/<id> for progress and the asset id
+             200 with the asset_id when the same content (and origin) was uploaded before
+    """
     if "file" not in request.files:
         return jsonify({"error": "No file part"}), 400
 
@@ -16,12 +24,84 @@ def upload_model():
         return jsonify({"error": "No selected file"}), 400
 
     filename = file.filename
-    save_path = os.path.join("uploads", filename)
-    os.makedirs("uploads", exist_ok=True)
-    file.save(save_path)
+    origin = request.form.get("origin")
+    is_schematic = filename.lower().endswith(".json")
+    # The tileset depends on the origin too, so it is part of a schematic's content key
+    save_path, digest = save_upload(file, salt=f"origin={origin}\n".encode("utf-8") if is_schematic else b"")
 
+    tiles_dir = os.path.splitext(save_path)[0] + "_tiles"
+    upload_path = save_path
     try:
-        asset_id = upload_asset_to_cesium(save_path, filename)
-        return jsonify({"asset_id": asset_id}), 201
+        known = asset_index.get(digest)
+        if known is not None:  # same content uploaded before: skip tiling and Cesium entirely
+            os.remove(save_path)
+            return jsonify({"asset_id": known["asset_id"], "duplicate": True}), 200
+        # Schematic/template JSON is tiled into LOD 3D Tiles and uploaded as a zip
+        if is_schematic:
+            upload_path = tile_schematic(save_path, origin)
+            os.remove(save_path)
+            shutil.rmtree(tiles_dir, ignore_errors=True)
+        job = upload_asset_to_cesium(upload_path, filename, remove_after=True, digest=digest)
+        if job.get("duplicate") and job["state"] == "done":
+            return jsonify({"asset_id": job["asset_id"], "duplicate": True}), 200
+        return jsonify({"job": job}), 202
+    except OverflowError as e:
+        _discard(save_path, upload_path, tiles_dir)
+        return jsonify({"error": str(e)}), 429, {"Retry-After": "5"}
     except Exception as e:
+        # e.g. a schematic that fails to tile: don't leave the upload or its tiles behind
+        _discard(save_path, upload_path, tiles_dir, tiles_dir + ".zip")
         return jsonify({"error": str(e)}), 500
+
+
+def _discard(*paths):
+    for path in paths:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+@cesium_bp.route("/jobs", methods=["GET"])
+def upload_jobs():
+    return jsonify({"jobs": uploads.list(), "stats": uploads.stats()})
+
+
+@cesium_bp.route("/jobs/<job_id>", methods=["GET"])
+def upload_job(job_id):
+    """
+    GET /api/cesium/jobs/<job_id>
+    Returns: {state: queued|uploading|retrying|done|failed, bytes_sent, bytes_total, attempts, asset_id, error}
+    """
+    job = uploads.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown upload job"}), 404
+    return jsonify(job)
+
+
+@cesium_bp.route("/index/<asset_id>", methods=["DELETE"])
+def forget_asset(asset_id):
+    """
+    DELETE /api/cesium/index/<asset_id>
+    Forgets the local content-hash mapping for an asset (e.g. after deleting it in Cesium Ion),
+    so the next upload of the same content goes to Cesium again.
+    Returns: {"removed": n}; 404 if the asset was not indexed
+    """
+    removed = asset_index.forget(asset_id)
+    if not removed:
+        return jsonify({"error": "Asset not in the upload index"}), 404
+    return jsonify({"removed": removed})
+
+
+def tile_schematic(json_path, origin=None):
+    """Tile a components JSON next to it and return the path of the zipped tileset."""
+    with open(json_path) as f:
+        components = json.load(f).get("components", [])
+    out_dir = os.path.splitext(json_path)[0] + "_tiles"
+    shutil.rmtree(out_dir, ignore_errors=True)
+    origin = tuple(float(v) for v in origin.split(",")) if origin else None
+    build_tileset(components, out_dir, origin=origin)
+    return shutil.make_archive(out_dir, "zip", out_dir)
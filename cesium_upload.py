@@ -0,0 +1,327 @@
+# cesium_upload.py - Valencia Walker's
+# Background upload queue for Cesium Ion assets.
+#
+# Request handlers only put the file on disk and call submit(), which returns
+# a job id immediately. A fixed pool of worker threads, the concurrency limit,
+# uploads the queued files over one pooled requests.Session, so connections
+# and TLS sessions are reused across uploads. Each file is streamed from disk
+# as a multipart/form-data body with a known Content-Length and is never read
+# into memory whole. Connection errors, timeouts, 429s and 5xx responses are
+# retried with exponential backoff (honouring Retry-After). Job state, with
+# bytes sent for progress, is kept in memory for the status endpoints.
+#
+# AssetIndex maps the SHA-256 of uploaded content to the Cesium asset it
+# became (persisted as JSON), plus the job of any upload still in flight, so
+# the same file uploaded again resolves without a round-trip to Cesium Ion.
+
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.utils import atomic_write
+
+DEFAULT_WORKERS = 2
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF_S = 1.0
+MAX_BACKOFF_S = 60.0
+DEFAULT_MAX_QUEUED = 64
+DEFAULT_MAX_JOBS = 1000      # finished jobs kept for status queries
+CHUNK_BYTES = 1024 * 1024
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+log = logging.getLogger(__name__)
+
+
+class UploadError(Exception):
+    def __init__(self, message, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class MultipartFile:
+    """File-like multipart/form-data body that streams one file from disk.
+
+    ``len()`` is known up front, so requests sends a Content-Length instead of
+    chunked transfer encoding; ``sent`` counts file bytes handed to the socket.
+    """
+
+    def __init__(self, path, fields, field_name="file", filename=None, content_type="application/octet-stream"):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode("utf-8")
+            for key, value in fields.items())
+        filename = (filename or os.path.basename(path)).replace('"', "")
+        head += (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+                 f"Content-Type: {content_type}\r\n\r\n").encode("utf-8")
+        self.parts = [head, None, f"\r\n--{self.boundary}--\r\n".encode("utf-8")]
+        self.file = open(path, "rb")
+        self.length = len(head) + os.fstat(self.file.fileno()).st_size + len(self.parts[2])
+        self.part = 0
+        self.offset = 0
+        self.sent = 0
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.length
+        out = []
+        while size > 0 and self.part < len(self.parts):
+            if self.parts[self.part] is None:
+                chunk = self.file.read(min(size, CHUNK_BYTES))
+                if not chunk:
+                    self.part += 1
+                    continue
+                self.sent += len(chunk)
+            else:
+                chunk = self.parts[self.part][self.offset:self.offset + size]
+                self.offset += len(chunk)
+                if self.offset >= len(self.parts[self.part]):
+                    self.part, self.offset = self.part + 1, 0
+            out.append(chunk)
+            size -= len(chunk)
+        return b"".join(out)
+
+    def close(self):
+        self.file.close()
+
+
+class UploadQueue:
+    def __init__(self, url, headers=None, workers=DEFAULT_WORKERS, retries=DEFAULT_RETRIES,
+                 backoff_s=DEFAULT_BACKOFF_S, timeout_s=(10, 300), max_queued=DEFAULT_MAX_QUEUED,
+                 max_jobs=DEFAULT_MAX_JOBS, session=None):
+        self.url = url
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.timeout_s = timeout_s  # (connect, read) seconds
+        self.max_queued = max_queued
+        self.max_jobs = max_jobs
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(headers or {})
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cesium-upload")
+        self.jobs = OrderedDict()  # job id -> state dict
+        self.bodies = {}  # job id -> MultipartFile being sent, for progress
+        self.lock = threading.Lock()
+
+    # -------------------------------
+    # Jobs
+    # -------------------------------
+
+    def submit(self, path, name=None, asset_type="3D Tiles", on_done=None, remove_after=False):
+        """Queue ``path`` for upload and return its job; raises OverflowError when the queue is full.
+
+        ``on_done(job)`` runs on the worker thread once the job succeeds.
+        """
+        with self.lock:
+            waiting = sum(job["state"] in ("queued", "uploading", "retrying") for job in self.jobs.values())
+            if waiting >= self.max_queued:
+                raise OverflowError(f"Upload queue is full ({self.max_queued} jobs)")
+            job = {
+                "id": uuid.uuid4().hex,
+                "name": name or os.path.basename(path),
+                "type": asset_type,
+                "path": path,
+                "state": "queued",
+                "bytes_total": os.path.getsize(path),
+                "bytes_sent": 0,
+                "attempts": 0,
+                "asset_id": None,
+                "error": None,
+                "created": time.time(),
+                "finished": None,
+            }
+            self.jobs[job["id"]] = job
+            self._trim()
+            snapshot = dict(job)
+        self.pool.submit(self._run, job, on_done, remove_after)
+        return snapshot
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["state"] in ("done", "failed")]
+        for job_id in finished[:max(len(self.jobs) - self.max_jobs, 0)]:
+            del self.jobs[job_id]
+
+    def status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            body = self.bodies.get(job_id)
+        if body is not None:
+            job["bytes_sent"] = body.sent
+        return job
+
+    def list(self):
+        with self.lock:
+            job_ids = list(self.jobs)
+        return [self.status(job_id) for job_id in job_ids]
+
+    def wait(self, job_id, timeout=None, poll_s=0.1):
+        """Block until the job finishes (or ``timeout`` seconds pass); returns its state."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.status(job_id)
+            if job is None or job["state"] in ("done", "failed"):
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(poll_s)
+
+    # -------------------------------
+    # Worker
+    # -------------------------------
+
+    def _update(self, job, **changes):
+        with self.lock:
+            job.update(changes)
+
+    def _run(self, job, on_done, remove_after):
+        try:
+            for attempt in range(self.retries + 1):
+                self._update(job, state="uploading", attempts=attempt + 1)
+                try:
+                    asset_id = self._attempt(job)
+                except UploadError as e:
+                    if not e.retryable or attempt == self.retries:
+                        raise
+                    delay = e.retry_after
+                    if delay is None:
+                        delay = min(self.backoff_s * 2 ** attempt, MAX_BACKOFF_S) * random.uniform(0.5, 1.0)
+                    delay = min(delay, MAX_BACKOFF_S)  # a huge Retry-After must not park a worker for hours
+                    log.warning("Cesium upload %s attempt %d failed (%s); retrying in %.1fs",
+                                job["name"], attempt + 1, e, delay)
+                    self._update(job, state="retrying", error=str(e))
+                    time.sleep(delay)
+                    continue
+                self._update(job, state="done", asset_id=asset_id, error=None,
+                             bytes_sent=job["bytes_total"], finished=time.time())
+                if on_done is not None:
+                    try:
+                        on_done(dict(job))
+                    except Exception:
+                        log.exception("Cesium upload %s: on_done callback failed", job["name"])
+                return
+        except UploadError as e:
+            log.error("Cesium upload %s failed: %s", job["name"], e)
+            self._update(job, state="failed", error=str(e), finished=time.time())
+        except Exception as e:
+            log.exception("Cesium upload %s failed", job["name"])
+            self._update(job, state="failed", error=str(e), finished=time.time())
+        finally:
+            if remove_after:
+                try:
+                    os.remove(job["path"])
+                except OSError:
+                    pass
+
+    def _attempt(self, job):
+        """One upload attempt; returns the asset id or raises UploadError."""
+        try:
+            body = MultipartFile(job["path"], {"name": job["name"], "type": job["type"]})
+        except OSError as e:
+            raise UploadError(f"cannot read {job['path']}: {e}")
+        with self.lock:
+            self.bodies[job["id"]] = body
+        try:
+            response = self.session.post(self.url, data=body, timeout=self.timeout_s,
+                                         headers={"Content-Type": body.content_type})
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise UploadError(str(e), retryable=True)
+        finally:
+            body.close()
+            with self.lock:
+                self.bodies.pop(job["id"], None)
+                job["bytes_sent"] = body.sent
+
+        if response.status_code in (200, 201):
+            try:
+                info = response.json()
+                return info["id"] if "id" in info else info["assetMetadata"]["id"]
+            except (ValueError, KeyError, TypeError):
+                raise UploadError(f"unexpected response: {response.text[:200]}")
+        retry_after = response.headers.get("Retry-After")
+        raise UploadError(f"HTTP {response.status_code}: {response.text[:200]}",
+                          retryable=response.status_code in RETRY_STATUSES,
+                          retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+    def stats(self):
+        with self.lock:
+            states = [job["state"] for job in self.jobs.values()]
+        return {state: states.count(state) for state in ("queued", "uploading", "retrying", "done", "failed")}
+
+
+# -------------------------------
+# Content-hash dedup
+# -------------------------------
+
+def file_digest(path, salt=b""):
+    """SHA-256 hex digest of ``salt`` + the file's bytes, read in chunks."""
+    hasher = hashlib.sha256(salt)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class AssetIndex:
+    """SHA-256 of uploaded content -> {asset_id, name, type, uploaded}, persisted as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = {}  # digest -> id of the job uploading it
+        self.assets = {}
+        try:
+            with open(path) as f:
+                assets = json.load(f)
+            if not isinstance(assets, dict):
+                raise ValueError("not a JSON object")
+            self.assets = assets
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:  # a corrupt index only costs re-uploads, never startup
+            log.warning("Ignoring unreadable Cesium asset index %s: %s", path, e)
+
+    def __len__(self):
+        return len(self.assets)
+
+    def get(self, digest):
+        with self.lock:
+            return self.assets.get(digest)
+
+    def put(self, digest, asset_id, name=None, asset_type=None):
+        with self.lock:
+            self.assets[digest] = {"asset_id": asset_id, "name": name, "type": asset_type, "uploaded": time.time()}
+            self.pending.pop(digest, None)
+            self._write()
+
+    def forget(self, asset_id):
+        """Drop every hash mapped to ``asset_id`` (e.g. deleted in Cesium Ion); returns how many."""
+        with self.lock:
+            digests = [digest for digest, info in self.assets.items() if str(info["asset_id"]) == str(asset_id)]
+            for digest in digests:
+                del self.assets[digest]
+            if digests:
+                self._write()
+            return len(digests)
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        atomic_write(self.path, json.dumps(self.assets).encode("utf-8"))
@@ -0,0 +1,87 @@
+# drone_stream.py - Valencia Walker's
+# Turns successive DroneSwarm states into a sequenced push stream:
+#   drones_keyframe  full snapshot (periodic, on connect, on resync)
+#   drones_delta     ids + positions of drones that moved past the threshold
+#   drones_spawned   drones added since the last message
+#   drones_cleared   fleet emptied
+# Every broadcast message carries seq = previous seq + 1, so a client that
+# sees a gap asks for a keyframe instead of applying deltas to stale state.
+
+import numpy as np
+from drone_swarm import LON, LAT
+from spatial_index import METERS_PER_DEG_LON, METERS_PER_DEG_LAT
+
+DELTA_THRESHOLD_M = 1.0   # minimum movement before a drone is re-sent
+KEYFRAME_INTERVAL = 30    # ticks between broadcast keyframes
+
+
+class DeltaEncoder:
+    """Tracks the last position sent for every swarm row and encodes changes."""
+
+    def __init__(self, threshold_m=DELTA_THRESHOLD_M, keyframe_interval=KEYFRAME_INTERVAL):
+        self.threshold_m = threshold_m
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self.ticks_since_keyframe = 0
+        self.sent = np.zeros((0, 3))
+
+    def _next_seq(self):
+        self.seq += 1
+        return self.seq
+
+    def _mark_sent(self, swarm, rows=None):
+        n = swarm.count
+        if len(self.sent) < n:
+            grown = np.zeros((max(n, 2 * len(self.sent)), 3))
+            grown[:len(self.sent)] = self.sent
+            self.sent = grown
+        if rows is None:
+            self.sent[:n] = swarm.positions[:n]
+        else:
+            self.sent[rows] = swarm.positions[rows]
+
+    # -------------------------------
+    # Discrete Events
+    # -------------------------------
+
+    def keyframe(self, swarm, broadcast=True):
+        """Full snapshot. Per-client resync keyframes reuse the current seq."""
+        if broadcast:
+            self._mark_sent(swarm)
+            self.ticks_since_keyframe = 0
+            seq = self._next_seq()
+        else:
+            seq = self.seq
+        return {'seq': seq, 'drones': swarm.to_dicts()}
+
+    def spawned(self, swarm, rows):
+        self._mark_sent(swarm, rows)
+        return {'seq': self._next_seq(), 'drones': swarm.to_dicts(rows)}
+
+    def cleared(self):
+        self.ticks_since_keyframe = 0
+        return {'seq': self._next_seq()}
+
+    # -------------------------------
+    # Per-Tick Encoding
+    # -------------------------------
+
+    def tick(self, swarm):
+        """Returns (event, payload) for this tick: a keyframe when due, otherwise a delta."""
+        self.ticks_since_keyframe += 1
+        if self.ticks_since_keyframe >= self.keyframe_interval:
+            return 'drones_keyframe', self.keyframe(swarm)
+
+        n = swarm.count
+        moved = swarm.positions[:n] - self.sent[:n]
+        moved[:, LON] *= METERS_PER_DEG_LON * np.cos(np.radians(swarm.positions[:n, LAT]))
+        moved[:, LAT] *= METERS_PER_DEG_LAT
+        changed = np.flatnonzero(np.einsum('ij,ij->i', moved, moved) > self.threshold_m ** 2)
+        self._mark_sent(swarm, changed)
+
+        ids = swarm.ids
+        return 'drones_delta', {
+            'seq': self._next_seq(),
+            'ids': [ids[row] for row in changed.tolist()],
+            'positions': swarm.positions[changed].tolist(),  # [lon, lat, height]
+        }
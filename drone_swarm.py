@@ -0,0 +1,261 @@
+# drone_swarm.py - Valencia Walker's
+# Struct-of-arrays drone swarm: every drone is a row in a set of contiguous
+# NumPy arrays and the whole fleet is advanced with one vectorized step.
+
+import uuid
+import numpy as np
+from wire_format import encode_table, TYPE_STR, TYPE_F64, TYPE_F32, TYPE_U8
+from spatial_index import GridIndex, ground_distance, radius_to_bbox, \
+    METERS_PER_DEG_LON, METERS_PER_DEG_LAT
+
+# Simulation Parameters
+MIN_DRONE_SPEED = 10.0      # meters per second
+MAX_DRONE_SPEED = 20.0      # meters per second
+PATH_UPDATE_INTERVAL = 30.0 # seconds between path updates
+PATH_POINTS = 2              # number of waypoints to add each update
+MIN_HEIGHT = 100.0           # meters
+MAX_HEIGHT = 300.0           # meters
+
+# Manhattan Geographic Bounds
+MANHATTAN_BOUNDS = {
+    'west': -74.02,
+    'east': -73.95,
+    'south': 40.70,
+    'north': 40.80
+}
+
+TRAJECTORY_TYPES = ('random', 'circular', 'linear')
+TRAJECTORY_RANDOM, TRAJECTORY_CIRCULAR, TRAJECTORY_LINEAR = range(len(TRAJECTORY_TYPES))
+
+# Columns of the position / waypoint arrays
+LON, LAT, HEIGHT = 0, 1, 2
+
+
+class DroneSwarm:
+    """Fleet of drones stored as parallel arrays indexed by row."""
+
+    def __init__(self, capacity=1024, bounds=MANHATTAN_BOUNDS, rng=None):
+        self.bounds = bounds
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.count = 0
+        self.ids = []
+        self.index = {}  # drone id -> row
+        self.grid = GridIndex(bounds)
+        self._allocate(capacity)
+
+    # -------------------------------
+    # Storage
+    # -------------------------------
+
+    def _allocate(self, capacity):
+        self.positions = np.zeros((capacity, 3))
+        self.speeds = np.zeros(capacity)
+        self.trajectory = np.zeros(capacity, dtype=np.int8)
+        self.waypoints = np.zeros((capacity, PATH_POINTS, 3))
+        self.waypoint_index = np.zeros(capacity, dtype=np.int32)
+        self.path_started = np.zeros(capacity)
+
+    def _reserve(self, capacity):
+        if capacity <= len(self.speeds):
+            return
+        capacity = max(capacity, 2 * len(self.speeds))
+        old = (self.positions, self.speeds, self.trajectory,
+               self.waypoints, self.waypoint_index, self.path_started)
+        self._allocate(capacity)
+        n = self.count
+        for new, prev in zip((self.positions, self.speeds, self.trajectory,
+                              self.waypoints, self.waypoint_index, self.path_started), old):
+            new[:n] = prev[:n]
+
+    def __len__(self):
+        return self.count
+
+    # -------------------------------
+    # Waypoint Generation
+    # -------------------------------
+
+    def random_points(self, shape):
+        """Uniform random (lon, lat, height) points inside the bounds."""
+        low = (self.bounds['west'], self.bounds['south'], MIN_HEIGHT)
+        high = (self.bounds['east'], self.bounds['north'], MAX_HEIGHT)
+        return self.rng.uniform(low, high, size=tuple(shape) + (3,))
+
+    def assign_waypoints(self, rows, now=0.0):
+        """Generate a fresh path for each drone in ``rows`` by its trajectory type."""
+        rows = np.asarray(rows, dtype=np.intp)
+        if rows.size == 0:
+            return
+        kinds = self.trajectory[rows]
+        paths = np.empty((rows.size, PATH_POINTS, 3))
+
+        mask = kinds == TRAJECTORY_RANDOM
+        if mask.any():
+            paths[mask] = self.random_points((mask.sum(), PATH_POINTS))
+
+        mask = kinds == TRAJECTORY_CIRCULAR
+        if mask.any():
+            k = int(mask.sum())
+            center = self.random_points((k,))
+            radius = self.rng.uniform(500.0, 1500.0, size=k)  # Radius between 500m and 1500m
+            angle = (2 * np.pi / PATH_POINTS) * np.arange(PATH_POINTS)
+            circle = paths[mask]
+            circle[:, :, LON] = center[:, None, LON] + (radius[:, None] / METERS_PER_DEG_LON) * np.cos(angle)
+            circle[:, :, LAT] = center[:, None, LAT] + (radius[:, None] / METERS_PER_DEG_LAT) * np.sin(angle)
+            circle[:, :, HEIGHT] = self.rng.uniform(MIN_HEIGHT, MAX_HEIGHT, size=(k, PATH_POINTS))
+            paths[mask] = circle
+
+        mask = kinds == TRAJECTORY_LINEAR
+        if mask.any():
+            k = int(mask.sum())
+            point_a = self.random_points((k,))
+            point_b = self.random_points((k,))
+            t = np.linspace(0.0, 1.0, PATH_POINTS)[None, :, None]
+            paths[mask] = point_a[:, None, :] + (point_b - point_a)[:, None, :] * t
+
+        self.waypoints[rows] = paths
+        self.waypoint_index[rows] = 0
+        self.path_started[rows] = now
+
+    # -------------------------------
+    # Fleet Management
+    # -------------------------------
+
+    def new_ids(self, count):
+        """UUID4 strings drawn from the swarm's RNG, so seeded runs get the same ids."""
+        bits = self.rng.integers(0, 2 ** 64, size=(count, 2), dtype=np.uint64).tolist()
+        return [str(uuid.UUID(int=(hi << 64) | lo, version=4)) for hi, lo in bits]
+
+    def spawn(self, drone_ids, now=0.0):
+        """Append drones with random positions, speeds and trajectory types; returns their rows."""
+        k = len(drone_ids)
+        start = self.count
+        self._reserve(start + k)
+        rows = np.arange(start, start + k)
+
+        self.positions[rows] = self.random_points((k,))
+        self.speeds[rows] = self.rng.uniform(MIN_DRONE_SPEED, MAX_DRONE_SPEED, size=k)
+        self.trajectory[rows] = self.rng.integers(0, len(TRAJECTORY_TYPES), size=k)
+        for offset, drone_id in enumerate(drone_ids):
+            self.index[drone_id] = start + offset
+        self.ids.extend(drone_ids)
+        self.count += k
+
+        self.assign_waypoints(rows, now)
+        self._reindex()
+        return rows
+
+    def clear(self):
+        self.count = 0
+        self.ids = []
+        self.index = {}
+        self.grid.clear()
+
+    # -------------------------------
+    # Batched Step
+    # -------------------------------
+
+    def step(self, delta_time, now=0.0):
+        """Advance every drone toward its current waypoint by ``speed * delta_time``."""
+        n = self.count
+        if n == 0:
+            return
+
+        stale = (now - self.path_started[:n] >= PATH_UPDATE_INTERVAL) | \
+                (self.waypoint_index[:n] >= PATH_POINTS)
+        if stale.any():
+            self.assign_waypoints(np.flatnonzero(stale), now)
+
+        pos = self.positions[:n]
+        idx = self.waypoint_index[:n]
+        target = self.waypoints[np.arange(n), idx]
+
+        offset = target - pos
+        scale = np.array([METERS_PER_DEG_LON, METERS_PER_DEG_LAT, 1.0])
+        meters = offset * scale
+        meters[:, LON] *= np.cos(np.radians(pos[:, LAT]))
+        distance = np.sqrt(np.einsum('ij,ij->i', meters, meters))
+        max_distance = self.speeds[:n] * delta_time
+
+        arrived = max_distance >= distance
+        ratio = np.divide(max_distance, distance, out=np.ones(n), where=~arrived)
+        pos += offset * ratio[:, None]
+        pos[arrived] = target[arrived]
+        idx[arrived] += 1
+        self._reindex()
+
+    # -------------------------------
+    # Spatial Queries
+    # -------------------------------
+
+    def _reindex(self):
+        n = self.count
+        self.grid.update(self.positions[:n, LON], self.positions[:n, LAT])
+
+    def query_bbox(self, west, south, east, north):
+        """Rows of drones inside the lon/lat box."""
+        rows = self.grid.candidates_in_bbox(west, south, east, north)
+        lon, lat = self.positions[rows, LON], self.positions[rows, LAT]
+        inside = (lon >= west) & (lon <= east) & (lat >= south) & (lat <= north)
+        return np.sort(rows[inside])
+
+    def query_radius(self, lon, lat, radius_m):
+        """Rows of drones within ``radius_m`` meters (horizontal) of (lon, lat)."""
+        rows = self.grid.candidates_in_bbox(*radius_to_bbox(lon, lat, radius_m))
+        distance = ground_distance(self.positions[rows, LON], self.positions[rows, LAT], lon, lat)
+        return np.sort(rows[distance <= radius_m])
+
+    def nearest(self, lon, lat, k):
+        """Rows of the ``k`` drones closest (horizontally) to (lon, lat), nearest first."""
+        if self.count == 0 or k <= 0:
+            return np.zeros(0, dtype=np.intp)
+        k = min(k, self.count)
+        ring = 0
+        rows = self.grid.candidates_in_ring(lon, lat, ring)
+        while rows.size < k and not self.grid.covers_grid(lon, lat, ring):
+            ring += 1
+            rows = self.grid.candidates_in_ring(lon, lat, ring)
+
+        # The k-th candidate bounds the answer; anything closer may sit in cells
+        # outside the ring, so widen to the enclosing box before ranking.
+        distance = ground_distance(self.positions[rows, LON], self.positions[rows, LAT], lon, lat)
+        reach = np.partition(distance, k - 1)[k - 1]
+        rows = self.grid.candidates_in_bbox(*radius_to_bbox(lon, lat, reach))
+        distance = ground_distance(self.positions[rows, LON], self.positions[rows, LAT], lon, lat)
+        order = np.argsort(distance, kind='stable')[:k]
+        return rows[order]
+
+    # -------------------------------
+    # Serialization
+    # -------------------------------
+
+    def to_dicts(self, rows=None):
+        """Per-drone dicts in the shape the ``/api/*_drones`` routes return."""
+        if rows is None:
+            rows = np.arange(self.count)
+        positions = self.positions[rows].tolist()
+        speeds = self.speeds[rows].tolist()
+        kinds = self.trajectory[rows].tolist()
+        ids = self.ids
+        return [
+            {
+                'id': ids[row],
+                'position': {'lon': p[LON], 'lat': p[LAT], 'height': p[HEIGHT]},
+                'speed': s,
+                'trajectory_type': TRAJECTORY_TYPES[kind]
+            }
+            for row, p, s, kind in zip(np.asarray(rows).tolist(), positions, speeds, kinds)
+        ]
+
+    def to_table(self, rows=None):
+        """Binary table (see wire_format) straight from the arrays; trajectory is an index into TRAJECTORY_TYPES."""
+        if rows is None:
+            rows = np.arange(self.count)
+        ids = self.ids
+        return encode_table(len(rows), [
+            ('id', TYPE_STR, [ids[row] for row in np.asarray(rows).tolist()]),
+            ('lon', TYPE_F64, self.positions[rows, LON]),
+            ('lat', TYPE_F64, self.positions[rows, LAT]),
+            ('height', TYPE_F32, self.positions[rows, HEIGHT]),
+            ('speed', TYPE_F32, self.speeds[rows]),
+            ('trajectory_type', TYPE_U8, self.trajectory[rows]),
+        ])
@@ -0,0 +1,117 @@
+# export_cache.py - Valencia Walker's
+# Content-addressed, size-bounded on-disk cache for generated exports.
+#
+# Keys are sha256 over the geometry actually exported (component types and
+# float64 positions), the format and its options, so identical schematics map
+# to one file no matter how the JSON was ordered or which non-geometric fields
+# changed. The key doubles as the HTTP ETag. Files are evicted least recently
+# used first once the directory exceeds max_bytes.
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ExportCache:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # filename -> size, least recently used first
+        self.total_bytes = 0
+        self.hits = self.misses = self.not_modified = self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(".") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.total_bytes += size
+
+    @staticmethod
+    def key(fmt, positions, types=None, **options):
+        """Hex digest identifying one export of this geometry in this format."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps({"format": fmt, "options": options}, sort_keys=True).encode("utf-8"))
+        digest.update(positions.astype("<f8", copy=False).tobytes())
+        if types is not None:
+            # JSON, not a join: types may be null or non-string and must not 500 the export
+            digest.update(json.dumps(list(types), default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def path(self, key, ext):
+        return os.path.join(self.directory, f"{key}.{ext}")
+
+    # -------------------------------
+    # Lookup / Insert
+    # -------------------------------
+
+    def get(self, key, ext):
+        """Path of a cached export (marked most recently used), or None on a miss."""
+        name = f"{key}.{ext}"
+        with self.lock:
+            if name in self.entries and os.path.isfile(self.path(key, ext)):
+                self.entries.move_to_end(name)
+                self.hits += 1
+                os.utime(self.path(key, ext))
+                return self.path(key, ext)
+            self.total_bytes -= self.entries.pop(name, 0)  # file vanished from disk: stop counting it
+            self.misses += 1
+            return None
+
+    def record_not_modified(self):
+        with self.lock:
+            self.not_modified += 1
+
+    def temp_path(self):
+        return os.path.join(self.directory, f".{uuid.uuid4().hex}.tmp")
+
+    def commit(self, key, ext, temp_path):
+        """Atomically move a finished temp file into the cache and evict down to max_bytes."""
+        name = f"{key}.{ext}"
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, self.path(key, ext))
+        with self.lock:
+            self.total_bytes += size - self.entries.pop(name, 0)
+            self.entries[name] = size
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old, old_size = self.entries.popitem(last=False)
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except FileNotFoundError:
+                    pass
+                self.total_bytes -= old_size
+                self.evictions += 1
+        return self.path(key, ext)
+
+    def put(self, key, ext, data):
+        temp = self.temp_path()
+        with open(temp, "wb") as f:
+            f.write(data)
+        return self.commit(key, ext, temp)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+            }
@@ -1,9 +1,13 @@
 # 2D-> 3D OBJ Export API stub export_routes.py -Valencia Walker's
 
 # backend/export_routes.py – Full 2D to 3D OBJ export logic
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, jsonify, request, Response, send_file, stream_with_context
 import os
-import uuid
+import itertools
+import numpy as np
+from backend.gltf_builder import build_instanced_glb
+from backend.export_cache import ExportCache
+from backend.incremental_export import VersionStore, PatchError, iter_obj
 
 export_bp = Blueprint("export", __name__, url_prefix="/api/export")
 
@@ -11,6 +15,10 @@ export_bp = Blueprint("export", __name__, url_prefix="/api/export")
 EXPORT_DIR = "exports"
 os.makedirs(EXPORT_DIR, exist_ok=True)
 
+# Content-addressed cache of generated exports (see export_cache.py)
+export_cache = ExportCache(os.path.join(EXPORT_DIR, "cache"),
+                           int(os.getenv("EXPORT_CACHE_BYTES", 512 * 1024 * 1024)))
+
 # Utility to generate a simple cube in OBJ format at x, y, z
 def generate_cube_obj(x, y, z, size=1.0, id_offset=0):
     half = size / 2.0
@@ -37,34 +45,181 @@ def generate_cube_obj(x, y, z, size=1.0, id_offset=0):
     return obj
 
 
+# -------------------------------
+# Streaming OBJ Writer
+# -------------------------------
+
+CHUNK_COMPONENTS = 4096  # cubes formatted per write
+
+# Unit cube corners (same order as generate_cube_obj) and its quad faces
+CUBE_CORNERS = np.array([
+    (-1, -1, -1), (1, -1, -1), (1, 1, -1), (-1, 1, -1),
+    (-1, -1, 1), (1, -1, 1), (1, 1, 1), (-1, 1, 1),
+], dtype=np.float64)
+CUBE_FACES = np.array([
+    (1, 2, 3, 4), (5, 6, 7, 8),
+    (1, 5, 8, 4), (2, 6, 7, 3),
+    (4, 3, 7, 8), (1, 2, 6, 5)
+], dtype=np.int64)
+CUBE_TEMPLATE = "v %r %r %r\n" * 8 + "f %d %d %d %d\n" * 6
+
+
+def component_positions(components):
+    """(N, 3) float array of component x, y, z (z optional, default 0)."""
+    return np.array([(c.get("x", 0), c.get("y", 0), c.get("z", 0)) for c in components],
+                    dtype=np.float64).reshape(-1, 3)
+
+
+def iter_obj_chunks(positions, size=1.0, chunk=CHUNK_COMPONENTS):
+    """Yield OBJ text for cubes at ``positions``, one block per ``chunk`` cubes.
+
+    Byte-for-byte the same output as joining generate_cube_obj per component,
+    but each block is formatted with a single %-format over vectorized arrays.
+    """
+    half = size / 2.0
+    for start in range(0, len(positions), chunk):
+        block = positions[start:start + chunk]
+        count = len(block)
+        vertices = (block[:, None, :] + CUBE_CORNERS * half).reshape(count, 24).tolist()
+        offsets = (start + np.arange(count)) * 8
+        faces = (CUBE_FACES[None, :, :] + offsets[:, None, None]).reshape(count, 24).tolist()
+        args = tuple(itertools.chain.from_iterable(v + f for v, f in zip(vertices, faces)))
+        yield (CUBE_TEMPLATE * count) % args
+
+
+def cached_response(key, ext, mimetype):
+    """304 when the client already has ``key``, the cached file on a hit, else None."""
+    if request.if_none_match.contains(key):
+        export_cache.record_not_modified()
+        response = Response(status=304)
+        response.set_etag(key)
+        return response
+    path = export_cache.get(key, ext)
+    if path is None:
+        return None
+    return send_file(path, mimetype=mimetype, as_attachment=True,
+                     download_name=f"{key[:16]}.{ext}", etag=key, conditional=False)
+
+
+def read_components():
+    """Components list from the request body, or raises ValueError."""
+    schematic_data = request.json
+    components = schematic_data.get("components", [])
+    if not components or not isinstance(components, list):
+        raise ValueError("Missing or invalid components list")
+    return components
+
+
 @export_bp.route("/obj", methods=["POST"])
 def export_obj():
+    """
+    POST /api/export/obj
+    Payload: { "components": [{ "x": .., "y": .., "z": .. }, ...] }
+    Streams the OBJ to the client as it is generated and keeps it in the export
+    cache; identical geometry is then served from disk, or 304 with If-None-Match.
+    """
     try:
-        schematic_data = request.json
-        components = schematic_data.get("components", [])
+        positions = component_positions(read_components())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    key = ExportCache.key("obj", positions, size=1.0)
+    cached = cached_response(key, "obj", "text/plain")
+    if cached is not None:
+        return cached
+
+    def generate():
+        temp = export_cache.temp_path()
+        try:
+            with open(temp, "w") as f:
+                for text in iter_obj_chunks(positions):
+                    f.write(text)
+                    yield text
+            export_cache.commit(key, "obj", temp)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+    response = Response(stream_with_context(generate()), mimetype="text/plain",
+                        headers={"Content-Disposition": f"attachment; filename={key[:16]}.obj"})
+    response.set_etag(key)
+    return response
+
+
+# -------------------------------
+# Incremental OBJ Export
+# -------------------------------
 
-        if not components or not isinstance(components, list):
-            return jsonify({"error": "Missing or invalid components list"}), 400
+export_versions = VersionStore()
 
-        obj_lines = []
-        vertex_count = 0
 
-        for comp in components:
-            x = comp.get("x", 0)
-            y = comp.get("y", 0)
-            z = comp.get("z", 0)  # Optional; default to 0
-            obj = generate_cube_obj(x, y, z, size=1.0, id_offset=vertex_count)
-            obj_lines.append(obj)
-            vertex_count += 8  # Each cube adds 8 vertices
+@export_bp.route("/obj/incremental", methods=["POST"])
+def export_obj_incremental():
+    """
+    POST /api/export/obj/incremental
+    Payload: { "components": [...] }                          -> new base version
+         or: { "base": "<version>", "added": [...], "moved": [...], "removed": ["id", ...] }
+    Streams the resulting OBJ (relative face indices); the version id comes back
+    in X-Export-Version and ETag for the next patch.
+    """
+    body = request.json or {}
+    try:
+        if body.get("base"):
+            version, _, blocks = export_versions.apply(body["base"], body.get("added", []),
+                                                       body.get("moved", []), body.get("removed", []))
+        else:
+            version, _, blocks = export_versions.create(read_components())
+    except KeyError:
+        return jsonify({"error": f"Unknown or expired base version '{body.get('base')}'; resend full components"}), 409
+    except (PatchError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    if request.if_none_match.contains(version):
+        response = Response(status=304)
+    else:
+        response = Response(stream_with_context(iter_obj(blocks)), mimetype="text/plain",
+                            headers={"Content-Disposition": f"attachment; filename={version[:16]}.obj"})
+    response.set_etag(version)
+    response.headers["X-Export-Version"] = version
+    return response
+
+
+@export_bp.route("/cache/stats", methods=["GET"])
+def export_cache_stats():
+    return jsonify(export_cache.stats())
 
-        # Save to file
-        filename = f"{uuid.uuid4().hex}.obj"
-        path = os.path.join(EXPORT_DIR, filename)
 
-        with open(path, "w") as f:
-            f.write("".join(obj_lines))
+# -------------------------------
+# Instanced glTF Export
+# -------------------------------
+
+@export_bp.route("/glb", methods=["POST"])
+def export_glb():
+    """
+    POST /api/export/glb
+    Payload: { "components": [{ "type": "motor", "x": .., "y": .., "z": .. }, ...] }
+    Returns a binary glTF with one instanced cube mesh per component type (cached like /obj).
+    """
+    try:
+        components = read_components()
+        types = [c.get("type", "other") for c in components]
+        positions = component_positions(components)
+
+        key = ExportCache.key("glb", positions, types, size=1.0)
+        cached = cached_response(key, "glb", "model/gltf-binary")
+        if cached is not None:
+            return cached
 
-        return send_file(path, mimetype='text/plain', as_attachment=True, download_name=filename)
+        glb = build_instanced_glb(types, positions)
+        export_cache.put(key, "glb", glb)
+        response = Response(glb, mimetype="model/gltf-binary",
+                            headers={"Content-Disposition": f"attachment; filename={key[:16]}.glb"})
+        response.set_etag(key)
+        return response
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
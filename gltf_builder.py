@@ -0,0 +1,154 @@
+# gltf_builder.py - Valencia Walker's
+# Binary glTF (.glb) writer for schematic components. Each component type
+# (motor, sensor, cpu, robot_arm, other) is one node whose mesh is the shared
+# unit cube, drawn once per component through EXT_mesh_gpu_instancing with a
+# per-instance TRANSLATION attribute. The file holds one cube plus 12 bytes
+# per component instead of 8 vertices + 6 faces of text per component.
+
+import json
+import struct
+import numpy as np
+
+GLB_MAGIC = 0x46546C67   # "glTF"
+CHUNK_JSON = 0x4E4F534A  # "JSON"
+CHUNK_BIN = 0x004E4942   # "BIN\0"
+
+FLOAT, UNSIGNED_SHORT = 5126, 5123
+ARRAY_BUFFER, ELEMENT_ARRAY_BUFFER = 34962, 34963
+
+# Base colours (RGBA, linear) per component type
+TYPE_COLORS = {
+    "motor": (0.85, 0.33, 0.10, 1.0),
+    "sensor": (0.10, 0.60, 0.85, 1.0),
+    "cpu": (0.20, 0.75, 0.30, 1.0),
+    "robot_arm": (0.95, 0.75, 0.10, 1.0),
+    "other": (0.60, 0.60, 0.60, 1.0),
+}
+
+
+def unit_cube(size=1.0):
+    """24 vertices (flat normals per face) and 36 uint16 indices for a cube centred at 0."""
+    h = size / 2.0
+    positions, normals, indices = [], [], []
+    for axis in range(3):
+        for sign in (-1.0, 1.0):
+            normal = [0.0, 0.0, 0.0]
+            normal[axis] = sign
+            u, v = [a for a in range(3) if a != axis]
+            base = len(positions)
+            for du, dv in ((-1, -1), (1, -1), (1, 1), (-1, 1)):
+                p = [0.0, 0.0, 0.0]
+                p[axis], p[u], p[v] = sign * h, du * h, dv * h
+                positions.append(p)
+                normals.append(normal)
+            # Wind triangles counter-clockwise as seen from outside the face
+            p0, p1, p2 = (np.array(positions[base + i]) for i in range(3))
+            outward = np.dot(np.cross(p1 - p0, p2 - p0), normal) > 0
+            quad = (0, 1, 2, 0, 2, 3) if outward else (0, 2, 1, 0, 3, 2)
+            indices.extend(base + i for i in quad)
+    return (np.array(positions, dtype=np.float32), np.array(normals, dtype=np.float32),
+            np.array(indices, dtype=np.uint16))
+
+
+class _BufferBuilder:
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.buffer_views = []
+        self.accessors = []
+
+    def add_view(self, array, target=None):
+        pad = (-self.size) % 4
+        if pad:
+            self.parts.append(b"\0" * pad)
+            self.size += pad
+        data = np.ascontiguousarray(array).tobytes()
+        view = {"buffer": 0, "byteOffset": self.size, "byteLength": len(data)}
+        if target:
+            view["target"] = target
+        self.parts.append(data)
+        self.size += len(data)
+        self.buffer_views.append(view)
+        return len(self.buffer_views) - 1
+
+    def add_accessor(self, array, component_type, kind, target=None, bounds=False):
+        accessor = {
+            "bufferView": self.add_view(array, target),
+            "componentType": component_type,
+            "count": len(array),
+            "type": kind,
+        }
+        if bounds:
+            accessor["min"] = array.min(axis=0).tolist()
+            accessor["max"] = array.max(axis=0).tolist()
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+    def binary(self):
+        data = b"".join(self.parts)
+        return data + b"\0" * ((-len(data)) % 4)
+
+
+def build_instanced_glb(types, positions, size=1.0, scales=None):
+    """GLB bytes for components with ``types`` (list of str) at ``positions`` (N, 3).
+
+    ``scales`` (N, 3), if given, becomes the per-instance SCALE attribute.
+    """
+    types = np.asarray(types, dtype=object)
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 3)
+    if scales is not None:
+        scales = np.asarray(scales, dtype=np.float32).reshape(-1, 3)
+    known = np.isin(types, list(TYPE_COLORS))
+    types = np.where(known, types, "other")
+
+    buf = _BufferBuilder()
+    cube_positions, cube_normals, cube_indices = unit_cube(size)
+    position_accessor = buf.add_accessor(cube_positions, FLOAT, "VEC3", ARRAY_BUFFER, bounds=True)
+    normal_accessor = buf.add_accessor(cube_normals, FLOAT, "VEC3", ARRAY_BUFFER)
+    index_accessor = buf.add_accessor(cube_indices, UNSIGNED_SHORT, "SCALAR", ELEMENT_ARRAY_BUFFER)
+
+    materials, meshes, nodes = [], [], []
+    for kind, color in TYPE_COLORS.items():
+        selected = types == kind
+        instances = positions[selected]
+        if len(instances) == 0:
+            continue
+        materials.append({"name": kind, "pbrMetallicRoughness": {
+            "baseColorFactor": list(color), "metallicFactor": 0.1, "roughnessFactor": 0.8}})
+        meshes.append({"name": kind, "primitives": [{
+            "attributes": {"POSITION": position_accessor, "NORMAL": normal_accessor},
+            "indices": index_accessor,
+            "material": len(materials) - 1,
+        }]})
+        attributes = {"TRANSLATION": buf.add_accessor(instances, FLOAT, "VEC3")}
+        if scales is not None:
+            attributes["SCALE"] = buf.add_accessor(scales[selected], FLOAT, "VEC3")
+        nodes.append({
+            "name": kind,
+            "mesh": len(meshes) - 1,
+            "extensions": {"EXT_mesh_gpu_instancing": {"attributes": attributes}},
+        })
+
+    binary = buf.binary()
+    document = {
+        "asset": {"version": "2.0", "generator": "OpenQQuantify export_routes"},
+        "extensionsUsed": ["EXT_mesh_gpu_instancing"],
+        "extensionsRequired": ["EXT_mesh_gpu_instancing"],
+        "scene": 0,
+        "scenes": [{"nodes": list(range(len(nodes)))}],
+        "nodes": nodes,
+        "meshes": meshes,
+        "materials": materials,
+        "accessors": buf.accessors,
+        "bufferViews": buf.buffer_views,
+        "buffers": [{"byteLength": len(binary)}],
+    }
+    json_chunk = json.dumps(document, separators=(",", ":")).encode("utf-8")
+    json_chunk += b" " * ((-len(json_chunk)) % 4)
+
+    total = 12 + 8 + len(json_chunk) + 8 + len(binary)
+    return b"".join([
+        struct.pack("<III", GLB_MAGIC, 2, total),
+        struct.pack("<II", len(json_chunk), CHUNK_JSON), json_chunk,
+        struct.pack("<II", len(binary), CHUNK_BIN), binary,
+    ])
@@ -3,11 +3,12 @@
 import random
 import time
 from datetime import datetime
+import numpy as np
 
 
 
-def simulate_temperature():
-    temp = round(random.uniform(22.0, 30.0), 2)
+def simulate_temperature(rng=random):
+    temp = round(rng.uniform(22.0, 30.0), 2)
     return {
         "sensor": "arduino_temp",
         "timestamp": datetime.utcnow().isoformat(),
@@ -16,10 +17,111 @@ def simulate_temperature():
     }
 
 
+def simulate_temperatures(count, rng=None):
+    """One reading per sensor for ``count`` sensors, as an array."""
+    rng = rng if rng is not None else np.random.default_rng()
+    return np.round(rng.uniform(22.0, 30.0, size=count), 2)
 
 
-def stream_sensor_data():
+
+
+# -------------------------------
+# Multi-sensor fleet
+# -------------------------------
+
+FLEET_KINDS = ("temperature", "vibration", "current")
+FLEET_UNITS = {"temperature": "C", "vibration": "mm/s", "current": "A"}
+
+
+class SensorFleet:
+    """Temperature, vibration and current sensors on ``machines`` simulated machines.
+
+    Each machine has a load that wanders as an AR(1) process. Its current
+    tracks the load, vibration grows with load squared, and its temperature
+    follows the load through a first-order thermal lag. The three sensors on
+    one machine are therefore correlated. Every sensor adds its own AR(1)
+    (coloured) noise and a slow calibration drift. step() produces a block
+    of rate_hz * dt samples for all sensors at once: int64 epoch-ns timestamps
+    (S,) and values (S, N), with columns ordered like ``ids``.
+    """
+
+    def __init__(self, machines, rate_hz=50.0, rng=None, start_ns=None):
+        self.machines = machines
+        self.rate_hz = rate_hz
+        self.period_ns = int(round(1e9 / rate_hz))
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.next_ns = time.time_ns() if start_ns is None else start_ns
+        self.carry = 0.0  # fractional samples owed from previous ticks
+        self.ids = [f"m{m:04d}-{kind}" for kind in FLEET_KINDS for m in range(machines)]
+        self.kinds = np.repeat(np.arange(len(FLEET_KINDS), dtype=np.int8), machines)
+
+        rng = self.rng
+        self.load_mean = rng.uniform(0.4, 0.9, machines)
+        self.load = self.load_mean.copy()
+        self.ambient_c = rng.uniform(20.0, 26.0, machines)
+        self.heat_c = rng.uniform(15.0, 40.0, machines)         # steady-state rise at full load
+        self.tau_s = rng.uniform(60.0, 300.0, machines)         # thermal time constant
+        self.temperature = self.ambient_c + self.heat_c * self.load
+        self.rated_a = rng.uniform(5.0, 30.0, machines)
+        self.vibration_base = rng.uniform(0.5, 1.5, machines)
+        self.vibration_gain = rng.uniform(2.0, 6.0, machines)
+
+        sensors = 3 * machines
+        self.noise = np.zeros(sensors)
+        self.noise_sigma = np.concatenate((np.full(machines, 0.05), np.full(machines, 0.15), 0.01 * self.rated_a))
+        self.drift = np.zeros(sensors)
+        self.drift_sigma = self.noise_sigma * 1e-3
+        self.latest = np.zeros(sensors)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def step(self, dt):
+        """Advance ``dt`` seconds; returns (timestamps_ns (S,), values (S, N))."""
+        owed = dt * self.rate_hz + self.carry
+        samples = int(owed)
+        self.carry = owed - samples
+        m, h = self.machines, 1.0 / self.rate_hz
+        values = np.empty((samples, 3 * m))
+        load_phi, noise_phi = np.exp(-h / 5.0), np.exp(-h / 0.5)
+        load_sigma = 0.05 * np.sqrt(1 - load_phi ** 2)
+        noise_scale = self.noise_sigma * np.sqrt(1 - noise_phi ** 2)
+        shocks = self.rng.standard_normal((samples, 4 * m))
+
+        for i in range(samples):
+            self.load = np.clip(self.load_mean + load_phi * (self.load - self.load_mean)
+                                + load_sigma * shocks[i, :m], 0.0, 1.0)
+            target = self.ambient_c + self.heat_c * self.load
+            self.temperature += (target - self.temperature) * (h / self.tau_s)
+            self.noise = noise_phi * self.noise + noise_scale * shocks[i, m:]
+            row = values[i]
+            row[:m] = self.temperature
+            row[m:2 * m] = self.vibration_base + self.vibration_gain * self.load ** 2
+            row[2 * m:] = self.rated_a * self.load
+            row += self.noise
+
+        self.drift += self.drift_sigma * np.sqrt(samples) * self.rng.standard_normal(len(self.drift))
+        values += self.drift
+        np.maximum(values[:, m:], 0.0, out=values[:, m:])  # vibration and current are magnitudes
+        timestamps = self.next_ns + self.period_ns * np.arange(samples, dtype=np.int64)
+        self.next_ns += self.period_ns * samples
+        if samples:
+            self.latest = values[-1]
+        return timestamps, values
+
+    def latest_records(self):
+        """Latest value of every sensor as simulate_temperature-style dicts (formatting happens here)."""
+        timestamp = datetime.utcfromtimestamp((self.next_ns - self.period_ns) / 1e9).isoformat()
+        return [{"sensor": sensor, "timestamp": timestamp, "value": round(float(value), 3),
+                 "unit": FLEET_UNITS[FLEET_KINDS[kind]]}
+                for sensor, kind, value in zip(self.ids, self.kinds, self.latest)]
+
+
+def stream_sensor_data(history=None):
+    """Print a reading every second; with a SensorHistory, also keep it."""
     while True:
         temp = round(random.uniform(20, 35), 2)
         print(f"Temperature: {temp}°C")
+        if history is not None:
+            history.append("arduino_temp", temp, unit="C")
         time.sleep(1)
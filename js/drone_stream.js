@@ -0,0 +1,51 @@
+// static/js/drone_stream.js-Valencia Walker's
+// Keeps a local map of drones in sync with the server's delta stream.
+// onChange(drones) is called with the Map(id -> drone) after every message.
+
+function connectDroneStream(onChange) {
+  const socket = io();
+  const drones = new Map();
+  let seq = null;
+
+  function inOrder(message) {
+    if (seq !== null && message.seq !== seq + 1) {
+      seq = null;
+      socket.emit("resync");
+      return false;
+    }
+    seq = message.seq;
+    return true;
+  }
+
+  socket.on("drones_keyframe", message => {
+    drones.clear();
+    message.drones.forEach(d => drones.set(d.id, d));
+    seq = message.seq;
+    onChange(drones);
+  });
+
+  socket.on("drones_delta", message => {
+    if (!inOrder(message)) return;
+    message.ids.forEach((id, i) => {
+      const drone = drones.get(id);
+      if (!drone) return;
+      const [lon, lat, height] = message.positions[i];
+      drone.position = { lon, lat, height };
+    });
+    onChange(drones);
+  });
+
+  socket.on("drones_spawned", message => {
+    if (!inOrder(message)) return;
+    message.drones.forEach(d => drones.set(d.id, d));
+    onChange(drones);
+  });
+
+  socket.on("drones_cleared", message => {
+    if (!inOrder(message)) return;
+    drones.clear();
+    onChange(drones);
+  });
+
+  return socket;
+}
@@ -0,0 +1,56 @@
+/*Valencia Walker's wire_format.js*/
+// Decoder for the OQTB binary tables served with ?format=binary
+// (see wire_format.py for the layout). Numeric columns are zero-copy
+// typed-array views; string columns decode to arrays of strings.
+
+const OQTB_TYPES = {
+  1: Uint8Array,
+  2: Int32Array,
+  3: BigInt64Array,
+  4: Float32Array,
+  5: Float64Array
+};
+const OQTB_STR = 6;
+
+function decodeTable(buffer) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== "OQTB" || view.getUint8(4) !== 1) throw new Error("Not an OQTB v1 table");
+
+  const columnCount = view.getUint8(5);
+  const count = view.getUint32(8, true);
+  const utf8 = new TextDecoder();
+  const align = n => (n + 7) & ~7;
+  const columns = {};
+  let pos = 12;
+
+  for (let c = 0; c < columnCount; c++) {
+    const nameLength = view.getUint8(pos);
+    const name = utf8.decode(new Uint8Array(buffer, pos + 1, nameLength));
+    const type = view.getUint8(pos + 1 + nameLength);
+    pos = align(pos + nameLength + 2);
+
+    if (type === OQTB_STR) {
+      const blobLength = view.getUint32(pos, true);
+      const offsets = new Uint32Array(buffer, pos + 4, count + 1);
+      const blobStart = pos + 4 + 4 * (count + 1);
+      const values = new Array(count);
+      for (let i = 0; i < count; i++) {
+        values[i] = utf8.decode(new Uint8Array(buffer, blobStart + offsets[i], offsets[i + 1] - offsets[i]));
+      }
+      columns[name] = values;
+      pos = blobStart + blobLength;
+    } else {
+      const ArrayType = OQTB_TYPES[type];
+      columns[name] = new ArrayType(buffer, pos, count);
+      pos += ArrayType.BYTES_PER_ELEMENT * count;
+    }
+    pos = align(pos);
+  }
+  return { count, columns };
+}
+
+async function fetchTable(url) {
+  const res = await fetch(url, { headers: { Accept: "application/x-openq-table" } });
+  return decodeTable(await res.arrayBuffer());
+}
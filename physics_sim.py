@@ -1,123 +1,282 @@
 # physics_sim.py-Valencia Walker's
 
 import math
-import time
-import random
+import numpy as np
 
 # -------------------------------
-# Motor Simulation State
+# Array-Backed Actuator Banks
 # -------------------------------
+# Every motor / arm is a row in a set of parallel NumPy columns so a twin with
+# thousands of actuators steps in one vectorized update. The per-id functions
+# at the bottom keep the original single-motor ("M1") / single-arm ("A1") API.
+
+class ActuatorBank:
+    """Rows of actuator state addressed by id. Subclasses declare COLUMNS."""
+
+    COLUMNS = {}  # name -> (dtype, default)
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.ids = []
+        self.index = {}  # id -> row
+        self.columns = {name: np.full(capacity, default, dtype=dtype)
+                        for name, (dtype, default) in self.COLUMNS.items()}
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get("columns", {})
+        if name in columns:
+            return columns[name][:self.__dict__["count"]]
+        raise AttributeError(name)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, actuator_id):
+        return actuator_id in self.index
+
+    def _reserve(self, capacity):
+        current = len(next(iter(self.columns.values())))
+        if capacity <= current:
+            return
+        capacity = max(capacity, 2 * current)
+        for name, (dtype, default) in self.COLUMNS.items():
+            grown = np.full(capacity, default, dtype=dtype)
+            grown[:self.count] = self.columns[name][:self.count]
+            self.columns[name] = grown
+
+    def add_many(self, actuator_ids, **params):
+        """Append actuators; each param is a scalar or one value per id. Returns their rows.
+
+        Ids and parameter names are all checked before anything changes, so a
+        ValueError leaves the bank as it was.
+        """
+        for name in params:
+            if name not in self.columns:
+                raise ValueError(f"Unknown {type(self).__name__} parameter '{name}'")
+        seen = set()
+        for actuator_id in actuator_ids:
+            if actuator_id in self.index or actuator_id in seen:
+                raise ValueError(f"Duplicate actuator id '{actuator_id}'")
+            seen.add(actuator_id)
+
+        k = len(actuator_ids)
+        start = self.count
+        self._reserve(start + k)
+        rows = np.arange(start, start + k)
+        for name, (dtype, default) in self.COLUMNS.items():
+            self.columns[name][rows] = default
+        for name, value in params.items():
+            self.columns[name][rows] = value  # rows past count: a bad shape here changes nothing visible
+        for offset, actuator_id in enumerate(actuator_ids):
+            self.index[actuator_id] = start + offset
+        self.ids.extend(actuator_ids)
+        self.count += k
+        return rows
+
+    def add(self, actuator_id, **params):
+        return int(self.add_many([actuator_id], **params)[0])
+
+    def clear(self):
+        self.count = 0
+        self.ids = []
+        self.index = {}
+
+    def copy(self):
+        """Independent bank with the same rows; cheaper than re-adding every actuator."""
+        clone = type(self)(capacity=1)
+        clone.count = self.count
+        clone.ids = list(self.ids)
+        clone.index = dict(self.index)
+        clone.columns = {name: column.copy() for name, column in self.columns.items()}
+        return clone
+
+    def rows_for(self, actuator_ids):
+        """Rows for ids; raises KeyError on an unknown id."""
+        return np.array([self.index[i] for i in actuator_ids], dtype=np.intp)
+
+    def _selection(self, rows):
+        if rows is None:
+            return slice(0, self.count)
+        return np.asarray(rows, dtype=np.intp)
+
+    def snapshot(self, rows=None):
+        """Column name -> array for the selected rows; enum columns stay as integer codes."""
+        sel = self._selection(rows)
+        return {name: column[sel] for name, column in self.columns.items()}
 
-motor_state = {
-    "motor_id": "M1",
-    "rpm": 0,
-    "target_rpm": 3200,
-    "torque_nm": 0.0,
-    "direction": "clockwise",
-    "status": "idle",
-    "angular_velocity": 0.0,  # rad/s
-    "temperature_c": 25.0,
-    "failures": [],
-}
 
 # -------------------------------
-# Robot Arm Simulation State
+# Motor Simulation
 # -------------------------------
 
-arm_state = {
-    "arm_id": "A1",
-    "current_position_deg": 0,
-    "target_position_deg": 0,
-    "movement": "idle",
-    "speed_dps": 45,
-    "temperature_c": 24.0,
-    "servo_load": 0.0,
-    "failures": []
-}
+MOTOR_STATUSES = ("idle", "spinning up", "slowing", "steady", "failed")
+IDLE, SPINNING_UP, SLOWING, STEADY, FAILED = range(len(MOTOR_STATUSES))
+MOTOR_FRAME_S = 1.0  # one motor step per 1 Hz simulation tick
+DIRECTIONS = ("clockwise", "counterclockwise")
+
+
+class MotorBank(ActuatorBank):
+    COLUMNS = {
+        "rpm": (np.int64, 0),
+        "target_rpm": (np.int64, 3200),
+        "torque_nm": (np.float64, 0.0),
+        "direction": (np.int8, 0),
+        "status": (np.int8, IDLE),
+        "angular_velocity": (np.float64, 0.0),  # rad/s
+        "temperature_c": (np.float64, 25.0),
+        "overheat": (np.bool_, False),
+        # Model parameters, overridable per motor
+        "step_rpm": (np.int64, 400),
+        "cooling_rate": (np.float64, 0.5),
+        "heat_rate": (np.float64, 0.75),
+        "max_temp": (np.float64, 90.0),
+    }
+
+    def step(self, rows=None):
+        """Advance the selected motors (default: all) by one simulation frame."""
+        sel = self._selection(rows)
+        c = self.columns
+        rpm, target = c["rpm"][sel], c["target_rpm"][sel]
+        overheat = c["overheat"][sel]
+        active = ~overheat
+
+        # Spin up logic
+        status = np.where(rpm < target, SPINNING_UP, np.where(rpm > target, SLOWING, STEADY))
+        rpm = rpm + np.where(rpm < target, 1, np.where(rpm > target, -1, 0)) * c["step_rpm"][sel]
+        rpm = np.minimum(rpm, target)  # Clamp RPM
+
+        # Torque = arbitrary function of RPM; angular velocity (rad/s)
+        torque = np.round(np.log(rpm + 1) * 0.08, 3)
+        angular_velocity = np.round((rpm * 2 * math.pi) / 60, 2)
+
+        # Heat simulation
+        temperature = c["temperature_c"][sel] + c["heat_rate"][sel]
+        temperature = np.where(status == IDLE, temperature - c["cooling_rate"][sel], temperature)
+        temperature = np.round(temperature, 2)
+
+        # Simulate overheat
+        newly_failed = active & (temperature >= c["max_temp"][sel])
+        status = np.where(newly_failed | overheat, FAILED, status)
+
+        c["rpm"][sel] = np.where(active, rpm, c["rpm"][sel])
+        c["torque_nm"][sel] = np.where(active, torque, c["torque_nm"][sel])
+        c["angular_velocity"][sel] = np.where(active, angular_velocity, c["angular_velocity"][sel])
+        c["temperature_c"][sel] = np.where(active, temperature, c["temperature_c"][sel])
+        c["status"][sel] = status
+        c["overheat"][sel] = overheat | newly_failed
+
+    def state(self, row):
+        c = self.columns
+        return {
+            "motor_id": self.ids[row],
+            "rpm": int(c["rpm"][row]),
+            "target_rpm": int(c["target_rpm"][row]),
+            "torque_nm": float(c["torque_nm"][row]),
+            "direction": DIRECTIONS[c["direction"][row]],
+            "status": MOTOR_STATUSES[c["status"][row]],
+            "angular_velocity": float(c["angular_velocity"][row]),
+            "temperature_c": float(c["temperature_c"][row]),
+            "failures": ["overheat"] if c["overheat"][row] else [],
+        }
+
 
 # -------------------------------
-# Motor Simulation Logic
+# Robot Arm Simulation
 # -------------------------------
 
-def spin_motor_simulation():
-    step_rpm = 400
-    cooling_rate = 0.5
-    heat_rate = 0.75
-    max_temp = 90
+ARM_MOVEMENTS = ("idle", "moving", "reached", "failed")
+ARM_IDLE, MOVING, REACHED, ARM_FAILED = range(len(ARM_MOVEMENTS))
+ARM_FRAME_S = 0.1  # simulate 100ms/frame
+MIN_DEG, MAX_DEG = 0, 180
+ARM_MAX_TEMP = 75.0  # servo fails above this
+
 
-    if "overheat" in motor_state["failures"]:
-        motor_state["status"] = "failed"
-        return motor_state
+class ArmBank(ActuatorBank):
+    COLUMNS = {
+        "current_position_deg": (np.float64, 0.0),
+        "target_position_deg": (np.float64, 0.0),
+        "movement": (np.int8, ARM_IDLE),
+        "speed_dps": (np.float64, 45.0),
+        "temperature_c": (np.float64, 24.0),
+        "servo_load": (np.float64, 0.0),
+        "servo_fail": (np.bool_, False),
+    }
 
-    # Spin up logic
-    if motor_state["rpm"] < motor_state["target_rpm"]:
-        motor_state["rpm"] += step_rpm
-        motor_state["status"] = "spinning up"
-    elif motor_state["rpm"] > motor_state["target_rpm"]:
-        motor_state["rpm"] -= step_rpm
-        motor_state["status"] = "slowing"
-    else:
-        motor_state["status"] = "steady"
+    def set_targets(self, rows, target_deg):
+        self.columns["target_position_deg"][self._selection(rows)] = np.clip(target_deg, MIN_DEG, MAX_DEG)
 
-    # Clamp RPM
-    motor_state["rpm"] = min(motor_state["rpm"], motor_state["target_rpm"])
+    def step(self, rows=None):
+        """Move the selected arms (default: all) one frame toward their targets."""
+        sel = self._selection(rows)
+        c = self.columns
+        position, target = c["current_position_deg"][sel], c["target_position_deg"][sel]
+        delta = target - position
+        moving = np.abs(delta) >= 1
 
-    # Torque = arbitrary function of RPM
-    motor_state["torque_nm"] = round(math.log(motor_state["rpm"] + 1) * 0.08, 3)
+        # Move toward target
+        step = np.sign(delta) * c["speed_dps"][sel] * ARM_FRAME_S
+        position = np.where(moving, np.round(position + step, 2), position)
+        load = np.where(moving, np.round(np.abs(delta) / 180, 2), 0.0)
+        movement = np.where(moving, MOVING, REACHED)
 
-    # Angular velocity (rad/s)
-    motor_state["angular_velocity"] = round((motor_state["rpm"] * 2 * math.pi) / 60, 2)
+        # Simulate servo heating, then clamp temperature
+        temperature = c["temperature_c"][sel] + np.where(moving, 0.4, -0.3)
+        temperature = np.round(np.clip(temperature, 24.0, 80.0), 2)
 
-    # Heat simulation
-    motor_state["temperature_c"] += heat_rate
-    if motor_state["status"] == "idle":
-        motor_state["temperature_c"] -= cooling_rate
-    motor_state["temperature_c"] = round(motor_state["temperature_c"], 2)
+        # Simulate failure
+        servo_fail = c["servo_fail"][sel]
+        newly_failed = (temperature > ARM_MAX_TEMP) & ~servo_fail
+        movement = np.where(newly_failed, ARM_FAILED, movement)
 
-    # Simulate overheat
-    if motor_state["temperature_c"] >= max_temp:
-        motor_state["failures"].append("overheat")
-        motor_state["status"] = "failed"
+        c["current_position_deg"][sel] = position
+        c["servo_load"][sel] = load
+        c["movement"][sel] = movement
+        c["temperature_c"][sel] = temperature
+        c["servo_fail"][sel] = servo_fail | newly_failed
 
-    return dict(motor_state)
+    def state(self, row):
+        c = self.columns
+        return {
+            "arm_id": self.ids[row],
+            "current_position_deg": float(c["current_position_deg"][row]),
+            "target_position_deg": float(c["target_position_deg"][row]),
+            "movement": ARM_MOVEMENTS[c["movement"][row]],
+            "speed_dps": float(c["speed_dps"][row]),
+            "temperature_c": float(c["temperature_c"][row]),
+            "servo_load": float(c["servo_load"][row]),
+            "failures": ["servo_fail"] if c["servo_fail"][row] else [],
+        }
 
 
 # -------------------------------
-# Robot Arm Simulation Logic
+# Registries
 # -------------------------------
 
-def move_robot_arm(target_deg: int):
-    max_deg = 180
-    min_deg = 0
-    target = max(min(target_deg, max_deg), min_deg)
-    delta = target - arm_state["current_position_deg"]
+motors = MotorBank()
+motors.add("M1")
 
-    arm_state["target_position_deg"] = target
+arms = ArmBank()
+arms.add("A1")
 
-    if abs(delta) < 1:
-        arm_state["movement"] = "reached"
-        arm_state["servo_load"] = 0.0
-    else:
-        # Move toward target
-        direction = 1 if delta > 0 else -1
-        step = direction * arm_state["speed_dps"] * 0.1  # simulate 100ms/frame
-        arm_state["current_position_deg"] += step
-        arm_state["current_position_deg"] = round(arm_state["current_position_deg"], 2)
-        arm_state["movement"] = "moving"
-        arm_state["servo_load"] = round(abs(delta) / 180, 2)
-
-    # Simulate servo heating
-    if arm_state["movement"] == "moving":
-        arm_state["temperature_c"] += 0.4
-    else:
-        arm_state["temperature_c"] -= 0.3
-
-    # Clamp temperature
-    arm_state["temperature_c"] = round(max(24.0, min(80.0, arm_state["temperature_c"])), 2)
-
-    # Simulate failure
-    if arm_state["temperature_c"] > 75 and "servo_fail" not in arm_state["failures"]:
-        arm_state["failures"].append("servo_fail")
-        arm_state["movement"] = "failed"
-
-    return dict(arm_state)
+
+def step_motors():
+    """Advance every registered motor in one batched update."""
+    motors.step()
+
+
+def step_arms():
+    """Advance every registered arm toward its current target in one batched update."""
+    arms.step()
+
+
+def spin_motor_simulation(motor_id="M1"):
+    row = motors.index[motor_id]
+    motors.step([row])
+    return motors.state(row)
+
+
+def move_robot_arm(target_deg: int, arm_id="A1"):
+    row = arms.index[arm_id]
+    arms.set_targets([row], target_deg)
+    arms.step([row])
+    return arms.state(row)
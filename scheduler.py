@@ -0,0 +1,179 @@
+# scheduler.py - Valencia Walker's
+# Fixed-timestep driver for the simulators (drones, motor, arm, temperature).
+#
+# Each registered simulator is called as fn(dt) with a constant dt = 1 / rate_hz.
+# Ticks are scheduled against the monotonic clock, so work time does not make
+# the rate drift. When a tick is late the simulator's policy decides:
+#   "catch_up"  run the missed ticks back to back (at most max_catch_up), drop the rest
+#   "drop"      run one tick and skip the missed ones
+# Missed, dropped and overrunning ticks are counted per simulator, and tick
+# durations go into a fixed-bucket histogram, all exposed through stats().
+# Ticks run outside the bookkeeping lock (they only hold tick_lock, which keeps
+# step() and the background thread from ticking at once), so stats(),
+# register() and pause/resume never wait behind a slow simulator.
+
+import logging
+import threading
+import time
+
+CATCH_UP = "catch_up"
+DROP = "drop"
+
+# Upper bucket edges in milliseconds; the last bucket is open-ended.
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Simulator:
+    def __init__(self, name, fn, rate_hz, policy, max_catch_up):
+        if policy not in (CATCH_UP, DROP):
+            raise ValueError(f"Unknown tick policy '{policy}'")
+        self.name = name
+        self.fn = fn
+        self.period = 1.0 / rate_hz
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.next_due = None
+        self.ticks = 0
+        self.overruns = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+
+    def record(self, seconds):
+        ms = seconds * 1000.0
+        self.ticks += 1
+        self.last_ms = ms
+        self.max_ms = max(self.max_ms, ms)
+        if seconds > self.period:
+            self.overruns += 1
+        for i, edge in enumerate(HISTOGRAM_BUCKETS_MS):
+            if ms <= edge:
+                self.histogram[i] += 1
+                return
+        self.histogram[-1] += 1
+
+    def stats(self):
+        return {
+            "rate_hz": round(1.0 / self.period, 3),
+            "policy": self.policy,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_ms": round(self.last_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "histogram_ms": {
+                "buckets": list(HISTOGRAM_BUCKETS_MS) + ["inf"],
+                "counts": list(self.histogram),
+            },
+        }
+
+
+class Scheduler:
+    """Drives registered simulators at fixed rates on one background thread."""
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.simulators = {}
+        self.paused = False
+        self.lock = threading.Lock()       # guards simulators and their counters
+        self.tick_lock = threading.Lock()  # held while ticks run
+        self.thread = None
+
+    def register(self, name, fn, rate_hz=1.0, policy=CATCH_UP, max_catch_up=5):
+        with self.lock:
+            self.simulators[name] = Simulator(name, fn, rate_hz, policy, max_catch_up)
+
+    def unregister(self, name):
+        with self.lock:
+            self.simulators.pop(name, None)
+
+    # -------------------------------
+    # Ticking
+    # -------------------------------
+
+    def _tick(self, sim):
+        """Run one tick without holding self.lock; only the bookkeeping takes it."""
+        started = self.clock()
+        failed = False
+        try:
+            sim.fn(sim.period)
+        except Exception:
+            failed = True
+            logging.exception(f"Simulator '{sim.name}' tick failed")
+        elapsed = self.clock() - started
+        with self.lock:
+            sim.errors += failed
+            sim.record(elapsed)
+
+    def step(self, name=None, ticks=1):
+        """Run ``ticks`` ticks of one simulator (or all) immediately, paused or not."""
+        with self.lock:
+            sims = [self.simulators[name]] if name else list(self.simulators.values())
+        with self.tick_lock:
+            for _ in range(ticks):
+                for sim in sims:
+                    self._tick(sim)
+
+    def run_pending(self):
+        """Run every simulator that is due; returns seconds until the next one is due."""
+        with self.tick_lock:
+            # Plan under the lock, tick outside it.
+            with self.lock:
+                now = self.clock()
+                plan = []
+                for sim in self.simulators.values():
+                    if sim.next_due is None:
+                        sim.next_due = now
+                    if now >= sim.next_due:
+                        due = int((now - sim.next_due) // sim.period) + 1
+                        run = min(due, sim.max_catch_up) if sim.policy == CATCH_UP else 1
+                        sim.dropped += due - run
+                        sim.next_due += due * sim.period
+                        plan.append((sim, run))
+            for sim, run in plan:
+                for _ in range(run):
+                    self._tick(sim)
+            with self.lock:
+                now = self.clock()
+                # next_due is None for simulators reset by resume() while ticking: due now
+                waits = [sim.next_due - now if sim.next_due is not None else 0.0
+                         for sim in self.simulators.values()]
+            return max(min(waits), 0.0) if waits else 0.1
+
+    # -------------------------------
+    # Control
+    # -------------------------------
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        # Restart the timeline so the pause is not replayed as a catch-up burst.
+        with self.lock:
+            for sim in self.simulators.values():
+                sim.next_due = None
+            self.paused = False
+
+    def _run(self):
+        while True:
+            if self.paused:
+                self.sleep(0.1)
+                continue
+            self.sleep(self.run_pending())
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def stats(self):
+        with self.lock:
+            return {
+                "paused": self.paused,
+                "simulators": {name: sim.stats() for name, sim in self.simulators.items()},
+            }
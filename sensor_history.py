@@ -0,0 +1,192 @@
+# sensor_history.py - Valencia Walker's
+# Fixed-memory time-series history for IoT sensor readings.
+#
+# Every sensor owns one row of two preallocated (max_sensors, capacity)
+# arrays: int64 epoch-nanosecond timestamps and float32 values, written as a
+# ring. Memory is max_sensors * capacity * 12 bytes however long the process
+# runs (zeroed pages are only committed once a sensor writes to them).
+# Batches are scattered into the rings in one vectorized assignment; range
+# queries and min/max/mean downsampling run on an ordered view of one
+# sensor's ring.
+
+import threading
+import time
+import numpy as np
+
+DEFAULT_CAPACITY = 86400      # one day at 1 Hz
+DEFAULT_MAX_SENSORS = 64
+
+
+class SensorHistory:
+    def __init__(self, capacity=DEFAULT_CAPACITY, max_sensors=DEFAULT_MAX_SENSORS):
+        self.capacity = capacity
+        self.max_sensors = max_sensors
+        self.timestamps = np.zeros((max_sensors, capacity), dtype=np.int64)
+        self.values = np.zeros((max_sensors, capacity), dtype=np.float32)
+        self.written = np.zeros(max_sensors, dtype=np.int64)  # total samples ever written per row
+        self.units = {}
+        self.rows = {}  # sensor id -> row
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def sensors(self):
+        with self.lock:
+            return [{"sensor": sensor, "unit": self.units.get(sensor),
+                     "samples": int(min(self.written[row], self.capacity)), "total": int(self.written[row])}
+                    for sensor, row in self.rows.items()]
+
+    def _row(self, sensor, unit=None):
+        row = self.rows.get(sensor)
+        if row is None:
+            if len(self.rows) >= self.max_sensors:
+                raise ValueError(f"Sensor history is full ({self.max_sensors} sensors)")
+            row = self.rows[sensor] = len(self.rows)
+        if unit is not None:
+            self.units[sensor] = unit
+        return row
+
+    def reserve(self, sensors):
+        """Register every sensor in ``sensors`` or, if they would not all fit, none of them.
+
+        Raises ValueError naming the first sensor past ``max_sensors``.
+        """
+        with self.lock:
+            self._reserve(sensors)
+
+    def _reserve(self, sensors):
+        new = [sensor for sensor in dict.fromkeys(sensors) if sensor not in self.rows]
+        if len(self.rows) + len(new) > self.max_sensors:
+            raise ValueError(f"Sensor history is full ({self.max_sensors} sensors); "
+                             f"cannot add '{new[self.max_sensors - len(self.rows)]}'")
+        for sensor in new:
+            self._row(sensor)
+
+    # -------------------------------
+    # Ingest
+    # -------------------------------
+
+    def append(self, sensor, value, timestamp_ns=None, unit=None):
+        self.ingest([sensor], [time.time_ns() if timestamp_ns is None else timestamp_ns], [value], unit)
+
+    def ingest(self, sensors, timestamps_ns, values, unit=None):
+        """Append a batch of readings; ``sensors`` is one id per reading (or a single id for all).
+
+        ``unit`` is one unit for every sensor or a {sensor: unit} dict. Readings
+        for one sensor are assumed to arrive in time order.
+        """
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64).ravel()
+        values = np.asarray(values, dtype=np.float32).ravel()
+        count = len(values)
+        if count == 0:
+            return 0
+        with self.lock:
+            if isinstance(sensors, str):
+                rows = np.full(count, self._row(sensors, unit), dtype=np.int64)
+            else:
+                self._reserve(sensors)  # all or nothing, so a full history leaves no partial rows
+                per_sensor = isinstance(unit, dict)
+                lookup = {sensor: self._row(sensor, unit.get(sensor) if per_sensor else unit)
+                          for sensor in set(sensors)}
+                rows = np.fromiter((lookup[s] for s in sensors), dtype=np.int64, count=count)
+
+            # Rank of each reading within its sensor's part of the batch
+            order = np.argsort(rows, kind="stable")
+            sorted_rows = rows[order]
+            starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+            group_sizes = np.diff(np.r_[starts, count])
+            rank = np.arange(count) - np.repeat(starts, group_sizes)
+            group_rows = sorted_rows[starts]
+            # A sensor with more than ``capacity`` readings in one batch keeps only its newest
+            keep = rank >= np.repeat(group_sizes, group_sizes) - self.capacity
+            order, sorted_rows, rank = order[keep], sorted_rows[keep], rank[keep]
+
+            slots = (self.written[sorted_rows] + rank) % self.capacity
+            self.timestamps[sorted_rows, slots] = timestamps_ns[order]
+            self.values[sorted_rows, slots] = values[order]
+            self.written[group_rows] += group_sizes
+        return count
+
+    def ingest_block(self, sensors, timestamps_ns, values, units=None):
+        """Append a (S, N) block: S shared timestamps for the N sensors in ``sensors``.
+
+        ``units`` is an optional per-sensor list. Faster than ingest() for
+        simulators that sample every sensor on the same clock.
+        """
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float32)
+        samples = len(timestamps_ns)
+        if samples == 0:
+            return 0
+        if samples > self.capacity:
+            timestamps_ns, values = timestamps_ns[-self.capacity:], values[-self.capacity:]
+        with self.lock:
+            self._reserve(sensors)
+            rows = np.array([self._row(sensor, None if units is None else units[i])
+                             for i, sensor in enumerate(sensors)], dtype=np.int64)
+            slots = (self.written[rows][None, :] + np.arange(len(timestamps_ns))[:, None]) % self.capacity
+            self.timestamps[rows[None, :], slots] = timestamps_ns[:, None]
+            self.values[rows[None, :], slots] = values
+            self.written[rows] += len(timestamps_ns)  # only what was stored, or the ring head drifts
+        return len(timestamps_ns) * len(rows)
+
+    # -------------------------------
+    # Queries
+    # -------------------------------
+
+    def _window(self, sensor):
+        """(timestamps, values) of one sensor, oldest first (copies)."""
+        row = self.rows.get(sensor)
+        if row is None:
+            return None
+        written = int(self.written[row])
+        if written <= self.capacity:
+            return self.timestamps[row, :written].copy(), self.values[row, :written].copy()
+        head = written % self.capacity
+        return (np.concatenate((self.timestamps[row, head:], self.timestamps[row, :head])),
+                np.concatenate((self.values[row, head:], self.values[row, :head])))
+
+    def range(self, sensor, start_ns=None, end_ns=None):
+        """Readings with start_ns <= t <= end_ns as (timestamps, values), or None for an unknown sensor."""
+        with self.lock:
+            window = self._window(sensor)
+        if window is None:
+            return None
+        timestamps, values = window
+        if len(timestamps) > 1 and (np.diff(timestamps) < 0).any():
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, values = timestamps[order], values[order]
+        lo = 0 if start_ns is None else np.searchsorted(timestamps, start_ns, side="left")
+        hi = len(timestamps) if end_ns is None else np.searchsorted(timestamps, end_ns, side="right")
+        return timestamps[lo:hi], values[lo:hi]
+
+    def aggregate(self, sensor, step_ns, start_ns=None, end_ns=None):
+        """Per-bucket count/min/max/mean over fixed ``step_ns`` buckets; empty buckets are omitted.
+
+        Buckets are aligned to ``start_ns`` (or the first reading). Returns a dict
+        of arrays, or None for an unknown sensor.
+        """
+        selected = self.range(sensor, start_ns, end_ns)
+        if selected is None:
+            return None
+        timestamps, values = selected
+        if len(timestamps) == 0:
+            empty = np.zeros(0)
+            return {"bucket_start": empty.astype(np.int64), "count": empty.astype(np.int64),
+                    "min": empty, "max": empty, "mean": empty}
+        origin = timestamps[0] if start_ns is None else start_ns
+        buckets = (timestamps - origin) // step_ns
+        edges = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        counts = np.diff(np.r_[edges, len(values)])
+        values = values.astype(np.float64)
+        return {
+            "bucket_start": origin + buckets[edges] * step_ns,
+            "count": counts,
+            "min": np.minimum.reduceat(values, edges),
+            "max": np.maximum.reduceat(values, edges),
+            "mean": np.add.reduceat(values, edges) / counts,
+        }
+
+    def memory_bytes(self):
+        return self.timestamps.nbytes + self.values.nbytes + self.written.nbytes
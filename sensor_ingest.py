@@ -0,0 +1,138 @@
+# sensor_ingest.py - Valencia Walker's
+# Bounded ingest queue between the HTTP ingest endpoint and sensor storage.
+#
+# Request handlers only validate a batch and append it to an in-memory queue
+# capped at max_readings. They never touch storage, so a burst from a device
+# fleet cannot stall Flask workers. One background writer drains everything
+# queued every flush_interval_s (or sooner once flush_readings are waiting).
+# It concatenates the batches and hands them to each sink in one call: the
+# SensorHistory plus any extra sinks, e.g. the telemetry store. When the
+# queue is full, offer() refuses the batch and retry_after() estimates from
+# the measured drain rate how long the client should back off.
+
+import logging
+import threading
+import time
+from collections import deque
+import numpy as np
+
+DEFAULT_MAX_READINGS = 1_000_000
+DEFAULT_FLUSH_READINGS = 50_000
+DEFAULT_FLUSH_INTERVAL_S = 0.25
+
+log = logging.getLogger(__name__)
+
+
+class IngestQueue:
+    def __init__(self, sinks, max_readings=DEFAULT_MAX_READINGS, flush_readings=DEFAULT_FLUSH_READINGS,
+                 flush_interval_s=DEFAULT_FLUSH_INTERVAL_S):
+        self.sinks = list(sinks)  # each sink: fn(sensors list, timestamps_ns, values, units dict)
+        self.max_readings = max_readings
+        self.flush_readings = flush_readings
+        self.flush_interval_s = flush_interval_s
+        self.batches = deque()
+        self.queued = 0
+        self.accepted = self.rejected = self.written = self.failed = self.flushes = 0
+        self.drain_rate = None  # readings per second, smoothed
+        self.last_flush_ms = 0.0
+        self.wake = threading.Condition()
+        self.thread = None
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def offer(self, sensors, timestamps_ns, values, units=None, admit=None):
+        """Queue one batch; False (nothing queued) if it would overflow the queue.
+
+        ``admit(sensors)`` runs under the queue lock once the batch fits; if it
+        raises, the exception propagates and nothing is queued.
+        """
+        count = len(values)
+        with self.wake:
+            if self.queued + count > self.max_readings:
+                self.rejected += count
+                return False
+            if admit is not None:
+                admit(sensors)
+            self.batches.append((sensors, timestamps_ns, values, units or {}))
+            self.queued += count
+            self.accepted += count
+            if self.queued >= self.flush_readings:
+                self.wake.notify()
+        return True
+
+    def retry_after(self):
+        """Seconds a rejected client should wait: time to drain half the queue, at least 1."""
+        with self.wake:
+            rate = self.drain_rate or self.flush_readings / self.flush_interval_s
+            return max(1, int(np.ceil(self.queued / 2 / rate)))
+
+    # -------------------------------
+    # Writer
+    # -------------------------------
+
+    def flush(self):
+        """Write everything queued to every sink; returns the number of readings every sink stored."""
+        with self.wake:
+            batches, self.batches = self.batches, deque()
+            count, self.queued = self.queued, 0
+        if not batches:
+            return 0
+        started = time.perf_counter()
+        sensors = [sensor for batch in batches for sensor in batch[0]]
+        timestamps = np.concatenate([batch[1] for batch in batches])
+        values = np.concatenate([batch[2] for batch in batches])
+        units = {}
+        for batch in batches:
+            units.update(batch[3])
+        ok = [True] * len(batches)
+        for sink in self.sinks:
+            try:
+                sink(sensors, timestamps, values, units)
+            except Exception:
+                # Retry batch by batch so one bad batch cannot sink everyone else's readings.
+                # Sinks must raise before storing anything (the built-in ones do).
+                log.warning("Ingest sink %r failed for %d readings; retrying per batch", sink, count)
+                for i, batch in enumerate(batches):
+                    try:
+                        sink(*batch)
+                    except Exception:
+                        ok[i] = False
+                        log.exception("Ingest sink %r failed for a batch of %d readings", sink, len(batch[2]))
+        written = sum(len(batch[2]) for batch, stored in zip(batches, ok) if stored)
+        elapsed = time.perf_counter() - started
+        with self.wake:
+            self.written += written
+            self.failed += count - written
+            self.flushes += 1
+            self.last_flush_ms = elapsed * 1000.0
+            rate = count / max(elapsed, 1e-6)
+            self.drain_rate = rate if self.drain_rate is None else 0.8 * self.drain_rate + 0.2 * rate
+        return written
+
+    def _run(self):
+        while True:
+            with self.wake:
+                if self.queued < self.flush_readings:
+                    self.wake.wait(self.flush_interval_s)
+            self.flush()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def stats(self):
+        with self.wake:
+            return {
+                "queued": self.queued,
+                "max_readings": self.max_readings,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "written": self.written,
+                "failed": self.failed,
+                "flushes": self.flushes,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "drain_rate": round(self.drain_rate or 0.0, 1),
+            }
@@ -0,0 +1,142 @@
+# sim_run.py - Valencia Walker's
+# Seeded, replayable simulation runs.
+#
+# A run has an id and a seed. Every simulator draws from its own named RNG
+# stream derived from that seed (NumPy Generator for the vectorized paths,
+# random.Random for scalar ones), so streams do not disturb each other and a
+# run is reproducible from (seed, input events). External inputs such as
+# spawn/clear requests are recorded with the simulator tick they landed on;
+# replay() re-applies them at the same ticks and steps without sleeping.
+#
+# Recorded runs are JSON lines under runs/<run_id>.jsonl: a header line
+# {"run_id", "seed", "created"} followed by one line per event.
+#
+# Recording and replay cover the drone app (apphandledataa.py, SIM_RECORD=1)
+# only. Its spawn/clear requests are the whole input. ValenciaWalkerapp.py and
+# app.py use seeded streams, so runs without outside input repeat exactly. They
+# do not record motor/arm commands, twin start/stop or IoT ingest, so their
+# runs cannot be replayed.
+
+import argparse
+import json
+import os
+import random
+import secrets
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+RUNS_DIR = "runs"
+
+
+class SimulationRun:
+    def __init__(self, seed=None, run_id=None, record=False):
+        self.seed = int(seed) if seed is not None else secrets.randbits(63)
+        self.run_id = run_id or uuid.uuid4().hex
+        self.events = []
+        self.lock = threading.Lock()
+        self.path = None
+        if record:
+            os.makedirs(RUNS_DIR, exist_ok=True)
+            self.path = os.path.join(RUNS_DIR, f"{self.run_id}.jsonl")
+            with open(self.path, "w") as f:
+                f.write(json.dumps(self.header()) + "\n")
+
+    def header(self):
+        return {"run_id": self.run_id, "seed": self.seed, "created": datetime.utcnow().isoformat()}
+
+    # -------------------------------
+    # RNG Streams
+    # -------------------------------
+
+    def _stream_key(self, name):
+        return zlib.crc32(name.encode("utf-8"))
+
+    def rng(self, name):
+        """NumPy Generator for the named stream; same (seed, name) -> same sequence."""
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(self._stream_key(name),)))
+
+    def random(self, name):
+        """random.Random for scalar code paths, seeded from the named stream."""
+        return random.Random(int(self.rng(name).integers(0, 2 ** 63)))
+
+    # -------------------------------
+    # Input Events
+    # -------------------------------
+
+    def record(self, tick, event, **args):
+        entry = {"tick": tick, "event": event, "args": args}
+        with self.lock:
+            self.events.append(entry)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+
+    def info(self):
+        return {"run_id": self.run_id, "seed": self.seed, "recording": self.path is not None,
+                "events": len(self.events)}
+
+
+def load_run(path):
+    """Read a recorded run; returns (SimulationRun without recording, events)."""
+    with open(path) as f:
+        header = json.loads(f.readline())
+        events = [json.loads(line) for line in f if line.strip()]
+    return SimulationRun(seed=header["seed"], run_id=header["run_id"]), events
+
+
+def replay(events, handlers, step, ticks=None, dt=1.0):
+    """Re-apply ``events`` at their ticks around ``step(dt)`` calls, as fast as possible.
+
+    ``handlers`` maps event name -> callable(**args). Runs until ``ticks`` ticks,
+    or one tick past the last event. Returns (ticks run, wall seconds).
+    """
+    if ticks is None:
+        ticks = (events[-1]["tick"] + 1) if events else 0
+    pending = sorted(events, key=lambda e: e["tick"])
+    i = 0
+    started = time.perf_counter()
+    for tick in range(ticks):
+        while i < len(pending) and pending[i]["tick"] <= tick:
+            handlers[pending[i]["event"]](**pending[i]["args"])
+            i += 1
+        step(dt)
+    return ticks, time.perf_counter() - started
+
+
+def replay_drones(path, ticks=None, dt=1.0):
+    """Rebuild a run recorded by the drone app offline; returns (swarm, ticks run, wall seconds)."""
+    from drone_swarm import DroneSwarm
+
+    run, events = load_run(path)
+    swarm = DroneSwarm(rng=run.rng("drones"))
+    clock = {"now": 0.0}
+
+    def step(dt):
+        clock["now"] += dt
+        swarm.step(dt, clock["now"])
+
+    handlers = {
+        "spawn": lambda count: swarm.spawn(swarm.new_ids(count), clock["now"]),
+        "clear": lambda: swarm.clear(),
+    }
+    ran, seconds = replay(events, handlers, step, ticks, dt)
+    return swarm, ran, seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a drone app run (recorded with SIM_RECORD=1) without sleeping.")
+    parser.add_argument("run", help="run id or path to runs/<run_id>.jsonl")
+    parser.add_argument("--ticks", type=int, default=None, help="ticks to simulate (default: through the last event)")
+    parser.add_argument("--dt", type=float, default=1.0, help="seconds of simulated time per tick")
+    args = parser.parse_args()
+
+    path = args.run if os.path.isfile(args.run) else os.path.join(RUNS_DIR, f"{args.run}.jsonl")
+    swarm, ran, seconds = replay_drones(path, args.ticks, args.dt)
+    checksum = zlib.crc32(swarm.positions[:swarm.count].tobytes())
+    print(f"replayed {ran} ticks ({ran * args.dt:.0f}s simulated) of {len(swarm)} drones "
+          f"in {seconds:.3f}s wall; state crc32={checksum:08x}")
@@ -0,0 +1,116 @@
+# spatial_index.py - Valencia Walker's
+# Uniform lon/lat grid over a bounding box. Each row (drone) lives in exactly
+# one cell bucket; update() only touches rows whose cell changed since the
+# last call, so keeping the index in sync costs O(moved across a cell edge).
+
+import math
+import numpy as np
+
+METERS_PER_DEG_LON = 111320.0
+METERS_PER_DEG_LAT = 110540.0
+
+DEFAULT_CELL_DEG = 0.0025   # ~210m x 275m cells over Manhattan
+
+
+class GridIndex:
+    """Tile-keyed bucket index of row numbers by (lon, lat)."""
+
+    def __init__(self, bounds, cell_deg=DEFAULT_CELL_DEG):
+        self.bounds = bounds
+        self.cell_deg = cell_deg
+        self.cols = max(1, math.ceil((bounds['east'] - bounds['west']) / cell_deg))
+        self.rows = max(1, math.ceil((bounds['north'] - bounds['south']) / cell_deg))
+        self.clear()
+
+    def clear(self):
+        self.cell_of_row = np.full(0, -1, dtype=np.int32)
+        self.buckets = {}
+
+    # -------------------------------
+    # Cell Math
+    # -------------------------------
+
+    def _col(self, lon):
+        col = np.floor((np.asarray(lon) - self.bounds['west']) / self.cell_deg)
+        return np.clip(col, 0, self.cols - 1).astype(np.int32)
+
+    def _row(self, lat):
+        row = np.floor((np.asarray(lat) - self.bounds['south']) / self.cell_deg)
+        return np.clip(row, 0, self.rows - 1).astype(np.int32)
+
+    def cells_for(self, lon, lat):
+        """Cell key for each (lon, lat); points outside the bounds clamp to the edge cells."""
+        return self._row(lat) * self.cols + self._col(lon)
+
+    # -------------------------------
+    # Maintenance
+    # -------------------------------
+
+    def update(self, lon, lat):
+        """Re-bucket rows ``0..len(lon)`` whose cell changed since the previous update."""
+        n = len(lon)
+        if n > len(self.cell_of_row):
+            grown = np.full(max(n, 2 * len(self.cell_of_row)), -1, dtype=np.int32)
+            grown[:len(self.cell_of_row)] = self.cell_of_row
+            self.cell_of_row = grown
+
+        cells = self.cells_for(lon, lat)
+        previous = self.cell_of_row[:n]
+        changed = np.flatnonzero(cells != previous)
+        if changed.size == 0:
+            return
+
+        buckets = self.buckets
+        for row, old, new in zip(changed.tolist(), previous[changed].tolist(), cells[changed].tolist()):
+            if old >= 0:
+                bucket = buckets[old]
+                bucket.discard(row)
+                if not bucket:
+                    del buckets[old]
+            buckets.setdefault(new, set()).add(row)
+        previous[changed] = cells[changed]
+
+    # -------------------------------
+    # Queries (candidate rows, not exact)
+    # -------------------------------
+
+    def _collect(self, col_lo, col_hi, row_lo, row_hi):
+        buckets = self.buckets
+        found = []
+        for r in range(row_lo, row_hi + 1):
+            base = r * self.cols
+            for c in range(col_lo, col_hi + 1):
+                bucket = buckets.get(base + c)
+                if bucket:
+                    found.extend(bucket)
+        return np.array(found, dtype=np.intp)
+
+    def candidates_in_bbox(self, west, south, east, north):
+        """Rows in every cell overlapping the box; callers filter exact positions."""
+        return self._collect(int(self._col(west)), int(self._col(east)),
+                             int(self._row(south)), int(self._row(north)))
+
+    def candidates_in_ring(self, lon, lat, ring):
+        """Rows in the square of cells ``ring`` steps out from the cell holding (lon, lat)."""
+        col, row = int(self._col(lon)), int(self._row(lat))
+        return self._collect(max(col - ring, 0), min(col + ring, self.cols - 1),
+                             max(row - ring, 0), min(row + ring, self.rows - 1))
+
+    def covers_grid(self, lon, lat, ring):
+        col, row = int(self._col(lon)), int(self._row(lat))
+        return (col - ring <= 0 and row - ring <= 0 and
+                col + ring >= self.cols - 1 and row + ring >= self.rows - 1)
+
+
+def ground_distance(lon, lat, center_lon, center_lat):
+    """Approximate horizontal distance in meters, valid for city-sized areas."""
+    dx = (np.asarray(lon) - center_lon) * METERS_PER_DEG_LON * math.cos(math.radians(center_lat))
+    dy = (np.asarray(lat) - center_lat) * METERS_PER_DEG_LAT
+    return np.hypot(dx, dy)
+
+
+def radius_to_bbox(lon, lat, radius_m):
+    """(west, south, east, north) box enclosing a circle of ``radius_m`` meters."""
+    dlon = radius_m / (METERS_PER_DEG_LON * max(math.cos(math.radians(lat)), 1e-6))
+    dlat = radius_m / METERS_PER_DEG_LAT
+    return lon - dlon, lat - dlat, lon + dlon, lat + dlat
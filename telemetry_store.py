@@ -0,0 +1,341 @@
+# telemetry_store.py - Valencia Walker's
+# Append-only columnar telemetry on local disk, partitioned by hour.
+#
+#   <root>/<stream>/schema.json          {"columns": {name: numpy dtype}}
+#   <root>/<stream>/sources.json         dictionary for the int32 source column
+#   <root>/<stream>/<YYYYmmddTHH>/<column>.col
+#                                        raw little-endian values, one file per
+#                                        column, appended in place
+#   <root>/<stream>@1m, <stream>@1h      rollup streams in the same layout
+#
+# Every stream has timestamp_ns (int64 epoch ns) and source (dictionary code)
+# columns plus its own numeric columns. Column files are plain arrays, so a
+# query memory-maps only the columns it asks for and only the hour segments
+# that overlap its time range. A segment's row count is the shortest column,
+# and the first append to a segment after a restart trims longer columns back
+# to it, so a write torn by a crash never misaligns rows. Closed hours are rolled up in the
+# background to per-source count/min/max/mean at 1 minute and 1 hour; the
+# still-open hour is aggregated on the fly at query time. A late (backfilled)
+# append into a rolled-up hour marks that hour pending again. Queries then
+# aggregate it from raw, and the next roll_up() rebuilds its rollup segment.
+
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+
+from backend.utils import atomic_write
+
+HOUR_NS = 3600 * 10**9
+RESOLUTIONS = {"1m": 60 * 10**9, "1h": HOUR_NS}
+BASE_COLUMNS = {"timestamp_ns": "<i8", "source": "<i4"}
+
+# physics_sim state dict fields persisted per motor / arm sample
+MOTOR_FIELDS = ("rpm", "target_rpm", "torque_nm", "angular_velocity", "temperature_c")
+ARM_FIELDS = ("current_position_deg", "target_position_deg", "speed_dps", "temperature_c", "servo_load")
+
+
+def hour_key(hour):
+    return datetime.fromtimestamp(hour * 3600, tz=timezone.utc).strftime("%Y%m%dT%H")
+
+
+def rollup(timestamps, sources, columns, step_ns):
+    """Per (bucket, source) count/min/max/mean of each column; returns a column dict."""
+    buckets = timestamps // step_ns
+    order = np.lexsort((sources, buckets))
+    buckets, sources = buckets[order], sources[order]
+    edges = np.flatnonzero(np.r_[True, (buckets[1:] != buckets[:-1]) | (sources[1:] != sources[:-1])])
+    counts = np.diff(np.r_[edges, len(order)])
+    out = {"timestamp_ns": buckets[edges] * step_ns, "source": sources[edges], "count": counts.astype(np.int64)}
+    for name, values in columns.items():
+        values = values[order].astype(np.float64)
+        out[f"{name}_min"] = np.minimum.reduceat(values, edges)
+        out[f"{name}_max"] = np.maximum.reduceat(values, edges)
+        out[f"{name}_mean"] = np.add.reduceat(values, edges) / counts
+    return out
+
+
+class TelemetryStore:
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        self.schemas = {}
+        self.sources = {}  # stream -> {name: code}
+        self.checked = set()  # segment dirs whose columns were aligned by this process
+        self.rolled = {}  # stream -> set of rolled-up hour segments (mirror of rollups.json)
+        os.makedirs(root, exist_ok=True)
+
+    # -------------------------------
+    # Streams
+    # -------------------------------
+
+    def _dir(self, stream, *parts):
+        return os.path.join(self.root, stream, *parts)
+
+    def streams(self):
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isfile(self._dir(name, "schema.json")))
+
+    def schema(self, stream):
+        if stream not in self.schemas:
+            path = self._dir(stream, "schema.json")
+            if not os.path.isfile(path):
+                return None
+            with open(path) as f:
+                self.schemas[stream] = {name: np.dtype(dtype) for name, dtype in json.load(f)["columns"].items()}
+        return self.schemas[stream]
+
+    def _ensure_schema(self, stream, columns):
+        schema = self.schema(stream)
+        if schema is None:
+            schema = {name: np.dtype(dtype) for name, dtype in BASE_COLUMNS.items()}
+            for name, values in columns.items():
+                schema[name] = np.asarray(values).dtype.newbyteorder("<")
+            os.makedirs(self._dir(stream), exist_ok=True)
+            atomic_write(self._dir(stream, "schema.json"),
+                         json.dumps({"columns": {name: dtype.str for name, dtype in schema.items()}}).encode("utf-8"))
+            self.schemas[stream] = schema
+        missing = set(schema) - set(BASE_COLUMNS) - set(columns)
+        if missing:
+            raise ValueError(f"Telemetry stream '{stream}' needs columns {sorted(missing)}")
+        return schema
+
+    def source_names(self, stream):
+        if stream not in self.sources:
+            path = self._dir(stream, "sources.json")
+            names = []
+            if os.path.isfile(path):
+                with open(path) as f:
+                    names = json.load(f)
+            self.sources[stream] = {name: code for code, name in enumerate(names)}
+        return self.sources[stream]
+
+    def _source_codes(self, stream, sources, count):
+        lookup = self.source_names(stream)
+        if isinstance(sources, str):
+            sources = [sources]
+        new = [name for name in dict.fromkeys(sources) if name not in lookup]
+        if new:
+            for name in new:
+                lookup[name] = len(lookup)
+            atomic_write(self._dir(stream, "sources.json"), json.dumps(list(lookup)).encode("utf-8"))
+        codes = np.fromiter((lookup[name] for name in sources), dtype=np.int32, count=len(sources))
+        return np.full(count, codes[0], dtype=np.int32) if len(codes) == 1 else codes
+
+    # -------------------------------
+    # Writing
+    # -------------------------------
+
+    def append(self, stream, timestamps_ns, sources, **columns):
+        """Append rows: ``sources`` is one name per row (or one name for all), ``columns`` 1-D arrays."""
+        timestamps_ns = np.atleast_1d(np.asarray(timestamps_ns, dtype=np.int64))
+        count = len(timestamps_ns)
+        if count == 0:
+            return 0
+        with self.lock:
+            schema = self._ensure_schema(stream, columns)
+            data = {"timestamp_ns": timestamps_ns, "source": self._source_codes(stream, sources, count)}
+            for name in schema:
+                if name not in data:
+                    data[name] = np.broadcast_to(np.asarray(columns[name]), (count,))
+
+            hours = timestamps_ns // HOUR_NS
+            for hour in np.unique(hours):
+                rows = hours == hour
+                key = hour_key(int(hour))
+                if "@" not in stream and key in self._rolled_hours(stream):
+                    self._set_rolled(stream, key, False)  # late data: this hour's rollup is stale
+                segment = self._dir(stream, key)
+                if segment not in self.checked:
+                    os.makedirs(segment, exist_ok=True)
+                    self._align(segment, schema)
+                    self.checked.add(segment)
+                for name, dtype in schema.items():
+                    with open(os.path.join(segment, f"{name}.col"), "ab") as f:
+                        f.write(np.ascontiguousarray(data[name][rows], dtype=dtype).tobytes())
+        return count
+
+    @staticmethod
+    def _align(segment, schema):
+        """Truncate every column file to the shortest one (undoes a torn append)."""
+        paths = {name: os.path.join(segment, f"{name}.col") for name in schema}
+        rows = min(os.path.getsize(path) // schema[name].itemsize if os.path.exists(path) else 0
+                   for name, path in paths.items())
+        for name, path in paths.items():
+            if os.path.exists(path) and os.path.getsize(path) != rows * schema[name].itemsize:
+                os.truncate(path, rows * schema[name].itemsize)
+
+    def append_state(self, stream, state, source_key, fields, timestamp_ns=None):
+        """Append one motor / arm state dict as a row of float64 ``fields``."""
+        return self.append(stream, time.time_ns() if timestamp_ns is None else timestamp_ns, state[source_key],
+                           **{field: np.float64(state[field]) for field in fields})
+
+    # -------------------------------
+    # Reading
+    # -------------------------------
+
+    def segments(self, stream, start_ns=None, end_ns=None):
+        """Hour segment directory names overlapping [start_ns, end_ns], oldest first."""
+        if not os.path.isdir(self._dir(stream)):
+            return []
+        first = None if start_ns is None else hour_key(start_ns // HOUR_NS)
+        last = None if end_ns is None else hour_key(end_ns // HOUR_NS)
+        return sorted(name for name in os.listdir(self._dir(stream))
+                      if os.path.isdir(self._dir(stream, name))
+                      and (first is None or name >= first) and (last is None or name <= last))
+
+    def _map_segment(self, stream, segment, names):
+        schema = self.schema(stream)
+        sizes = {name: os.path.getsize(self._dir(stream, segment, f"{name}.col")) // schema[name].itemsize
+                 for name in schema}
+        rows = min(sizes.values())
+        if rows == 0:
+            return {name: np.zeros(0, dtype=schema[name]) for name in names}
+        return {name: np.memmap(self._dir(stream, segment, f"{name}.col"), dtype=schema[name], mode="r", shape=(rows,))
+                for name in names}
+
+    def read(self, stream, start_ns=None, end_ns=None, columns=None, sources=None):
+        """Raw rows in [start_ns, end_ns] as {column: ndarray}; only ``columns`` are mapped and copied.
+
+        ``sources`` filters by source name. Returns None for an unknown stream.
+        """
+        schema = self.schema(stream)
+        if schema is None:
+            return None
+        names = list(schema) if columns is None else ["timestamp_ns", "source"] + [c for c in columns if c in schema
+                                                                                 and c not in BASE_COLUMNS]
+        codes = None
+        if sources is not None:
+            lookup = self.source_names(stream)
+            codes = np.array([lookup[s] for s in sources if s in lookup], dtype=np.int32)
+
+        parts = {name: [] for name in names}
+        for segment in self.segments(stream, start_ns, end_ns):
+            mapped = self._map_segment(stream, segment, names)
+            timestamps = mapped["timestamp_ns"]
+            mask = np.ones(len(timestamps), dtype=bool)
+            if start_ns is not None:
+                mask &= timestamps >= start_ns
+            if end_ns is not None:
+                mask &= timestamps <= end_ns
+            if codes is not None:
+                mask &= np.isin(mapped["source"], codes)
+            for name in names:
+                parts[name].append(np.asarray(mapped[name][mask]))
+        return {name: np.concatenate(chunks) if chunks else np.zeros(0, dtype=schema[name])
+                for name, chunks in parts.items()}
+
+    def query(self, stream, start_ns=None, end_ns=None, columns=None, sources=None, resolution="raw"):
+        """Raw rows, or "1m" / "1h" rollups (rolled-up hours from disk, the rest computed now)."""
+        if resolution == "raw":
+            return self.read(stream, start_ns, end_ns, columns, sources)
+        step = RESOLUTIONS[resolution]
+        schema = self.schema(stream)
+        if schema is None:
+            return None
+        value_columns = [c for c in (columns or schema) if c in schema and c not in BASE_COLUMNS]
+        rolled_columns = ["count"] + [f"{c}_{stat}" for c in value_columns for stat in ("min", "max", "mean")]
+        aligned_start = None if start_ns is None else start_ns - start_ns % step
+
+        rolled = self.read(f"{stream}@{resolution}", aligned_start, end_ns, rolled_columns, sources)
+        if rolled is not None and len(rolled["source"]):
+            # The rollup stream has its own source dictionary; translate to this stream's codes
+            lookup = self.source_names(stream)
+            to_base = np.array([lookup[name] for name in self.source_names(f"{stream}@{resolution}")], dtype=np.int32)
+            rolled["source"] = to_base[rolled["source"]]
+        with self.lock:
+            done = set(self._rolled_hours(stream))
+        if rolled is not None and len(rolled["timestamp_ns"]):
+            # Drop rollup rows of hours marked pending again by a late append
+            stale = [hour for hour in np.unique(rolled["timestamp_ns"] // HOUR_NS) if hour_key(int(hour)) not in done]
+            if stale:
+                keep = ~np.isin(rolled["timestamp_ns"] // HOUR_NS, stale)
+                rolled = {name: values[keep] for name, values in rolled.items()}
+        pending = [segment for segment in self.segments(stream, aligned_start, end_ns) if segment not in done]
+        parts = [] if rolled is None else [rolled]
+        for segment in pending:
+            hour = int(datetime.strptime(segment, "%Y%m%dT%H").replace(tzinfo=timezone.utc).timestamp()) * 10**9
+            lo = hour if aligned_start is None else max(hour, aligned_start)
+            hi = hour + HOUR_NS - 1 if end_ns is None else min(hour + HOUR_NS - 1, end_ns)
+            raw = self.read(stream, lo, hi, value_columns, sources)
+            if len(raw["timestamp_ns"]):
+                parts.append(rollup(raw.pop("timestamp_ns"), raw.pop("source"), raw, step))
+        if not parts:
+            return {name: np.zeros(0) for name in ["timestamp_ns", "source"] + rolled_columns}
+        result = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+        order = np.argsort(result["timestamp_ns"], kind="stable")
+        return {name: values[order] for name, values in result.items()}
+
+    def decode_sources(self, stream, codes):
+        names = list(self.source_names(stream))
+        return [names[code] for code in codes]
+
+    # -------------------------------
+    # Rollups
+    # -------------------------------
+
+    def _rolled_hours(self, stream):
+        if stream not in self.rolled:
+            path = self._dir(stream, "rollups.json")
+            hours = set()
+            if os.path.isfile(path):
+                with open(path) as f:
+                    hours = set(json.load(f))
+            self.rolled[stream] = hours
+        return self.rolled[stream]
+
+    def _set_rolled(self, stream, segment, rolled):
+        hours = self._rolled_hours(stream)
+        if rolled:
+            hours.add(segment)
+        else:
+            hours.discard(segment)
+        atomic_write(self._dir(stream, "rollups.json"), json.dumps(sorted(hours)).encode("utf-8"))
+
+    def roll_up(self, now_ns=None):
+        """Roll every closed, not yet rolled-up hour of every stream into @1m / @1h; returns hours done."""
+        current = hour_key((now_ns or time.time_ns()) // HOUR_NS)
+        done_total = 0
+        for stream in self.streams():
+            if "@" in stream:
+                continue
+            value_columns = [c for c in self.schema(stream) if c not in BASE_COLUMNS]
+            for segment in self.segments(stream):
+                with self.lock:
+                    if segment >= current or segment in self._rolled_hours(stream):
+                        continue
+                    # Rebuild from scratch: drop whatever an earlier (now stale) rollup wrote
+                    for resolution in RESOLUTIONS:
+                        stale = self._dir(f"{stream}@{resolution}", segment)
+                        shutil.rmtree(stale, ignore_errors=True)
+                        self.checked.discard(stale)
+                mapped = self._map_segment(stream, segment, list(self.schema(stream)))
+                rows = len(mapped["timestamp_ns"])
+                if rows:
+                    names = self.decode_sources(stream, range(len(self.source_names(stream))))
+                    timestamps = np.asarray(mapped["timestamp_ns"])
+                    sources = np.asarray(mapped["source"])
+                    values = {c: np.asarray(mapped[c]) for c in value_columns}
+                    for resolution, step in RESOLUTIONS.items():
+                        out = rollup(timestamps, sources, values, step)
+                        source_names = [names[code] for code in out.pop("source")]
+                        self.append(f"{stream}@{resolution}", out.pop("timestamp_ns"), source_names, **out)
+                with self.lock:
+                    # A late append that raced this rollup leaves the hour pending for the next run
+                    if len(self._map_segment(stream, segment, ["timestamp_ns"])["timestamp_ns"]) != rows:
+                        continue
+                    self._set_rolled(stream, segment, True)
+                done_total += 1
+        return done_total
+
+    def stats(self):
+        info = {}
+        for stream in self.streams():
+            segments = self.segments(stream)
+            size = sum(os.path.getsize(self._dir(stream, s, f)) for s in segments for f in os.listdir(self._dir(stream, s)))
+            info[stream] = {"segments": len(segments), "bytes": size, "sources": len(self.source_names(stream)),
+                            "columns": list(self.schema(stream))}
+        return info
@@ -0,0 +1,224 @@
+# template_bulk.py - Valencia Walker's
+# Bulk template import / export as NDJSON, one template per line:
+#   {"name": "Line 3", "data": {...template...}}
+#
+# Export splices each template's stored JSON into its line without parsing
+# it, one template at a time, so memory stays flat however many are exported.
+# Import reads the stream in batches. Worker processes parse and validate each
+# batch while the next is read, and each batch's valid templates are saved in
+# input order with one sync, one catalog append and one history flush.
+# After each committed batch the line number (and byte offset, for plain
+# files) is written to a checkpoint. Re-running with the same checkpoint
+# skips everything already imported.
+#
+#   python -m backend.template_bulk export all.ndjson.gz --tag factory
+#   python -m backend.template_bulk import all.ndjson.gz --checkpoint all.ckpt --workers 4
+
+import argparse
+import gzip
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.template_store import INDEX_FILE
+from backend.utils import atomic_write
+from backend.templates_api import (TEMPLATES_PATH, store, list_templates, save_template, save_templates,
+                                   _read_template_bytes)
+
+BATCH_LINES = 256
+MAX_ERRORS = 100
+
+
+# -------------------------------
+# Export
+# -------------------------------
+
+def export_names(tag=None, query=None):
+    names = [entry["name"] for entry in list_templates(tag=tag, query=query)]
+    if tag is None:
+        # Legacy <name>.json files that were never re-saved through the store
+        known = set(store.catalog())
+        for filename in sorted(os.listdir(TEMPLATES_PATH)):
+            name = filename[:-5]
+            if (filename.endswith(".json") and filename != INDEX_FILE and name not in known
+                    and (not query or query.lower() in name.lower())):
+                names.append(name)
+    return names
+
+
+def iter_export(names):
+    """NDJSON lines (bytes) for ``names``, reading one template at a time.
+
+    Reads straight from the store, bypassing the shared TemplateCache so a full
+    export does not evict the templates the dashboards are serving.
+    """
+    for name in names:
+        body = _read_template_bytes(name)
+        if body is None:
+            continue
+        yield b'{"name":' + json.dumps(name).encode("utf-8") + b',"data":' + body.strip() + b"}\n"
+
+
+# -------------------------------
+# Import
+# -------------------------------
+
+def validate_template(name, data):
+    """Error message for an invalid template, or None."""
+    if not isinstance(name, str) or not name or "/" in name or "\\" in name or name.startswith("."):
+        return f"invalid template name {name!r}"
+    if not isinstance(data, dict):
+        return "data must be an object"
+    components = data.get("components", [])
+    if not isinstance(components, list):
+        return "components must be a list"
+    seen = set()
+    for i, comp in enumerate(components):
+        if not isinstance(comp, dict):
+            return f"component {i} is not an object"
+        if "id" in comp:
+            if comp["id"] in seen:
+                return f"duplicate component id {comp['id']!r}"
+            seen.add(comp["id"])
+        for axis in ("x", "y", "z"):
+            if axis in comp and not isinstance(comp[axis], (int, float)):
+                return f"component {comp.get('id', i)} has non-numeric {axis}"
+    return None
+
+
+def validate_batch(batch):
+    """[(line number, raw line)] -> [(line number, name, data or None, error or None)]."""
+    results = []
+    for number, raw in batch:
+        try:
+            record = json.loads(raw)
+            name, data = record["name"], record["data"]
+        except (ValueError, KeyError, TypeError) as e:
+            results.append((number, None, None, f"unreadable line: {e}"))
+            continue
+        error = validate_template(name, data)
+        results.append((number, name, None if error else data, error))
+    return results
+
+
+def _read_checkpoint(path):
+    if path and os.path.isfile(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"line": 0, "offset": 0, "imported": 0, "failed": 0, "errors": []}
+
+
+def _batches(lines, start_line, batch_lines, offset):
+    """Yields (batch, byte offset just past the batch's last line)."""
+    batch = []
+    for number, raw in enumerate(lines, start=1):
+        offset += len(raw)
+        if number <= start_line or not raw.strip():
+            continue
+        batch.append((number, raw))
+        if len(batch) >= batch_lines:
+            yield batch, offset
+            batch = []
+    if batch:
+        yield batch, offset
+
+
+def import_lines(lines, checkpoint=None, workers=None, batch_lines=BATCH_LINES, line_offset=0, byte_offset=0):
+    """Import NDJSON ``lines`` (iterable of bytes), resuming from ``checkpoint`` if given.
+
+    ``line_offset`` / ``byte_offset`` say where ``lines`` starts when the
+    source was seeked past already-imported lines. Returns the checkpoint state.
+    """
+    state = _read_checkpoint(checkpoint)
+    start_line = max(state["line"] - line_offset, 0)
+    batches = _batches(lines, start_line, batch_lines, byte_offset)
+
+    def fail(number, name, error):
+        state["failed"] += 1
+        if len(state["errors"]) < MAX_ERRORS:
+            state["errors"].append({"line": number, "name": name, "error": error})
+
+    def commit(results, offset):
+        valid = [(number, name, data) for number, name, data, error in results if error is None]
+        for number, name, data, error in results:
+            if error is not None:
+                fail(number, name, error)
+        try:
+            # Whole batch at once: one sync, one catalog append, one history flush
+            if valid:
+                save_templates([(name, data) for _, name, data in valid])
+            state["imported"] += len(valid)
+        except (ValueError, OSError):
+            for number, name, data in valid:  # find the offending templates one by one
+                try:
+                    save_template(name, data)
+                    state["imported"] += 1
+                except (ValueError, OSError) as e:
+                    fail(number, name, str(e))
+        if results:
+            state["line"] = results[-1][0] + line_offset
+        state["offset"] = offset
+        if checkpoint:
+            atomic_write(checkpoint, json.dumps(state).encode("utf-8"))
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        for batch, offset in batches:
+            commit(validate_batch(batch), offset)
+        return state
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch, offset in batches:
+            pending.append((pool.submit(validate_batch, batch), offset))
+            if len(pending) >= workers * 2:  # bound how much of the stream is in memory
+                future, offset = pending.popleft()
+                commit(future.result(), offset)
+        while pending:
+            future, offset = pending.popleft()
+            commit(future.result(), offset)
+    return state
+
+
+def _open(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def import_file(path, checkpoint=None, workers=None, batch_lines=BATCH_LINES):
+    """Import an .ndjson / .ndjson.gz file; plain files resume by seeking to the checkpoint offset."""
+    state = _read_checkpoint(checkpoint)
+    with _open(path) as f:
+        if path.endswith(".gz") or not state["offset"]:
+            return import_lines(f, checkpoint, workers, batch_lines)
+        f.seek(state["offset"])
+        return import_lines(f, checkpoint, workers, batch_lines,
+                            line_offset=state["line"], byte_offset=state["offset"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk template import / export as NDJSON.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export")
+    export_parser.add_argument("out", help=".ndjson or .ndjson.gz")
+    export_parser.add_argument("--tag")
+    export_parser.add_argument("--query")
+    import_parser = sub.add_parser("import")
+    import_parser.add_argument("source", help=".ndjson or .ndjson.gz")
+    import_parser.add_argument("--checkpoint", help="progress file; re-run with it to resume")
+    import_parser.add_argument("--workers", type=int, default=None)
+    import_parser.add_argument("--batch-lines", type=int, default=BATCH_LINES)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        count = 0
+        with (gzip.open(args.out, "wb") if args.out.endswith(".gz") else open(args.out, "wb")) as out:
+            for line in iter_export(export_names(args.tag, args.query)):
+                out.write(line)
+                count += 1
+        print(f"{count} templates -> {args.out}")
+    else:
+        state = import_file(args.source, args.checkpoint, args.workers, args.batch_lines)
+        print(f"{state['imported']} imported, {state['failed']} failed, through line {state['line']}")
+        for error in state["errors"][:10]:
+            print(f"  line {error['line']}: {error['error']}")
@@ -0,0 +1,319 @@
+# template_history.py - Valencia Walker's
+# Version history for templates stored as structural diffs.
+#
+# Each save appends one line to history/<slug>/log.jsonl. A line is either a
+# snapshot marker (the full template is in snapshots/<version>.json) or a
+# delta against the previous version:
+#   header:   {"set": {key: value}, "unset": [key]}      top-level fields
+#   added:    [component, ...]                           new ids, in order
+#   removed:  [id, ...]
+#   modified: [[id, {"set": {...}, "unset": [...]}]]     changed component fields, as pairs
+#                                                        so int ids do not become JSON keys
+#   order:    [[index, id], ...]                         slots where the new order
+#                                                        differs from old - removed + added
+# Storage grows with the size of each edit. Checking out version v reads the
+# newest snapshot <= v and replays the deltas after it. A new snapshot is
+# written once the deltas since the last one outweigh it or the chain gets
+# long, so replay cost stays bounded. compact() drops old versions and starts
+# the log at a fresh snapshot. record() and compact() read, change and rewrite
+# meta.json and the log under an exclusive per-template file lock, so the app
+# and a bulk import in another process cannot fork versions or cut each
+# other's log lines.
+
+import fcntl
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from backend.utils import atomic_write, fsync_paths
+
+SNAPSHOT_MAX_CHAIN = int(os.getenv("TEMPLATE_SNAPSHOT_MAX_CHAIN", 200))
+HISTORY_KEEP = int(os.getenv("TEMPLATE_HISTORY_KEEP", 0))  # 0 = keep every version
+
+
+def _field_diff(old, new):
+    diff = {}
+    changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+    removed = [k for k in old if k not in new]
+    if changed:
+        diff["set"] = changed
+    if removed:
+        diff["unset"] = removed
+    return diff
+
+
+def _apply_fields(target, diff):
+    for key in diff.get("unset", ()):
+        target.pop(key, None)
+    target.update(diff.get("set", {}))
+    return target
+
+
+def _by_id(components):
+    """id -> component in order, or None if any component lacks a unique id."""
+    indexed = {}
+    for comp in components:
+        if not isinstance(comp, dict) or "id" not in comp or comp["id"] in indexed:
+            return None
+        indexed[comp["id"]] = comp
+    return indexed
+
+
+def diff_templates(old, new):
+    """Structural delta turning template ``old`` into ``new``, or None if a snapshot is needed."""
+    old_components = _by_id(old.get("components", []))
+    new_components = _by_id(new.get("components", []))
+    if old_components is None or new_components is None:
+        return None
+
+    delta = {}
+    header = _field_diff({k: v for k, v in old.items() if k != "components"},
+                         {k: v for k, v in new.items() if k != "components"})
+    if header:
+        delta["header"] = header
+    added = [comp for comp_id, comp in new_components.items() if comp_id not in old_components]
+    removed = [comp_id for comp_id in old_components if comp_id not in new_components]
+    modified = []
+    for comp_id, comp in new_components.items():
+        before = old_components.get(comp_id)
+        if before is not None and before != comp:
+            modified.append([comp_id, _field_diff(before, comp)])
+    if added:
+        delta["added"] = added
+    if removed:
+        delta["removed"] = removed
+    if modified:
+        delta["modified"] = modified
+
+    gone = set(removed)
+    expected = [comp_id for comp_id in old_components if comp_id not in gone] + [c["id"] for c in added]
+    order = [[i, comp_id] for i, (comp_id, want) in enumerate(zip(new_components, expected)) if comp_id != want]
+    if order:
+        delta["order"] = order
+    return delta
+
+
+def apply_delta(template, delta):
+    """Apply a delta from diff_templates() to ``template`` (modified in place and returned)."""
+    components = {comp["id"]: comp for comp in template.get("components", [])}
+    header = {k: v for k, v in template.items() if k != "components"}
+    _apply_fields(header, delta.get("header", {}))
+
+    for comp_id in delta.get("removed", ()):
+        components.pop(comp_id, None)
+    modified = delta.get("modified", ())
+    if isinstance(modified, dict):  # logs written before modified became a pair list
+        modified = modified.items()
+    for comp_id, fields in modified:
+        components[comp_id] = _apply_fields(dict(components[comp_id]), fields)
+    for comp in delta.get("added", ()):
+        components[comp["id"]] = comp
+
+    ordered = list(components.values())
+    for i, comp_id in delta.get("order", ()):
+        ordered[i] = components[comp_id]
+    header["components"] = ordered
+    template.clear()
+    template.update(header)
+    return template
+
+
+class TemplateHistory:
+    def __init__(self, directory, max_chain=SNAPSHOT_MAX_CHAIN, keep=HISTORY_KEEP):
+        self.directory = directory
+        self.max_chain = max_chain
+        self.keep = keep
+        self.lock = threading.Lock()
+
+    # -------------------------------
+    # Layout
+    # -------------------------------
+
+    def _dir(self, name):
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]+", "_", name))
+
+    def _meta_path(self, name):
+        return os.path.join(self._dir(name), "meta.json")
+
+    def _snapshot_path(self, name, version):
+        return os.path.join(self._dir(name), "snapshots", f"{version}.json")
+
+    def _meta(self, name):
+        try:
+            with open(self._meta_path(name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _exclusive(self, name):
+        os.makedirs(self._dir(name), exist_ok=True)
+        with self.lock, open(os.path.join(self._dir(name), ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_meta(self, name, meta, sync=True):
+        atomic_write(self._meta_path(name), json.dumps(meta).encode("utf-8"), sync)
+
+    # -------------------------------
+    # Recording
+    # -------------------------------
+
+    def record(self, name, previous, data, base=None, head=None, sync=True, written=None):
+        """Append ``data`` as the next version of ``name``; returns the version number.
+
+        ``previous`` is the template ``data`` replaces and ``base`` the store
+        version it was loaded from. If ``base`` is not the ``head`` recorded with
+        the last version, the history missed a save and a snapshot is written
+        instead of a delta. ``sync=False`` leaves the fsyncs to the caller (see
+        record_many), and the paths it must sync are appended to ``written``.
+        """
+        with self._exclusive(name):
+            meta = self._meta(name) or {"latest": 0, "first": 1, "snapshots": [], "chain": 0,
+                                        "chain_bytes": 0, "snapshot_bytes": 0, "log_bytes": 0, "head": None}
+            version = meta["latest"] + 1
+            delta = None
+            if previous is not None and meta["latest"] and meta["head"] == base:
+                delta = diff_templates(previous, data)
+            line = {"version": version, "saved_at": datetime.utcnow().isoformat() + "Z"}
+            if delta is not None:
+                line["delta"] = delta
+                encoded = json.dumps(line, separators=(",", ":")).encode("utf-8")
+                snapshot = (meta["chain"] + 1 > self.max_chain or
+                            meta["chain_bytes"] + len(encoded) > meta["snapshot_bytes"])
+            else:
+                snapshot = True
+
+            os.makedirs(os.path.dirname(self._snapshot_path(name, version)), exist_ok=True)
+            log_path = os.path.join(self._dir(name), "log.jsonl")
+            offset = meta["log_bytes"]
+            if snapshot:
+                body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+                atomic_write(self._snapshot_path(name, version), body, sync)
+                line = {"version": version, "saved_at": line["saved_at"], "snapshot": True}
+                encoded = json.dumps(line, separators=(",", ":")).encode("utf-8")
+                meta["snapshots"].append([version, offset])
+                meta["chain"], meta["chain_bytes"], meta["snapshot_bytes"] = 0, 0, len(body)
+            else:
+                meta["chain"] += 1
+                meta["chain_bytes"] += len(encoded)
+
+            with open(log_path, "ab") as f:
+                f.truncate(offset)  # drop a line appended before a crash but never committed to meta
+                f.write(encoded + b"\n")
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            meta["latest"], meta["head"] = version, head
+            meta["log_bytes"] = offset + len(encoded) + 1
+            self._write_meta(name, meta, sync)
+            if written is not None:
+                written += [log_path, self._meta_path(name)]
+                if snapshot:
+                    written.append(self._snapshot_path(name, version))
+
+        if self.keep and version - meta["first"] + 1 > self.keep * 2:
+            self.compact(name, self.keep)
+        return version
+
+    def record_many(self, records):
+        """record() for [(name, previous, data, base, head)] with one fsync pass at the end; returns the versions."""
+        written = []
+        versions = [self.record(*record, sync=False, written=written) for record in records]
+        fsync_paths(written)
+        return versions
+
+    # -------------------------------
+    # Reading
+    # -------------------------------
+
+    def _log_lines(self, name, offset):
+        with open(os.path.join(self._dir(name), "log.jsonl"), "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                yield json.loads(raw)
+
+    def versions(self, name):
+        """[{version, saved_at, kind, added, removed, modified}] oldest first, or None."""
+        meta = self._meta(name)
+        if meta is None:
+            return None
+        first_offset = meta["snapshots"][0][1]
+        listing = []
+        for line in self._log_lines(name, first_offset):
+            if line["version"] > meta["latest"]:
+                break
+            delta = line.get("delta", {})
+            listing.append({
+                "version": line["version"],
+                "saved_at": line["saved_at"],
+                "kind": "snapshot" if line.get("snapshot") else "delta",
+                "added": len(delta.get("added", ())),
+                "removed": len(delta.get("removed", ())),
+                "modified": len(delta.get("modified", ())),
+            })
+        return listing
+
+    def checkout(self, name, version):
+        """The template as of ``version``, or None if it is not in the history."""
+        meta = self._meta(name)
+        if meta is None or not meta["first"] <= version <= meta["latest"]:
+            return None
+        base, offset = max((s for s in meta["snapshots"] if s[0] <= version), key=lambda s: s[0])
+        with open(self._snapshot_path(name, base)) as f:
+            template = json.load(f)
+        for line in self._log_lines(name, offset):
+            if line["version"] > version:
+                break
+            if line["version"] > base:
+                apply_delta(template, line["delta"])
+        return template
+
+    # -------------------------------
+    # Compaction
+    # -------------------------------
+
+    def compact(self, name, keep):
+        """Keep only the newest ``keep`` versions; the oldest kept one becomes a snapshot."""
+        if not os.path.isdir(self._dir(name)):
+            return None
+        with self._exclusive(name):
+            meta = self._meta(name)
+            if meta is None or keep < 1:
+                return None
+            first = max(meta["latest"] - keep + 1, meta["first"])
+            if first == meta["first"]:
+                return {"first": first, "latest": meta["latest"], "dropped": 0}
+
+            template = self.checkout(name, first)
+            atomic_write(self._snapshot_path(name, first),
+                         json.dumps(template, separators=(",", ":")).encode("utf-8"))
+            lines, snapshots, size = [], [], 0
+            for line in self._log_lines(name, 0):
+                if line["version"] < first or line["version"] > meta["latest"]:
+                    continue
+                if line["version"] == first:
+                    line = {"version": first, "saved_at": line["saved_at"], "snapshot": True}
+                if line.get("snapshot"):
+                    snapshots.append([line["version"], size])
+                encoded = json.dumps(line, separators=(",", ":")).encode("utf-8") + b"\n"
+                lines.append(encoded)
+                size += len(encoded)
+            atomic_write(os.path.join(self._dir(name), "log.jsonl"), b"".join(lines))
+
+            dropped = first - meta["first"]
+            for version, _ in meta["snapshots"]:
+                if version < first:
+                    try:
+                        os.remove(self._snapshot_path(name, version))
+                    except FileNotFoundError:
+                        pass
+            meta["first"], meta["snapshots"], meta["log_bytes"] = first, snapshots, size
+            self._write_meta(name, meta)
+            return {"first": first, "latest": meta["latest"], "dropped": dropped}
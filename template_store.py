@@ -0,0 +1,364 @@
+# template_store.py - Valencia Walker's
+# Indexed on-disk template store.
+#
+# Layout under the templates directory:
+#   index.json                 catalog snapshot: {"log": <log file>, "garbage": [...],
+#                              "entries": name -> {file, tags, component_count,
+#                              counts_by_type, description, updated_at}}
+#   catalog.<gen>.log          catalog changes since the snapshot, one JSON line each
+#   <slug>.<version>.jsonl     line 1: template header (everything but components)
+#                              line 2..N+1: one compact JSON component per line
+#   <slug>.<version>.cidx.npy  one record per component line: byte offset, length,
+#                              x, y, z and an 8-byte id hash
+#
+# The .cidx.npy is memory-mapped, so a subset of components (by id or by
+# region) is located with vectorized masks and only those lines are parsed.
+# Saves write a new versioned pair of files and then append the new catalog
+# entry to the log under an exclusive file lock, so readers never see a
+# half-written template and concurrent saves cannot corrupt each other. A
+# save costs one short append whatever the catalog size. Readers apply only
+# the log lines they have not seen yet. Every COMPACT_RECORDS changes the
+# catalog is rewritten as a fresh snapshot with a new, empty log. Files of
+# replaced versions are deleted one compaction later, not at once, so a
+# reader still holding the previous catalog can finish reading them.
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from backend.utils import atomic_write, fsync_paths
+
+INDEX_FILE = "index.json"
+LOCK_FILE = ".lock"
+COMPACT_RECORDS = int(os.getenv("TEMPLATE_CATALOG_COMPACT", 1000))
+COMPONENT_INDEX_DTYPE = np.dtype([
+    ("offset", "<i8"), ("length", "<i4"),
+    ("x", "<f8"), ("y", "<f8"), ("z", "<f8"),
+    ("id_hash", "<u8"),
+])
+# ensure_ascii (the default) keeps every line's byte length equal to its str length
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+
+def id_hash(component_id):
+    return int.from_bytes(hashlib.blake2b(str(component_id).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _coord(comp, axis):
+    try:
+        return float(comp.get(axis, 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class TemplateStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._catalog = {}
+        self._snapshot = None  # (index.json mtime, log file name, garbage) of the loaded snapshot
+        self._log_offset = 0
+        self._log_records = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # -------------------------------
+    # Catalog
+    # -------------------------------
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    @contextmanager
+    def _exclusive(self):
+        with self.lock, open(self._path(LOCK_FILE), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def catalog(self):
+        """name -> entry. Reloads the snapshot only when it changes, then applies new log lines.
+
+        The returned dict is never mutated afterwards; treat it as read-only.
+        """
+        with self._read_lock:
+            for attempt in range(3):
+                try:
+                    return self._refresh()
+                except FileNotFoundError:  # a compaction swapped the log between our reads
+                    self._snapshot = None
+                    if attempt == 2:
+                        raise
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self._path(INDEX_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            self._catalog, self._snapshot = {}, None
+            return self._catalog
+        if self._snapshot is None or self._snapshot[0] != mtime:
+            with open(self._path(INDEX_FILE)) as f:
+                data = json.load(f)
+            if isinstance(data.get("log"), str) and isinstance(data.get("entries"), dict):
+                self._catalog, log, garbage = data["entries"], data["log"], data.get("garbage", [])
+            else:  # pre-log format: the file is the whole catalog
+                self._catalog, log, garbage = data, None, []
+            self._snapshot = (mtime, log, garbage)
+            self._log_offset = self._log_records = 0
+
+        log = self._snapshot[1]
+        if log is not None:
+            try:
+                size = os.stat(self._path(log)).st_size
+            except FileNotFoundError:
+                size = 0  # nothing appended since the snapshot yet
+            if size > self._log_offset:
+                with open(self._path(log), "rb") as f:
+                    f.seek(self._log_offset)
+                    tail = f.read(size - self._log_offset)
+                complete = tail.rfind(b"\n") + 1  # ignore a line still being written
+                if complete:
+                    catalog = dict(self._catalog)
+                    for line in tail[:complete].splitlines():
+                        record = json.loads(line)
+                        if record.get("entry") is None:
+                            catalog.pop(record["name"], None)
+                        else:
+                            catalog[record["name"]] = record["entry"]
+                        self._log_records += 1
+                    self._catalog = catalog
+                    self._log_offset += complete
+        return self._catalog
+
+    def entry(self, name):
+        return self.catalog().get(name)
+
+    def list(self, tag=None, query=None):
+        """Catalog entries (without file names), optionally filtered by tag or name substring."""
+        results = []
+        for name, entry in sorted(self.catalog().items()):
+            if tag and tag not in entry.get("tags", []):
+                continue
+            if query and query.lower() not in name.lower():
+                continue
+            info = {k: v for k, v in entry.items() if k != "file"}
+            info["name"] = name
+            results.append(info)
+        return results
+
+    # -------------------------------
+    # Writing
+    # -------------------------------
+
+    @staticmethod
+    def _check_name(name):
+        if not name or "/" in name or "\\" in name or name.startswith("."):
+            raise ValueError(f"Invalid template name '{name}'")
+
+    def save(self, name, data):
+        self._check_name(name)
+        entry = self._write_version(name, data)
+        self._commit([(name, entry)])
+        return entry
+
+    def save_many(self, items):
+        """Save [(name, data)] with one fsync pass and one catalog append for the whole batch.
+
+        All names are checked before anything is written. Returns the entries in order.
+        """
+        for name, _ in items:
+            self._check_name(name)
+        entries = [self._write_version(name, data, sync=False) for name, data in items]
+        fsync_paths(self._path(entry["file"] + suffix) for entry in entries for suffix in (".jsonl", ".cidx.npy"))
+        self._commit(list(zip((name for name, _ in items), entries)))
+        return entries
+
+    def _write_version(self, name, data, sync=True):
+        """Write the .jsonl / .cidx.npy pair for a new version of ``name``; returns its catalog entry."""
+        components = data.get("components", []) or []
+        header = {k: v for k, v in data.items() if k != "components"}
+
+        lines = [_encode(header)]
+        lines.extend(map(_encode, components))
+        lengths = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines)) + 1
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        index = np.zeros(len(components), dtype=COMPONENT_INDEX_DTYPE)
+        index["offset"] = offsets[1:]
+        index["length"] = lengths[1:]
+        for axis in ("x", "y", "z"):
+            index[axis] = [_coord(c, axis) for c in components]
+        index["id_hash"] = [id_hash(c.get("id", i)) for i, c in enumerate(components)]
+
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+        stem = f"{slug}.{time.time_ns()}{uuid.uuid4().hex[:6]}"
+        atomic_write(self._path(f"{stem}.jsonl"), ("\n".join(lines) + "\n").encode("ascii"), sync)
+        temp = self._path(f"{stem}.cidx.{uuid.uuid4().hex}.tmp")
+        with open(temp, "wb") as f:
+            np.save(f, index)
+        os.replace(temp, self._path(f"{stem}.cidx.npy"))
+
+        counts = {}
+        for c in components:
+            counts[c.get("type", "other")] = counts.get(c.get("type", "other"), 0) + 1
+        entry = {
+            "file": stem,
+            "description": header.get("description", ""),
+            "tags": list(header.get("tags", [])),
+            "component_count": len(components),
+            "counts_by_type": counts,
+            "updated_at": datetime.utcnow().isoformat() + "Z",
+        }
+        return entry
+
+    def delete(self, name):
+        if self.entry(name) is None:
+            return False
+        return self._commit([(name, None)]) > 0
+
+    def _commit(self, changes):
+        """Append [(name, entry or None to delete)] to the catalog log; returns how many applied."""
+        with self._exclusive():
+            catalog = self.catalog()
+            mtime, log, garbage = self._snapshot or (None, None, [])
+            lines = []
+            batch = {}  # entries set earlier in this batch
+            for name, entry in changes:
+                previous = batch[name] if name in batch else catalog.get(name)
+                if entry is None and previous is None:
+                    continue
+                record = {"name": name, "entry": entry}
+                if previous:
+                    record["replaced"] = previous["file"]
+                batch[name] = entry
+                lines.append(_encode(record) + "\n")
+            if not lines:
+                return 0
+            if log is None:  # first save into a new or pre-log directory: start the log format
+                self._compact(catalog, garbage, lines)
+            else:
+                path = self._path(log)
+                with open(path, "ab") as f:
+                    if self._log_offset < f.tell():  # drop a torn line left by a crashed writer
+                        f.truncate(self._log_offset)
+                    f.write("".join(lines).encode("ascii"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                catalog = self.catalog()
+                if self._log_records >= COMPACT_RECORDS:
+                    self._compact(catalog, garbage, [])
+            return len(lines)
+
+    def _compact(self, catalog, garbage, lines):
+        """Rewrite the snapshot (with ``lines`` applied) and start an empty log. Lock held."""
+        catalog = dict(catalog)
+        replaced = []
+        old_log = self._snapshot[1] if self._snapshot else None
+        if old_log is not None:
+            try:
+                with open(self._path(old_log), "rb") as f:
+                    lines = [line.decode("ascii") for line in f.read(self._log_offset).splitlines(True)] + lines
+            except FileNotFoundError:
+                pass
+        for line in lines:
+            record = json.loads(line)
+            if record.get("entry") is None:
+                catalog.pop(record["name"], None)
+            else:
+                catalog[record["name"]] = record["entry"]
+            if "replaced" in record:
+                replaced.append(record["replaced"])
+        log = f"catalog.{time.time_ns()}.log"
+        snapshot = {"log": log, "garbage": replaced, "entries": catalog}
+        atomic_write(self._path(INDEX_FILE), json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+        # Files replaced before the previous compaction have had a whole log generation to drain
+        for stem in garbage:
+            self._remove_files(stem)
+        if old_log is not None:
+            for filename in os.listdir(self.directory):
+                if filename.startswith("catalog.") and filename.endswith(".log") and filename not in (log, old_log):
+                    os.remove(self._path(filename))
+        self._snapshot = None
+        self.catalog()
+
+    def _remove_files(self, stem):
+        for suffix in (".jsonl", ".cidx.npy"):
+            try:
+                os.remove(self._path(stem + suffix))
+            except FileNotFoundError:
+                pass
+
+    # -------------------------------
+    # Reading
+    # -------------------------------
+
+    def load(self, name):
+        """Full template dict, or None."""
+        entry = self.entry(name)
+        if entry is None:
+            return None
+        with open(self._path(entry["file"] + ".jsonl"), "rb") as f:
+            header = json.loads(f.readline())
+            body = f.read().rstrip(b"\n")
+        # Compact JSON lines never contain raw newlines, so the body is one array away.
+        header["components"] = json.loads(b"[" + body.replace(b"\n", b",") + b"]") if body else []
+        return header
+
+    def raw(self, name):
+        """The full template as JSON bytes, spliced from the stored lines without parsing them."""
+        entry = self.entry(name)
+        if entry is None:
+            return None
+        with open(self._path(entry["file"] + ".jsonl"), "rb") as f:
+            header = f.readline().rstrip(b"\n")
+            body = f.read().rstrip(b"\n")
+        separator = b"" if header == b"{}" else b","
+        return header[:-1] + separator + b'"components":[' + body.replace(b"\n", b",") + b"]}"
+
+    def load_components(self, name, ids=None, bbox=None):
+        """Components of ``name`` matching ``ids`` and/or ``bbox`` (x0, y0, z0, x1, y1, z1).
+
+        Only the matching component lines are read and parsed. Returns None if
+        the template does not exist.
+        """
+        entry = self.entry(name)
+        if entry is None:
+            return None
+        index = np.load(self._path(entry["file"] + ".cidx.npy"), mmap_mode="r")
+        mask = np.ones(len(index), dtype=bool)
+        if ids is not None:
+            mask &= np.isin(index["id_hash"], np.array([id_hash(i) for i in ids], dtype=np.uint64))
+        if bbox is not None:
+            x0, y0, z0, x1, y1, z1 = bbox
+            mask &= ((index["x"] >= x0) & (index["x"] <= x1) & (index["y"] >= y0) & (index["y"] <= y1) &
+                     (index["z"] >= z0) & (index["z"] <= z1))
+        rows = np.flatnonzero(mask)
+        if rows.size == 0:
+            return []
+
+        wanted = None if ids is None else set(map(str, ids))
+        components = []
+        with open(self._path(entry["file"] + ".jsonl"), "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for offset, length in zip(index["offset"][rows].tolist(), index["length"][rows].tolist()):
+                comp = json.loads(data[offset:offset + length])
+                if wanted is None or str(comp.get("id")) in wanted:  # drop id-hash collisions
+                    components.append(comp)
+        return components
+
+    def version(self, name):
+        """Opaque token that changes whenever ``name`` is saved, or None."""
+        entry = self.entry(name)
+        return entry["file"] if entry else None
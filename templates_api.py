@@ -1,16 +1,190 @@
 import os
 import json
+import threading
+from collections import OrderedDict
+
+from backend.template_store import TemplateStore
+from backend.template_history import TemplateHistory
 
 TEMPLATES_PATH = "templates_data"
+TEMPLATE_CACHE_ENTRIES = int(os.getenv("TEMPLATE_CACHE_ENTRIES", 64))
+TEMPLATE_CACHE_BYTES = int(os.getenv("TEMPLATE_CACHE_BYTES", 256 * 1024 * 1024))
+
+store = TemplateStore(TEMPLATES_PATH)
+history = TemplateHistory(os.path.join(TEMPLATES_PATH, "history"))
+
+
+class TemplateCache:
+    """LRU of loaded templates keyed by name, validated against template_version on every lookup.
+
+    Each entry keeps the serialized JSON body (served as-is by the HTTP route)
+    and the parsed dict, which is only built the first time it is asked for.
+    Cached dicts are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=TEMPLATE_CACHE_ENTRIES, max_bytes=TEMPLATE_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # name -> [version, body bytes, dict or None]
+        self.total_bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def _entry(self, name):
+        version = template_version(name)
+        if version is None:
+            self.invalidate(name)
+            return None
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(name)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        body = _read_template_bytes(name)
+        if body is None:
+            return None
+        entry = [version, body, None]
+        with self.lock:
+            old = self.entries.pop(name, None)
+            if old is not None:
+                self.total_bytes -= len(old[1])
+            self.entries[name] = entry
+            self.total_bytes += len(body)
+            while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted[1])
+                self.evictions += 1
+        return entry
+
+    def get_bytes(self, name):
+        entry = self._entry(name)
+        return None if entry is None else entry[1]
+
+    def get(self, name):
+        entry = self._entry(name)
+        if entry is None:
+            return None
+        if entry[2] is None:
+            entry[2] = json.loads(entry[1])
+        return entry[2]
+
+    def invalidate(self, name):
+        with self.lock:
+            old = self.entries.pop(name, None)
+            if old is not None:
+                self.total_bytes -= len(old[1])
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "parsed": sum(1 for entry in self.entries.values() if entry[2] is not None),
+                "bytes": self.total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+cache = TemplateCache()
+
+def template_path(name):
+    """Legacy single-file location, still read for templates saved before the store existed."""
+    return os.path.join(TEMPLATES_PATH, f"{name}.json")
+
+def template_version(name):
+    """Token that changes whenever the template is saved, or None if it does not exist."""
+    version = store.version(name)
+    if version is not None:
+        return version
+    filepath = template_path(name)
+    if os.path.isfile(filepath):
+        stat = os.stat(filepath)
+        return f"legacy:{stat.st_mtime_ns}:{stat.st_size}"
+    return None
+
+def _read_template_bytes(name):
+    body = store.raw(name)
+    if body is not None:
+        return body
+    filepath = template_path(name)
+    if not os.path.isfile(filepath):
+        return None
+    with open(filepath, "rb") as f:
+        return f.read()
 
 def save_template(name, data):
-    filepath = os.path.join(TEMPLATES_PATH, f"{name}.json")
-    with open(filepath, "w") as f:
-        json.dump(data, f)
+    """Save ``data`` as the current template and append it to the version history."""
+    base = template_version(name)
+    previous = load_template(name) if base is not None else None
+    entry = store.save(name, data)
+    cache.invalidate(name)
+    entry["version"] = history.record(name, previous, data, base=base, head=store.version(name))
+    return entry
+
+def save_templates(items):
+    """save_template for a batch of [(name, data)]: one sync, one catalog append, no cache traffic.
+
+    Returns the store entries (with "version") in order.
+    """
+    current = {}  # name -> (store version, template) as of this point in the batch
+    for name, _ in items:
+        if name not in current:
+            base = template_version(name)
+            current[name] = (base, json.loads(_read_template_bytes(name)) if base is not None else None)
+    entries = store.save_many(items)
+    records = []
+    for (name, data), entry in zip(items, entries):
+        base, previous = current[name]
+        records.append((name, previous, data, base, entry["file"]))
+        current[name] = (entry["file"], data)
+        cache.invalidate(name)
+    for entry, version in zip(entries, history.record_many(records)):
+        entry["version"] = version
+    return entries
+
+def template_versions(name):
+    return history.versions(name)
+
+def checkout_template(name, version):
+    return history.checkout(name, version)
+
+def compact_template_history(name, keep):
+    return history.compact(name, keep)
 
 def load_template(name):
-    filepath = os.path.join(TEMPLATES_PATH, f"{name}.json")
-    if not os.path.isfile(filepath):
+    """Parsed template (shared with the cache; do not mutate), or None."""
+    return cache.get(name)
+
+def load_template_bytes(name):
+    """Template as JSON bytes ready to send, or None."""
+    return cache.get_bytes(name)
+
+def list_templates(tag=None, query=None):
+    return store.list(tag=tag, query=query)
+
+def load_components(name, ids=None, bbox=None):
+    """Subset of a template's components by id and/or x/y/z box, without loading the rest."""
+    components = store.load_components(name, ids=ids, bbox=bbox)
+    if components is not None:
+        return components
+    data = load_template(name)
+    if data is None:
         return None
-    with open(filepath, "r") as f:
-        return json.load(f)
+    components = data.get("components", [])
+    if ids is not None:
+        wanted = set(map(str, ids))
+        components = [c for c in components if str(c.get("id")) in wanted]
+    if bbox is not None:
+        x0, y0, z0, x1, y1, z1 = bbox
+        components = [c for c in components
+                      if x0 <= float(c.get("x", 0)) <= x1 and y0 <= float(c.get("y", 0)) <= y1
+                      and z0 <= float(c.get("z", 0)) <= z1]
+    return components
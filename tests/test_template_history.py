@@ -0,0 +1,26 @@
+# test_template_history.py - Valencia Walker's
+# Round trips through TemplateHistory: record a few versions, check them out again.
+
+import copy
+
+from backend.template_history import TemplateHistory
+
+
+def _template(count):
+    return {"name": "t", "components": [{"id": i, "x": float(i), "y": 0.0} for i in range(count)]}
+
+
+def test_checkout_through_delta_with_int_ids(tmp_path):
+    history = TemplateHistory(str(tmp_path))
+    v1 = _template(200)
+    v2 = copy.deepcopy(v1)
+    v2["components"][3]["x"] = 99.0
+    del v2["components"][7]
+    v2["components"].append({"id": 500, "x": 1.0, "y": 1.0})
+
+    history.record("t", None, v1, base=None, head=1)
+    history.record("t", v1, v2, base=1, head=2)
+
+    assert [v["kind"] for v in history.versions("t")] == ["snapshot", "delta"]
+    assert history.checkout("t", 1) == v1
+    assert history.checkout("t", 2) == v2
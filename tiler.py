@@ -0,0 +1,162 @@
+# tiler.py - Valencia Walker's
+# Level-of-detail 3D Tiles output for large twins.
+#
+# Components are partitioned with an octree on x/y/z (z up, schematic units =
+# meters). Each leaf tile holds at most max_per_tile components as an
+# instanced .glb (gltf_builder). Each internal tile holds a coarse proxy: one
+# scaled cube per component type per child octant. Internal tiles use REPLACE
+# refinement, so the viewer swaps a proxy for its children as the camera gets
+# closer and only loads the tiles that are in view.
+#
+#   python -m backend.tiler schematic.json tiles_out --max-per-tile 4096 --origin=-73.98,40.75,0
+#
+# build_tileset() is also used by the Cesium upload path (cesium_routes).
+
+import argparse
+import json
+import math
+import os
+import numpy as np
+
+from backend.gltf_builder import build_instanced_glb
+
+MAX_PER_TILE = 4096
+MAX_DEPTH = 10
+COMPONENT_SIZE = 1.0
+
+# WGS84
+EARTH_A = 6378137.0
+EARTH_E2 = 6.69437999014e-3
+
+
+def enu_transform(lon, lat, height=0.0):
+    """Column-major 4x4 east-north-up -> ECEF matrix placing the tileset on the globe."""
+    lon, lat = math.radians(lon), math.radians(lat)
+    sin_lat, cos_lat, sin_lon, cos_lon = math.sin(lat), math.cos(lat), math.sin(lon), math.cos(lon)
+    n = EARTH_A / math.sqrt(1 - EARTH_E2 * sin_lat * sin_lat)
+    origin = ((n + height) * cos_lat * cos_lon, (n + height) * cos_lat * sin_lon,
+              (n * (1 - EARTH_E2) + height) * sin_lat)
+    east = (-sin_lon, cos_lon, 0.0)
+    north = (-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat)
+    up = (cos_lat * cos_lon, cos_lat * sin_lon, sin_lat)
+    return [*east, 0.0, *north, 0.0, *up, 0.0, *origin, 1.0]
+
+
+def _to_gltf(points):
+    # Tiles are z-up; glTF content is y-up and rotated to z-up by the runtime.
+    return np.stack([points[:, 0], points[:, 2], -points[:, 1]], axis=1)
+
+
+def _box(lo, hi):
+    center = (lo + hi) / 2
+    half = (hi - lo) / 2
+    return [*center.tolist(), half[0], 0, 0, 0, half[1], 0, 0, 0, half[2]]
+
+
+class _Tiler:
+    def __init__(self, types, positions, out_dir, max_per_tile, max_depth):
+        self.types = types
+        self.positions = positions
+        self.out_dir = out_dir
+        self.max_per_tile = max_per_tile
+        self.max_depth = max_depth
+        self.tiles = 0
+        os.makedirs(os.path.join(out_dir, "tiles"), exist_ok=True)
+
+    def _write(self, name, types, positions, scales=None):
+        uri = f"tiles/{name}.glb"
+        with open(os.path.join(self.out_dir, uri), "wb") as f:
+            f.write(build_instanced_glb(types, _to_gltf(positions), COMPONENT_SIZE,
+                                        None if scales is None else scales[:, [0, 2, 1]]))
+        self.tiles += 1
+        return uri
+
+    def _octants(self, rows, lo, hi):
+        center = (lo + hi) / 2
+        p = self.positions[rows]
+        octant = (p[:, 0] >= center[0]) * 1 + (p[:, 1] >= center[1]) * 2 + (p[:, 2] >= center[2]) * 4
+        order = np.argsort(octant, kind="stable")
+        rows, octant = rows[order], octant[order]
+        bounds = np.searchsorted(octant, np.arange(9))
+        for i in range(8):
+            if bounds[i] < bounds[i + 1]:
+                pick = np.array([(i >> axis) & 1 for axis in range(3)], dtype=bool)
+                yield i, rows[bounds[i]:bounds[i + 1]], np.where(pick, center, lo), np.where(pick, hi, center)
+
+    def _proxy(self, children):
+        """One cube per (child octant, type) at the group's centroid, scaled to its extent."""
+        types, centers, scales = [], [], []
+        for rows in children:
+            group_types = self.types[rows]
+            for kind in np.unique(group_types):
+                points = self.positions[rows[group_types == kind]]
+                types.append(kind)
+                centers.append(points.mean(axis=0))
+                scales.append(np.maximum(points.max(axis=0) - points.min(axis=0), COMPONENT_SIZE))
+        return np.array(types, dtype=object), np.array(centers), np.array(scales)
+
+    def build(self, rows, lo, hi, name="0", depth=0):
+        points = self.positions[rows]
+        half = COMPONENT_SIZE / 2
+        tile = {"boundingVolume": {"box": _box(points.min(axis=0) - half, points.max(axis=0) + half)}}
+
+        if len(rows) <= self.max_per_tile or depth >= self.max_depth:
+            tile["geometricError"] = 0.0
+            tile["content"] = {"uri": self._write(name, self.types[rows], points)}
+            return tile
+
+        children = list(self._octants(rows, lo, hi))
+        tile["geometricError"] = float(np.linalg.norm(hi - lo))
+        tile["refine"] = "REPLACE"
+        tile["content"] = {"uri": self._write(name, *self._proxy([c[1] for c in children]))}
+        tile["children"] = [self.build(child_rows, child_lo, child_hi, f"{name}_{i}", depth + 1)
+                            for i, child_rows, child_lo, child_hi in children]
+        return tile
+
+
+def build_tileset(components, out_dir, max_per_tile=MAX_PER_TILE, max_depth=MAX_DEPTH, origin=None):
+    """Write tileset.json + tiles/*.glb for ``components`` into ``out_dir``.
+
+    ``origin`` (lon, lat, height) places the local x/y/z frame on the globe.
+    Returns (tileset path, tile count).
+    """
+    if not components:
+        raise ValueError("No components to tile")
+    types = np.array([c.get("type", "other") for c in components], dtype=object)
+    positions = np.array([(c.get("x", 0), c.get("y", 0), c.get("z", 0)) for c in components],
+                         dtype=np.float64).reshape(-1, 3)
+
+    lo, hi = positions.min(axis=0), positions.max(axis=0)
+    extent = max(float((hi - lo).max()), COMPONENT_SIZE)
+    hi = lo + extent  # cubic root cell keeps octants cubic
+
+    tiler = _Tiler(types, positions, out_dir, max_per_tile, max_depth)
+    root = tiler.build(np.arange(len(positions)), lo, hi)
+    if origin is not None:
+        root["transform"] = enu_transform(*origin)
+
+    tileset = {
+        "asset": {"version": "1.1"},
+        "geometricError": float(np.linalg.norm(hi - lo)) * 2,
+        "root": root,
+    }
+    path = os.path.join(out_dir, "tileset.json")
+    with open(path, "w") as f:
+        json.dump(tileset, f)
+    return path, tiler.tiles
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tile a schematic/template JSON into a 3D Tiles tileset.")
+    parser.add_argument("schematic", help="JSON file with a 'components' list")
+    parser.add_argument("out_dir")
+    parser.add_argument("--max-per-tile", type=int, default=MAX_PER_TILE)
+    parser.add_argument("--max-depth", type=int, default=MAX_DEPTH)
+    parser.add_argument("--origin", default=None, help="lon,lat[,height] to place the model on the globe (use --origin=-73.98,40.75)")
+    args = parser.parse_args()
+
+    with open(args.schematic) as f:
+        components = json.load(f).get("components", [])
+    origin = tuple(float(v) for v in args.origin.split(",")) if args.origin else None
+    path, tiles = build_tileset(components, args.out_dir, args.max_per_tile, args.max_depth, origin)
+    print(f"{len(components)} components -> {tiles} tiles, {path}")
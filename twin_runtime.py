@@ -0,0 +1,155 @@
+# twin_runtime.py - Valencia Walker's
+# Compiles a saved template into preallocated simulator state (motor / arm
+# banks and a sensor array) and runs it on the scheduler. Compiled twins are
+# cached by (template name, store version), so starting a twin again after the
+# first compile only copies arrays instead of re-parsing the JSON.
+
+from collections import OrderedDict
+import numpy as np
+
+from backend.physics_sim import MotorBank, ArmBank
+from backend.iot_simulator import simulate_temperatures
+from backend.templates_api import template_version, load_template
+
+COMPILE_CACHE_SIZE = 32
+
+# Template parameter -> bank column. Parameters not listed (voltage,
+# length_cm, ...) are descriptive only and are not simulated.
+MOTOR_PARAMS = {
+    "rpm": "target_rpm",
+    "target_rpm": "target_rpm",
+    "step_rpm": "step_rpm",
+    "heat_rate": "heat_rate",
+    "cooling_rate": "cooling_rate",
+    "max_temp": "max_temp",
+}
+ARM_PARAMS = {
+    "speed_dps": "speed_dps",
+    "target_deg": "target_position_deg",
+}
+SENSOR_TYPES = ("sensor", "temperature_sensor")
+
+
+def _number(comp, param, value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Component '{comp['id']}': parameter '{param}' must be a number, not {value!r}")
+
+
+def _bank_from_components(bank, components, param_map):
+    ids = [comp["id"] for comp in components]
+    columns = {}
+    for param, column in param_map.items():
+        default = bank.COLUMNS[column][1]
+        values = [comp.get("parameters", {}).get(param) for comp in components]
+        if any(v is not None for v in values):
+            columns[column] = [default if v is None else _number(comp, param, v) for comp, v in zip(components, values)]
+    bank.add_many(ids, **columns)
+    return bank
+
+
+class Twin:
+    """Running simulator state for one template."""
+
+    def __init__(self, name, motors, arms, sensor_ids, static_count, rng=None):
+        self.name = name
+        self.rng = rng
+        self.motors = motors
+        self.arms = arms
+        self.sensor_ids = sensor_ids
+        self.sensor_values = np.zeros(len(sensor_ids))
+        self.static_count = static_count  # cpus and other non-simulated parts
+        self.ticks = 0
+
+    def copy(self, rng=None):
+        return Twin(self.name, self.motors.copy(), self.arms.copy(),
+                    list(self.sensor_ids), self.static_count, rng)
+
+    def step(self, dt):
+        self.motors.step()
+        self.arms.step()
+        self.sensor_values = simulate_temperatures(len(self.sensor_ids), self.rng)
+        self.ticks += 1
+
+    def summary(self):
+        return {
+            "name": self.name,
+            "motors": len(self.motors),
+            "arms": len(self.arms),
+            "sensors": len(self.sensor_ids),
+            "static": self.static_count,
+            "ticks": self.ticks,
+        }
+
+
+def compile_template(name, data):
+    """Build a Twin from template JSON, grouping components by type.
+
+    Raises ValueError naming the component when one cannot be simulated
+    (not an object, no "id", non-object parameters, duplicate ids).
+    """
+    groups = {}
+    simulated = ("motor", "robot_arm") + SENSOR_TYPES
+    for i, comp in enumerate(data.get("components", [])):
+        if not isinstance(comp, dict):
+            raise ValueError(f"Component {i} is not an object")
+        if comp.get("type") in simulated:
+            if "id" not in comp:
+                raise ValueError(f"Component {i} ({comp['type']}) has no 'id'")
+            if not isinstance(comp.get("parameters", {}), dict):
+                raise ValueError(f"Component '{comp['id']}': parameters must be an object")
+        groups.setdefault(comp.get("type"), []).append(comp)
+
+    motors = _bank_from_components(MotorBank(), groups.pop("motor", []), MOTOR_PARAMS)
+    arms = _bank_from_components(ArmBank(), groups.pop("robot_arm", []), ARM_PARAMS)
+    sensor_ids = [comp["id"] for kind in SENSOR_TYPES for comp in groups.pop(kind, [])]
+    static_count = sum(len(comps) for comps in groups.values())
+    return Twin(name, motors, arms, sensor_ids, static_count)
+
+
+class TwinRuntime:
+    """Compiles templates on demand and steps running twins on a Scheduler."""
+
+    def __init__(self, scheduler, rate_hz=1.0, run=None):
+        self.scheduler = scheduler
+        self.run = run
+        self.rate_hz = rate_hz
+        self.compiled = OrderedDict()  # (name, version) -> Twin prototype
+        self.running = {}
+
+    def compile(self, name):
+        """Compiled Twin prototype for a template, or None if it does not exist."""
+        version = template_version(name)
+        if version is None:
+            return None
+        key = (name, version)
+        if key in self.compiled:
+            self.compiled.move_to_end(key)
+            return self.compiled[key]
+
+        data = load_template(name)
+        prototype = compile_template(name, data)
+        for stale in [k for k in self.compiled if k[0] == name]:
+            del self.compiled[stale]
+        self.compiled[key] = prototype
+        if len(self.compiled) > COMPILE_CACHE_SIZE:
+            self.compiled.popitem(last=False)
+        return prototype
+
+    def start(self, name):
+        """Start (or restart) a twin from its template; returns the running Twin or None."""
+        prototype = self.compile(name)
+        if prototype is None:
+            return None
+        twin = prototype.copy(self.run.rng(f"twin:{name}") if self.run else None)
+        self.running[name] = twin
+        self.scheduler.register(f"twin:{name}", twin.step, rate_hz=self.rate_hz)
+        return twin
+
+    def stop(self, name):
+        self.scheduler.unregister(f"twin:{name}")
+        return self.running.pop(name, None)
+
+    def get(self, name):
+        return self.running.get(name)
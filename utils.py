@@ -3,6 +3,7 @@
 import os
 import json
 import logging
+import uuid
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -29,6 +30,43 @@ def current_timestamp() -> str:
     """Return the current UTC timestamp in ISO 8601 format."""
     return datetime.utcnow().isoformat() + "Z"
 
+def atomic_write(path: str, data: bytes, sync: bool = True):
+    """Write ``data`` via a temp file and rename, so readers never see a partial file.
+
+    ``sync=False`` skips the fsync for callers that sync a whole batch themselves.
+    """
+    temp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp, "wb") as f:
+        f.write(data)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temp, path)
+
+def fsync_paths(paths):
+    """fsync each file in ``paths``, then each directory holding them, once per batch.
+
+    Makes a batch written with ``atomic_write(..., sync=False)`` durable,
+    renames included, without syncing anything else on the host.
+    """
+    directories = set()
+    for path in dict.fromkeys(paths):
+        directories.add(os.path.dirname(path) or ".")
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:  # removed again later in the batch (e.g. compacted away)
+            continue
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    for directory in directories:
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
 def read_json(file_path: str) -> dict:
     """Read and return JSON data from a file."""
     try:
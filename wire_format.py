@@ -0,0 +1,132 @@
+# wire_format.py - Valencia Walker's
+# Compact binary table format for snapshot endpoints (decoder: js/wire_format.js).
+#
+# Layout, all little-endian:
+#   header   b"OQTB" | u8 version | u8 column count | u16 reserved | u32 row count
+#   column   u8 name length | name (utf-8) | u8 type | padding to 8 bytes | data
+#   data     numeric types: row count values
+#            TYPE_STR:      u32 byte length, (row count + 1) u32 offsets, utf-8 blob
+# Every column's data starts on an 8-byte boundary so the JS side can view it
+# with a typed array without copying.
+
+import struct
+import numpy as np
+from flask import Response
+
+MAGIC = b"OQTB"
+VERSION = 1
+BINARY_MIMETYPE = "application/x-openq-table"
+
+TYPE_U8, TYPE_I32, TYPE_I64, TYPE_F32, TYPE_F64, TYPE_STR = range(1, 7)
+NUMERIC_TYPES = {
+    TYPE_U8: np.dtype("<u1"),
+    TYPE_I32: np.dtype("<i4"),
+    TYPE_I64: np.dtype("<i8"),
+    TYPE_F32: np.dtype("<f4"),
+    TYPE_F64: np.dtype("<f8"),
+}
+
+
+def wants_binary(request):
+    """True when the client opted in via ?format=binary or the Accept header."""
+    if request.args.get("format") == "binary":
+        return True
+    return BINARY_MIMETYPE in request.headers.get("Accept", "")
+
+
+def binary_response(payload):
+    return Response(payload, mimetype=BINARY_MIMETYPE)
+
+
+def _pad(parts, size):
+    remainder = size % 8
+    if remainder:
+        parts.append(b"\0" * (8 - remainder))
+        size += 8 - remainder
+    return size
+
+
+def encode_table(count, columns):
+    """Encode ``columns`` [(name, type, values)] of ``count`` rows into bytes.
+
+    Numeric ``values`` may be any array-like; TYPE_STR values are a sequence of str.
+    """
+    parts = [MAGIC, struct.pack("<BBHI", VERSION, len(columns), 0, count)]
+    size = 12
+    for name, kind, values in columns:
+        name = name.encode("utf-8")
+        parts.append(struct.pack("<B", len(name)) + name + struct.pack("<B", kind))
+        size = _pad(parts, size + len(name) + 2)
+
+        if kind == TYPE_STR:
+            encoded = [v.encode("utf-8") for v in values]
+            offsets = np.zeros(count + 1, dtype="<u4")
+            np.cumsum([len(v) for v in encoded], out=offsets[1:])
+            blob = b"".join(encoded)
+            data = struct.pack("<I", len(blob)) + offsets.tobytes() + blob
+        else:
+            data = np.ascontiguousarray(values, dtype=NUMERIC_TYPES[kind]).tobytes()
+        parts.append(data)
+        size = _pad(parts, size + len(data))
+    return b"".join(parts)
+
+
+def encode_records(records):
+    """Encode a list of flat state dicts (e.g. motor/arm snapshots) column by column.
+
+    Numbers become f64, strings stay strings and lists are comma-joined.
+    """
+    if not records:
+        return encode_table(0, [])
+    columns = []
+    for key, sample in records[0].items():
+        values = [r[key] for r in records]
+        if isinstance(sample, bool):
+            columns.append((key, TYPE_U8, values))
+        elif isinstance(sample, (int, float)):
+            columns.append((key, TYPE_F64, values))
+        elif isinstance(sample, (list, tuple)):
+            columns.append((key, TYPE_STR, [",".join(map(str, v)) for v in values]))
+        else:
+            columns.append((key, TYPE_STR, [str(v) for v in values]))
+    return encode_table(len(records), columns)
+
+
+def encode_columns(ids, columns):
+    """Encode an id list plus {name: ndarray} columns, picking the wire type from each dtype."""
+    table = [("id", TYPE_STR, ids)]
+    for name, values in columns.items():
+        kind = values.dtype.kind
+        if kind in "bu" or values.dtype == np.int8:
+            table.append((name, TYPE_U8, values))
+        elif kind == "i":
+            table.append((name, TYPE_I64, values))
+        else:
+            table.append((name, TYPE_F64, values))
+    return encode_table(len(ids), table)
+
+
+def decode_table(data):
+    """Inverse of encode_table, returning {name: ndarray | list[str]} (offline tooling, binary ingest)."""
+    magic, (version, ncols, _, count) = data[:4], struct.unpack_from("<BBHI", data, 4)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not an OQTB v1 table")
+    pos, columns = 12, {}
+    for _ in range(ncols):
+        length = data[pos]
+        name = bytes(data[pos + 1:pos + 1 + length]).decode("utf-8")
+        kind = data[pos + 1 + length]
+        pos = (pos + length + 2 + 7) & ~7
+        if kind == TYPE_STR:
+            blob_len = struct.unpack_from("<I", data, pos)[0]
+            offsets = np.frombuffer(data, dtype="<u4", count=count + 1, offset=pos + 4)
+            blob_start = pos + 4 + 4 * (count + 1)
+            blob = bytes(data[blob_start:blob_start + blob_len])
+            columns[name] = [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(count)]
+            pos = blob_start + blob_len
+        else:
+            dtype = NUMERIC_TYPES[kind]
+            columns[name] = np.frombuffer(data, dtype=dtype, count=count, offset=pos)
+            pos += dtype.itemsize * count
+        pos = (pos + 7) & ~7
+    return columns